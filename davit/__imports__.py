@@ -35,6 +35,7 @@ from PyQt6.QtWidgets import (
     QMenuBar,
     QMessageBox,
     QPushButton,
+    QProgressBar,
     QProgressDialog,
     QScrollArea,
     QSpacerItem,
@@ -74,6 +75,7 @@ from PyQt6.QtGui import (
     QStandardItemModel,
 )
 from PyQt6.QtCore import (
+    QAbstractItemModel,
     QAbstractTableModel,
     Q_ARG,
     QDate,
@@ -81,14 +83,17 @@ from PyQt6.QtCore import (
     QEvent,
     QEventLoop,
     QModelIndex,
+    QPersistentModelIndex,
     QMetaObject,
     QObject,
     QPoint,
     QRect,
+    QRunnable,
     QSettings,
     QSize,
     QSortFilterProxyModel,
     QThread,
+    QThreadPool,
     QTime,
     QTimer,
     Qt,
@@ -125,6 +130,7 @@ import seaborn as sns
 import qtawesome as qta
 import random
 import tempfile
+import weakref
 from typing import cast
 from itertools import groupby
 import ast
@@ -139,7 +145,7 @@ from scipy.fft import rfftfreq as scipy_compute_rfftfreq
 from scipy.stats import gaussian_kde
 
 # utils imports
-from davit.utils.general_utils import (fromBytesToString, getSystemTempDir, closeEventIgnore, clearLayout, iterItems, getPixelWidthFromQLabel, getVersionNameFromInit, NumpyFindNearest, getTabIndexByName, numpy_find_nearest, get_index_type, columnNameFormatting)
+from davit.utils.general_utils import (fromBytesToString, getSystemTempDir, closeEventIgnore, clearLayout, iterItems, getPixelWidthFromQLabel, getVersionNameFromInit, NumpyFindNearest, getTabIndexByName, numpy_find_nearest, get_index_type, get_datetime_index_ns, get_datetime_index_seconds, columnNameFormatting)
 from davit.utils.subclassing_hacks import (CustomMultiPlotLegendItem, CustomMultiPlotItemSample, QVSeparationLine, QHSeparationLine, QComboBoxNoScrollWheel, ScrollLabel, CustomCornerWidget)
 
 # table imports
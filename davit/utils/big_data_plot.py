@@ -13,6 +13,102 @@
 
 from davit.__imports__ import *
 
+# optional fast path for the min/max kernel
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# number of output bins reduced at once (keeps every block in cache between the min and max passes)
+MIN_MAX_BLOCK_BINS = 16_384
+
+#################################################################
+#################################################################
+
+def _min_max_numpy(data, start, stop, ds, out, block_bins = MIN_MAX_BLOCK_BINS):
+
+    # number of full bins and size of the ragged tail
+    n_bins = (stop - start) // ds
+    tail = (stop - start) - n_bins * ds
+
+    # (n_bins, ds) strided view over the source (no copy, even for non-contiguous columns)
+    if n_bins > 0:
+        step = data.strides[0]
+        bins = np.lib.stride_tricks.as_strided(data[start:], shape=(n_bins, ds), strides=(step * ds, step), writeable=False)
+        out_min = out[0: 2 * n_bins: 2]
+        out_max = out[1: 2 * n_bins: 2]
+
+        # reduce block by block writing straight into the interleaved output
+        for b in range(0, n_bins, block_bins):
+            block = bins[b: b + block_bins]
+            np.minimum.reduce(block, axis=1, out=out_min[b: b + block_bins])
+            np.maximum.reduce(block, axis=1, out=out_max[b: b + block_bins])
+
+    # ragged tail reduced in place (no padding copy)
+    if tail > 0:
+        tail_view = data[stop - tail: stop]
+        out[2 * n_bins] = tail_view.min()
+        out[2 * n_bins + 1] = tail_view.max()
+
+    return out
+
+#################################################################
+#################################################################
+
+if NUMBA_AVAILABLE:
+
+    @numba.njit(nogil=True, cache=True)
+    def _min_max_numba(data, start, stop, ds, out):
+
+        # single fused pass computing min and max of every bin (nan propagates as in numpy)
+        n_out = (stop - start + ds - 1) // ds
+        for b in range(n_out):
+            i0 = start + b * ds
+            i1 = min(i0 + ds, stop)
+            v_min = data[i0]
+            v_max = data[i0]
+            for i in range(i0 + 1, i1):
+                v = data[i]
+                if v < v_min:
+                    v_min = v
+                elif v > v_max:
+                    v_max = v
+                elif v != v:
+                    v_min = v
+                    v_max = v
+                    break
+            out[2 * b] = v_min
+            out[2 * b + 1] = v_max
+
+        return out
+
+#################################################################
+#################################################################
+
+def downsample_min_max(data, start, stop, ds, use_numba = True, block_bins = MIN_MAX_BLOCK_BINS):
+
+    # output holds (min, max) pairs interleaved for every bin (ragged tail included)
+    n_out = (stop - start + ds - 1) // ds
+    out = np.empty(2 * n_out, dtype=data.dtype)
+    if n_out == 0:
+        return out
+
+    # numba fast path for numeric types
+    if use_numba and NUMBA_AVAILABLE and data.dtype.kind in "iuf":
+        try:
+            return _min_max_numba(data, start, stop, ds, out)
+        except Exception as xcp:
+            print("Exception at downsample_min_max (falling back to numpy): {}".format(xcp))
+
+    return _min_max_numpy(data, start, stop, ds, out, block_bins=block_bins)
+
 #################################################################
 #################################################################
 
@@ -26,6 +122,36 @@ class BigDataPlot(pg.PlotCurveItem):
         self._plotData = plotData
         self.replot()
 
+    def startDownsampleCache(self, thread_pool=None):
+
+        if self._plotData is None:
+            return None
+
+        worker = self._plotData.createDownsampleCacheWorker()
+        if worker is None:
+            return None
+
+        worker.signals.level_ready.connect(self.downsampleLevelReady)
+        worker.signals.finished.connect(self.downsampleCacheFinished)
+
+        if thread_pool is None:
+            thread_pool = QThreadPool.globalInstance()
+        thread_pool.start(worker)
+
+        return worker
+
+    def downsampleLevelReady(self, ds, level):
+        if self._plotData is None:
+            return
+        self._plotData.setCacheLevel(ds, level)
+        self.replot()
+
+    def downsampleCacheFinished(self, cache):
+        if self._plotData is None:
+            return
+        self._plotData.cacheFinished()
+        self.replot()
+
     def viewRangeChanged(self):
         self.replot(lazy=True)
 
@@ -51,15 +177,51 @@ class BigDataPlot(pg.PlotCurveItem):
 #################################################################
 #################################################################
 
+def compress_x_axis(x, n_checks = 1000, tolerance = 0.01, block_size = 10_000_000):
+
+    # no axis
+    if x is None or len(x) == 0:
+        return None
+
+    # single point
+    n = len(x)
+    if n == 1:
+        return (x[0], 1)
+
+    # uniform sampling is stored as (x0, dx) (checked on a strided subset relative to the first sample)
+    dx = (x[-1] - x[0]) / (n - 1)
+    if dx > 0:
+        check_indexes = np.unique(np.linspace(0, n - 1, min(n, n_checks)).astype(np.int64))
+        deviation = np.abs((x[check_indexes] - x[0]).astype(np.float64) - check_indexes * float(dx))
+        if np.all(deviation <= tolerance * float(dx)):
+            return (x[0], dx)
+
+    # otherwise keep the array if it is monotonic (needed by the searchsorted range lookup)
+    for start in range(0, n - 1, block_size):
+        if np.any(np.diff(x[start: start + block_size + 1]) < 0):
+            return None
+
+    return x
+
+#################################################################
+#################################################################
+
 class PlotDataClass:
 
-    def __init__(self, x, y, cache=None, chunk_size=100_000, app = None, name = ""):
+    def __init__(self, x, y, cache=None, chunk_size=100_000, app = None, name = "", cache_store = None, cache_key = None, x_scale = 1.0):
 
+        # x can be None (sample number), a (x0, dx) tuple (uniform sampling) or a monotonic array
         if x is None:
             x = len(y)
+        elif isinstance(x, tuple):
+            if len(x) != 2:
+                raise ValueError
         elif len(x) != len(y):
             raise ValueError
 
+        # factor converting the stored x values into plot units (e.g. 1e-9 for int64 epoch ns)
+        self._x_scale = x_scale
+
         if not chunk_size:
             chunk_size = 100_000
 
@@ -67,8 +229,23 @@ class PlotDataClass:
         self._app = app
         self._name = name
 
-        if cache == "auto":
-            cache = self.computeDownsampleCache(y)
+        self._cache_store = cache_store
+        self._cache_key = cache_key
+        self._cache_pending = False
+
+        if cache in ("auto", "async"):
+            loaded_cache = None
+            if cache_store is not None and cache_key is not None:
+                loaded_cache = cache_store.load(cache_key)
+            if loaded_cache is not None:
+                cache = loaded_cache
+            elif cache == "async":
+                cache = {}
+                self._cache_pending = True
+            else:
+                cache = self.computeDownsampleCache(y)
+                if cache_store is not None and cache_key is not None:
+                    cache_store.save(cache_key, cache)
 
         self._x = x
         self._y = y
@@ -77,10 +254,48 @@ class PlotDataClass:
 
         return
 
+    def createDownsampleCacheWorker(self):
+
+        if not self._cache_pending:
+            return None
+
+        return DownsampleCacheWorker(self)
+
+    def setCacheLevel(self, ds, level):
+        self._cache[ds] = level
+        self._lastRange = None
+
+    def cacheFinished(self):
+        self._cache_pending = False
+
+    def xBounds(self):
+        n = len(self._y)
+        if n == 0:
+            return None, None
+        return self.xFromIndexes(np.array([0, n - 1])).tolist()
+
+    def xFromIndexes(self, indexes):
+
+        # indexes of the ragged tail may go beyond the last sample
+        indexes = np.minimum(indexes, len(self._y) - 1)
+
+        if isinstance(self._x, int):
+            return indexes
+        elif isinstance(self._x, tuple):
+            x0, dx = self._x
+            return (x0 + indexes * dx) * self._x_scale
+        elif self._x_scale != 1.0:
+            return self._x[indexes] * self._x_scale
+        else:
+            return self._x[indexes]
+
     def sample(self, x1, x2, lazy=True, padding=0.3, **kwargs):
 
         i1, i2, ds = self.plotDataRange(self._x, x1, x2, padding=padding, **kwargs)
 
+        if i1 >= i2:
+            return
+
         if lazy and self._lastRange is not None:
             i11, i21, ds1 = self._lastRange
             i12, i22, _ = self.plotDataRange(self._x, x1, x2, padding=0, **kwargs)
@@ -89,10 +304,7 @@ class PlotDataClass:
 
         i, y = self.downsample(data=self._y, start=i1, stop=i2, ds=ds, cache=self._cache)
 
-        if isinstance(self._x, int):
-            x = np.arange(i.start, i.stop, i.step)
-        else:
-            x = self._x[i]
+        x = self.xFromIndexes(np.arange(i.start, i.stop, i.step))
 
         self._lastRange = (i1, i2, ds)
 
@@ -107,9 +319,21 @@ class PlotDataClass:
             n = x
             i1 = max(0, min(n, int(x1)))
             i2 = max(0, min(n, int(x2)))
+        elif isinstance(x, tuple):
+            n = len(self._y)
+            x0, dx = x
+            i1 = max(0, min(n, int(np.floor((x1 / self._x_scale - x0) / dx))))
+            i2 = max(0, min(n, int(np.ceil((x2 / self._x_scale - x0) / dx)) + 1))
         else:
             n = len(x)
-            i1, i2 = np.searchsorted(x, [x1, x2]).tolist()
+            keys = np.array([x1 / self._x_scale, x2 / self._x_scale])
+            if np.issubdtype(x.dtype, np.integer):
+                # keys in the dtype of the axis (float keys would make numpy cast a copy of the whole int64 epoch axis)
+                info = np.iinfo(x.dtype)
+                keys = np.clip([np.floor(keys[0]), np.ceil(keys[1])], info.min, np.nextafter(float(info.max), 0)).astype(x.dtype)
+            elif x.dtype.kind == "f" and keys.dtype != x.dtype:
+                keys = keys.astype(x.dtype)
+            i1, i2 = np.searchsorted(x, keys).tolist()
 
         ds = max(1, (i2 - i1) // sampleLimit)
 
@@ -127,6 +351,11 @@ class PlotDataClass:
 
         if not (0 <= start < stop <= len(data)):
             raise ValueError
+        if cache is not None and ds > 2 and ds not in cache and self._cache_pending:
+            ds = self.closestCachedLevel(ds, cache)
+            if ds is None:
+                return slice(start, start), data[start:start]
+            start = (start // ds) * ds
         if ds <= 2:
             dat = data[start:stop]
             idx = slice(start, stop)
@@ -139,41 +368,22 @@ class PlotDataClass:
 
         return idx, dat
 
-    def _downsample(self, data, start, stop, ds):
+    def closestCachedLevel(self, ds, cache):
 
-        # CHAT-GPT FIXED
-        # The issue seems to be that the 'visible' array can be partially unfilled with zeros at the end.
-        # This can happen when the last chunk of data is not fully filled. To fix this, you should create
-        # a 'visible' array that only contains the final size needed. You can calculate the final size of the
-        # 'visible' array by using the 'targetPtr' value after the loop. The updated version of the code creates
-        # a 'temp_visible' array that has the same initial size as before but then slices it to only include
-        # the filled portion before returning it as 'visible'. This should prevent the zeros from appearing at
-        # the end of the output.
+        # while the pyramid is being built use the closest coarser level available (or the coarsest one)
+        available = sorted(cache.keys())
+        if not available:
+            return None
+        coarser = [lv for lv in available if lv >= ds]
+        if coarser:
+            return coarser[0]
 
-        samples = 1 + ((stop - start) // ds)
-        temp_visible = np.zeros(samples * 2, dtype=data.dtype)
-        sourcePtr = start
-        targetPtr = 0
-        chunk_size = (self._chunk_size // ds) * ds
+        return available[-1]
 
-        while sourcePtr < stop:
-            chunk = data[sourcePtr: min(stop, sourcePtr + chunk_size)]
-            sourcePtr += len(chunk)
-
-            if len(chunk) % ds != 0:
-                tail = np.full(ds - len(chunk) % ds, chunk[-1])
-                chunk = np.append(chunk, tail)
-
-            chunk = chunk.reshape(len(chunk) // ds, ds)
-
-            chunkMax = chunk.max(axis=1)
-            chunkMin = chunk.min(axis=1)
-
-            temp_visible[targetPtr: targetPtr + chunk.shape[0] * 2: 2] = chunkMin
-            temp_visible[1 + targetPtr: 1 + targetPtr + chunk.shape[0] * 2: 2] = chunkMax
-            targetPtr += chunk.shape[0] * 2
+    def _downsample(self, data, start, stop, ds):
 
-        visible = temp_visible[:targetPtr]
+        # vectorised min/max kernel (strided view, no tail padding, optional numba fast path)
+        visible = downsample_min_max(data=data, start=start, stop=stop, ds=ds, block_bins=max(1, self._chunk_size // ds))
 
         return visible
 
@@ -204,11 +414,16 @@ class PlotDataClass:
     #
     #     return visible
 
-    def computeDownsampleCache(self, data, minLevelSize=2500, maxLevelSize=10_000_000, use_progress_bar = True):
+    def computeDownsampleCache(self, data, minLevelSize=2500, maxLevelSize=10_000_000, use_progress_bar = True, level_callback = None, is_cancelled = None):
 
         minLevel = max(2, (len(data) // maxLevelSize).bit_length())
         maxLevel = (len(data) // minLevelSize).bit_length()
 
+        # the coarsest level is computed directly from the data first so that the curve can be shown right away
+        if level_callback is not None and maxLevel > minLevel:
+            ds = 2 ** maxLevel
+            level_callback(ds, self._downsample(data=data, start=0, stop=len(data), ds=ds))
+
         if use_progress_bar:
             self.progress_dialog = QProgressDialog("Precomputing downsample cache for curve {}...".format(self._name), None, 0, len(range(minLevel, maxLevel + 1)))
             self.progress_dialog.setMaximumHeight(300)
@@ -238,6 +453,12 @@ class PlotDataClass:
                 dat = self._downsample(data=dat, start=0, stop=len(dat), ds=4)
             out[ds] = dat
 
+            if level_callback is not None:
+                level_callback(ds, dat)
+
+            if is_cancelled is not None and is_cancelled():
+                break
+
             if use_progress_bar:
                 self.progress_dialog.setValue(c_lv)
                 self.progress_dialog.repaint()
@@ -250,4 +471,55 @@ class PlotDataClass:
         return out
 
 #################################################################
-#################################################################
\ No newline at end of file
+#################################################################
+
+class DownsampleCacheSignals(QObject):
+
+    level_ready = pyqtSignal(int, object)
+    finished = pyqtSignal(object)
+
+#################################################################
+#################################################################
+
+class DownsampleCacheWorker(QRunnable):
+
+    def __init__(self, plot_data):
+
+        # inherit from QRunnable
+        QRunnable.__init__(self)
+
+        # main attributes
+        self.plot_data = plot_data
+        self.signals = DownsampleCacheSignals()
+        self.cancelled = False
+
+        return
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+
+        # numpy reductions release the gil so several curves are built in parallel by the pool
+        cache = {}
+        try:
+            cache = self.plot_data.computeDownsampleCache(self.plot_data._y, use_progress_bar=False, level_callback=self.levelReady, is_cancelled=lambda: self.cancelled)
+
+            # persist the pyramid
+            if not self.cancelled and self.plot_data._cache_store is not None and self.plot_data._cache_key is not None:
+                self.plot_data._cache_store.save(self.plot_data._cache_key, cache)
+        except Exception as xcp:
+            print("Exception at DownsampleCacheWorker: {}".format(xcp))
+
+        # always leave the progressive state (the missing levels are then downsampled on the fly)
+        if not self.cancelled:
+            self.signals.finished.emit(cache)
+
+        return
+
+    def levelReady(self, ds, level):
+        if not self.cancelled:
+            self.signals.level_ready.emit(ds, level)
+
+#################################################################
+#################################################################
@@ -14,24 +14,77 @@ from davit.__imports__ import *
 #################################################################
 #################################################################
 
+# CONSTANTS
+
+# maximum number of rows exposed to qt at once (qt headers use int pixel offsets, 50M rows x 25 px < 2**31)
+MAX_VIRTUAL_ROWS = 50_000_000
+
+# maximum number of formatted cells kept in memory
+MAX_CACHED_CELLS = 20_000
+
+#################################################################
+#################################################################
+
 class BigDataFrameModel(QAbstractTableModel):
 
-    def __init__(self, df: pd.DataFrame = None, parent=None):
+    def __init__(self, df: pd.DataFrame = None, parent=None, max_virtual_rows: int = MAX_VIRTUAL_ROWS, max_cached_cells: int = MAX_CACHED_CELLS):
         super(BigDataFrameModel, self).__init__(parent)
         if df is None:
             df = pd.DataFrame()
         self._data = df
+        self._n_rows = df.shape[0]
+        self._max_virtual_rows = max_virtual_rows
+        self._max_cached_cells = max_cached_cells
+        self._row_offset = 0
+        self._cell_cache = collections.OrderedDict()
+        self._index = df.index
+        self._columns = [str(c) for c in df.columns]
+        self._column_values = [self.get_column_values(df.iloc[:, c]) for c in range(df.shape[1])]
+
+    @staticmethod
+    def get_column_values(column):
+        # numpy columns are served from the array (view, no copy), other types from the pandas array (keeps their formatting)
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind not in "mM":
+            return column.to_numpy()
+        return column.array
 
     def rowCount(self, parent=None):
-        return self._data.shape[0]
+        return min(self._n_rows, self._max_virtual_rows)
 
     def columnCount(self, parent=None):
-        return self._data.shape[1]
+        return len(self._column_values)
+
+    def totalRowCount(self):
+        return self._n_rows
+
+    def rowOffset(self):
+        return self._row_offset
+
+    def setRowOffset(self, row_offset):
+        row_offset = max(0, min(row_offset, self._n_rows - self.rowCount()))
+        if row_offset != self._row_offset:
+            self.beginResetModel()
+            self._row_offset = row_offset
+            self._cell_cache.clear()
+            self.endResetModel()
+        return self._row_offset
+
+    def formattedCell(self, row, column):
+        key = (row, column)
+        text = self._cell_cache.get(key, None)
+        if text is None:
+            text = str(self._column_values[column][row])
+            self._cell_cache[key] = text
+            if len(self._cell_cache) > self._max_cached_cells:
+                self._cell_cache.popitem(last=False)
+        else:
+            self._cell_cache.move_to_end(key)
+        return text
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         if index.isValid():
             if role == Qt.ItemDataRole.DisplayRole:
-                return str(self._data.iloc[index.row(), index.column()])
+                return self.formattedCell(self._row_offset + index.row(), index.column())
             elif role == Qt.ItemDataRole.TextAlignmentRole:
                 return Qt.AlignmentFlag.AlignCenter
         return None
@@ -40,9 +93,9 @@ class BigDataFrameModel(QAbstractTableModel):
         if role != Qt.ItemDataRole.DisplayRole:
             return None
         if orientation == Qt.Orientation.Horizontal:
-            return str(self._data.columns[section])
+            return self._columns[section]
         else:
-            return str(self._data.index[section])
+            return str(self._index[self._row_offset + section])
 
 #################################################################
 #################################################################
@@ -55,9 +108,8 @@ class BigDataTableView(QTableView):
             chunk_size = 100000
         self.parent = parent
         self.chunk_size = chunk_size
-        self.loaded_rows = 0
         self.df = df
-        self.load_initial_data(self.chunk_size)
+        self.setModel(BigDataFrameModel(self.df))
         self.typical_attrs()
         self.init_hack_timer()
 
@@ -85,32 +137,31 @@ class BigDataTableView(QTableView):
         self.verticalHeader().setMinimumSectionSize(25)
         self.verticalHeader().setVisible(True)
         self.verticalHeader().setDefaultSectionSize(25)
-        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
 
-    def load_initial_data(self, chunk_size):
-        chunk = self.df.iloc[:chunk_size, :]
-        model = BigDataFrameModel(chunk)
-        self.setModel(model)
-        self.loaded_rows = chunk_size
-
-    def load_more_data(self):
-        if self.loaded_rows < len(self.df):
-            new_rows = min(self.loaded_rows + self.chunk_size, len(self.df))
-            chunk = self.df.iloc[self.loaded_rows:new_rows, :]
-            model = self.model()
-            model._data = pd.concat([model._data, chunk])
-            self.loaded_rows = new_rows
-            model.layoutChanged.emit()
+    def scroll_to_row(self, row: int, column: int = None):
+        # move the window of exposed rows if the row is outside of it (only for frames larger than MAX_VIRTUAL_ROWS)
+        model = self.model()
+        row = max(0, min(row, model.totalRowCount() - 1))
+        if row < model.rowOffset() or row >= model.rowOffset() + model.rowCount():
+            model.setRowOffset(row - model.rowCount() // 2)
+        if column is None:
+            column = max(0, self.currentIndex().column())
+        index = model.index(row - model.rowOffset(), column)
+        self.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+        self.setCurrentIndex(index)
+        self.selectionModel().select(index, QItemSelectionModel.SelectionFlag.ClearAndSelect)
 
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() == Qt.Key.Key_End:
-            self.load_initial_data(self.df.shape[0])
+            self.scroll_to_row(self.model().totalRowCount() - 1)
             self.scrollToBottom()
         elif event.key() == Qt.Key.Key_Home:
+            self.scroll_to_row(0)
             self.scrollToTop()
         elif event.key() == Qt.Key.Key_PageUp:
             self.scroll_by_chunk(-1)
@@ -120,25 +171,25 @@ class BigDataTableView(QTableView):
             super().keyPressEvent(event)
 
     def scrollContentsBy(self, dx, dy):
-        if dy != 0 and self.loaded_rows < len(self.df):
+        # shift the window of exposed rows when reaching its edges
+        model = self.model()
+        if dy != 0 and model.totalRowCount() > model.rowCount():
             scrollbar = self.verticalScrollBar()
-            if scrollbar.value() == scrollbar.maximum():
-                self.load_more_data()
+            first_row = model.rowOffset() + scrollbar.value()
+            if scrollbar.value() == scrollbar.maximum() and model.rowOffset() + model.rowCount() < model.totalRowCount():
+                model.setRowOffset(first_row - model.rowCount() // 2)
+                scrollbar.setValue(first_row - model.rowOffset())
+                return
+            elif scrollbar.value() == scrollbar.minimum() and model.rowOffset() > 0:
+                model.setRowOffset(first_row - model.rowCount() // 2)
+                scrollbar.setValue(first_row - model.rowOffset())
+                return
         super(BigDataTableView, self).scrollContentsBy(dx, dy)
 
     def scroll_by_chunk(self, direction: int):
-        scrollbar = self.verticalScrollBar()
-        current_value = scrollbar.value()
-        new_value = current_value + direction * self.chunk_size
-        new_value = max(0, min(new_value, scrollbar.maximum()))
-        if direction > 0 and new_value == scrollbar.maximum():
-            self.load_more_data()
-        scrollbar.setValue(new_value)
-        row = int(new_value)
-        column = self.currentIndex().column()
-        index = self.model().index(row, column)
-        self.setCurrentIndex(index)
-        self.selectionModel().select(index, QItemSelectionModel.ClearAndSelect)
+        model = self.model()
+        current_row = model.rowOffset() + max(0, self.currentIndex().row())
+        self.scroll_to_row(current_row + direction * self.chunk_size)
 
     def init_headers(self, df):
         self.header_labels = df.columns.tolist()
@@ -0,0 +1,148 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+import time
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# number of entries sent to the model in every batch
+DIRECTORY_SCAN_BATCH_SIZE = 256
+
+# maximum time (in seconds) an incomplete batch is retained before being sent
+DIRECTORY_SCAN_BATCH_INTERVAL = 0.1
+
+# extensions recognized as hdf5 files
+HDF5_FILE_EXTENSIONS = ("hdf", "h5", "hdf5", "h5part")
+
+#################################################################
+#################################################################
+
+def is_h5_file_name(name):
+
+    # same criteria as HDF5TreeViewModel.is_h5_file
+    return name.split(".")[-1] in HDF5_FILE_EXTENSIONS
+
+#################################################################
+#################################################################
+
+def scan_directory(path, only_h5_and_dirs = True, is_cancelled = None, batch_callback = None, batch_size = DIRECTORY_SCAN_BATCH_SIZE, batch_interval = DIRECTORY_SCAN_BATCH_INTERVAL):
+
+    # init
+    entries = []
+    batch = []
+    last_emit = time.perf_counter()
+
+    # scandir returns the file type from the directory listing (no extra stat per entry on most platforms)
+    with os.scandir(path) as iterator:
+        for entry in iterator:
+
+            # check cancellation
+            if is_cancelled and is_cancelled():
+                break
+
+            # reuse the cached type of the entry
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            # only show subdirs and h5 files
+            if only_h5_and_dirs and not (is_dir or is_h5_file_name(entry.name)):
+                continue
+
+            # store the entry
+            element = (entry.name, entry.path, is_dir)
+            if batch_callback:
+                batch.append(element)
+                if len(batch) >= batch_size or (time.perf_counter() - last_emit) >= batch_interval:
+                    batch_callback(batch)
+                    batch = []
+                    last_emit = time.perf_counter()
+            else:
+                entries.append(element)
+
+    # send the remaining entries
+    if batch_callback and batch:
+        batch_callback(batch)
+
+    return entries
+
+#################################################################
+#################################################################
+
+class DirectoryScanThread(QThread):
+
+    #----------------------------------------------#
+
+    # signals
+    batch_ready = pyqtSignal(object, list)
+
+    #----------------------------------------------#
+
+    def __init__(self, path, only_h5_and_dirs = True):
+
+        # inheritance
+        super().__init__()
+
+        # attributes
+        self.path = path
+        self.only_h5_and_dirs = only_h5_and_dirs
+        self.cancelled = False
+        self.error = None
+
+        return
+
+    #----------------------------------------------#
+
+    def cancel(self):
+
+        # the scan loop checks this flag for every entry
+        self.cancelled = True
+
+        return
+
+    #----------------------------------------------#
+
+    def is_cancelled(self):
+
+        return self.cancelled
+
+    #----------------------------------------------#
+
+    def emit_batch(self, batch):
+
+        # do not send more entries once the scan has been cancelled
+        if not self.cancelled:
+            self.batch_ready.emit(self, batch)
+
+        return
+
+    #----------------------------------------------#
+
+    def run(self):
+
+        # scan the directory (the error is read by the model when the finished signal is received)
+        try:
+            scan_directory(self.path, only_h5_and_dirs=self.only_h5_and_dirs, is_cancelled=self.is_cancelled, batch_callback=self.emit_batch)
+        except Exception as xcp:
+            self.error = xcp
+            print("Exception at DirectoryScanThread.run: {}".format(xcp))
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,251 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+import hashlib
+import threading
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# name of the folder (inside the temp dir) where the pyramids are stored
+CACHE_DIR_NAME = "davit_downsample_cache"
+
+# file written at the end of a save (an entry without it is considered incomplete)
+META_FILE_NAME = "meta.json"
+
+# default size limit of the whole store
+DEFAULT_MAX_SIZE_IN_MB = 4096
+
+# values of the curve hashed into the key (catches frames that keep the source attrs but not the data of the file)
+FINGERPRINT_SAMPLES = 64
+
+# the pool workers save (and prune) at the same time, only one of them walks the store at a time
+prune_lock = threading.Lock()
+
+#################################################################
+#################################################################
+
+def get_dataframe_source(dataframe):
+
+    # source information is attached by createDfDataObject in the dataframe attrs
+    try:
+        source = dataframe.attrs.get("source", None)
+    except Exception:
+        source = None
+
+    return source
+
+#################################################################
+#################################################################
+
+def slice_dataframe_source(dataframe, sliced_dataframe, row_slice, column_slice):
+
+    # keep the rows and columns of the dataset selected by the slice (composed with the slices applied before)
+    source = get_dataframe_source(dataframe)
+    if not source:
+        return
+    rows = range(*source.get("rows", [0, dataframe.shape[0], 1]))[slice(*row_slice)]
+    columns = range(*source.get("columns", [0, dataframe.shape[1], 1]))[slice(*column_slice)]
+    sliced_dataframe.attrs["source"] = dict(source, rows=[rows.start, rows.stop, rows.step], columns=[columns.start, columns.stop, columns.step])
+
+    return
+
+#################################################################
+#################################################################
+
+def get_column_fingerprint(dataframe, column_index):
+
+    # hash of a few values spread over the column and of the index edges
+    try:
+        values = dataframe.iloc[:, column_index].to_numpy()
+        sample = np.ascontiguousarray(values[::max(1, len(values) // FINGERPRINT_SAMPLES)])
+        edges = "{}:{}".format(dataframe.index[0], dataframe.index[-1]) if len(dataframe.index) else ""
+        return hashlib.sha1(sample.tobytes() + edges.encode("utf-8")).hexdigest()
+    except Exception as xcp:
+        print("Exception at get_column_fingerprint: {}".format(xcp))
+        return None
+
+#################################################################
+#################################################################
+
+class DownsampleCacheStore:
+
+    def __init__(self, cache_dir = None, max_size_in_mb = DEFAULT_MAX_SIZE_IN_MB):
+
+        # init variables
+        self.cache_dir = cache_dir if cache_dir else os.path.join(getSystemTempDir(), CACHE_DIR_NAME)
+        self.max_size_in_mb = max_size_in_mb
+
+        return
+
+    #----------------------------------------------#
+
+    def makeKey(self, file_path, hdf5_path, column, n_points, dtype, transform = "", extra = ""):
+
+        # the file must exist to be able to validate the entry
+        try:
+            file_stat = os.stat(file_path)
+        except Exception:
+            return None
+
+        # build the key (mtime and size invalidate entries of modified files)
+        key_str = "|".join([
+            os.path.realpath(file_path),
+            str(hdf5_path),
+            str(file_stat.st_mtime_ns),
+            str(file_stat.st_size),
+            str(column),
+            str(n_points),
+            str(dtype),
+            str(transform),
+            str(extra),
+        ])
+
+        return hashlib.sha1(key_str.encode("utf-8")).hexdigest()
+
+    #----------------------------------------------#
+
+    def makeKeyFromDataFrame(self, dataframe, column_index, n_points, dtype, transform = ""):
+
+        # get source
+        source = get_dataframe_source(dataframe)
+        if not source:
+            return None
+
+        # column name and position identify the curve
+        column = "{}:{}".format(column_index, dataframe.columns[column_index])
+
+        # shape, orientation, selection of the dataset and sampled values avoid collisions between transposed, sliced or edited frames
+        fingerprint = get_column_fingerprint(dataframe, column_index)
+        if fingerprint is None:
+            return None
+        extra = "{}:{}:{}:{}:{}".format(dataframe.shape, source.get("transposed", False), source.get("rows"), source.get("columns"), fingerprint)
+
+        return self.makeKey(source["file_path"], source["hdf5_path"], column, n_points, dtype, transform=transform, extra=extra)
+
+    #----------------------------------------------#
+
+    def load(self, key):
+
+        # check key
+        if key is None:
+            return None
+
+        # check the entry is complete
+        entry_dir = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_dir, META_FILE_NAME)
+        if not os.path.isfile(meta_path):
+            return None
+
+        # memory map every level
+        try:
+            with open(meta_path, "r") as meta_file:
+                meta = json.load(meta_file)
+            cache = {}
+            for ds in meta["levels"]:
+                cache[int(ds)] = np.load(os.path.join(entry_dir, "ds_{}.npy".format(ds)), mmap_mode="r")
+        except Exception as xcp:
+            print("Exception at DownsampleCacheStore.load: {}".format(xcp))
+            return None
+
+        # touch meta file (used for the lru pruning)
+        try:
+            os.utime(meta_path, None)
+        except Exception:
+            pass
+
+        return cache
+
+    #----------------------------------------------#
+
+    def save(self, key, cache):
+
+        # check key
+        if key is None or not cache:
+            return False
+
+        # write into a temporary folder first and rename at the end (readers never see partial entries)
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            return True
+        tmp_dir = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix=key + "_", dir=self.cache_dir)
+            for ds, level in cache.items():
+                np.save(os.path.join(tmp_dir, "ds_{}.npy".format(ds)), np.asarray(level))
+            with open(os.path.join(tmp_dir, META_FILE_NAME), "w") as meta_file:
+                json.dump({"levels": [int(ds) for ds in cache.keys()]}, meta_file)
+            os.rename(tmp_dir, entry_dir)
+        except Exception as xcp:
+            print("Exception at DownsampleCacheStore.save: {}".format(xcp))
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        # keep the store under the size limit
+        self.prune()
+
+        return True
+
+    #----------------------------------------------#
+
+    def prune(self):
+
+        # one prune at a time (the entries may be renamed or removed by other workers while walking the store)
+        with prune_lock:
+            try:
+                self.pruneEntries()
+            except Exception as xcp:
+                print("Exception at DownsampleCacheStore.prune: {}".format(xcp))
+
+        return
+
+    #----------------------------------------------#
+
+    def pruneEntries(self):
+
+        # check dir
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        # collect entries with their size and last access (entries that vanish in the meantime are skipped)
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if not entry.is_dir():
+                    continue
+                meta_path = os.path.join(entry.path, META_FILE_NAME)
+                if not os.path.isfile(meta_path):
+                    continue
+                entry_size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                last_access = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((last_access, entry_size, entry.path))
+            total_size += entry_size
+
+        # remove least recently used entries until the limit is respected
+        max_size = self.max_size_in_mb * 1024 ** 2
+        for last_access, entry_size, entry_path in sorted(entries):
+            if total_size <= max_size:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= entry_size
+
+        return
+
+#################################################################
+#################################################################
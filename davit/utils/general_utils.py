@@ -164,6 +164,58 @@ def get_index_type(attributes = None, df = None, return_dtype_otherwise = False)
 #################################################################
 #################################################################
 
+# parsed datetime indexes (keyed by the id of the pandas index, removed when the index is garbage collected)
+DATETIME_INDEX_CACHE = {}
+
+def get_datetime_index_cache(index, str_format = '%Y-%m-%dT%H:%M:%S.%f000', timezone = 'Etc/GMT-2'):
+
+    # cache hit (transposing or slicing a dataframe creates a new index object and therefore a new entry)
+    key = id(index)
+    entry = DATETIME_INDEX_CACHE.get(key, None)
+    if entry is not None and entry["ref"]() is index:
+        return entry
+
+    # parse only once
+    if isinstance(index, pd.DatetimeIndex):
+        parsed_index = index
+    else:
+        parsed_index = pd.to_datetime(index, format=str_format)
+    if parsed_index.tz is None:
+        parsed_index = parsed_index.tz_localize(timezone)
+
+    # callback removing the entry once the index dies
+    def remove_entry(ref, key = key):
+        if DATETIME_INDEX_CACHE.get(key, {}).get("ref", None) is ref:
+            del DATETIME_INDEX_CACHE[key]
+
+    # store as int64 epoch nanoseconds (seconds are derived lazily)
+    entry = {"ref": weakref.ref(index, remove_entry), "ns": parsed_index.asi8, "s": None}
+    DATETIME_INDEX_CACHE[key] = entry
+
+    return entry
+
+#################################################################
+#################################################################
+
+def get_datetime_index_ns(index):
+
+    return get_datetime_index_cache(index)["ns"]
+
+#################################################################
+#################################################################
+
+def get_datetime_index_seconds(index):
+
+    # integer epoch seconds (as used by the date axis of the small data plots)
+    entry = get_datetime_index_cache(index)
+    if entry["s"] is None:
+        entry["s"] = entry["ns"] // 10**9
+
+    return entry["s"]
+
+#################################################################
+#################################################################
+
 def columnNameFormatting(df):
 
     # init
@@ -0,0 +1,288 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+from davit.utils.hdf5_lazy_dataframe import is_lazy_loadable_dataset, get_chunk_aligned_block_rows
+from davit.utils.hdf5_save_dataframe import HDF5DataFrameHandler
+from davit.utils.hdf5_read_profiles import open_hdf5_file
+from davit.utils.performance_log import performance_log
+import time
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# dataframe groups smaller than this are always read entirely
+DEFERRED_COLUMNS_MIN_BYTES = 64 * 1024 ** 2
+
+# target size (in bytes) of the chunk aligned blocks read when selecting columns
+COLUMN_BLOCK_SIZE_IN_BYTES = 64 * 1024 ** 2
+
+# key of the dataframe attrs describing the columns that are still on disk
+DEFERRED_COLUMNS_KEY = "deferred_columns"
+
+#################################################################
+#################################################################
+
+def is_column_selectable_dataset(node):
+
+    # only plain 2d numeric datasets can be read column by column
+    return is_lazy_loadable_dataset(node) and node.ndim == 2
+
+#################################################################
+#################################################################
+
+def get_column_runs(column_positions):
+
+    # group sorted positions into runs of consecutive columns [start, stop)
+    runs = []
+    for position in column_positions:
+        position = int(position)
+        if runs and runs[-1][1] == position:
+            runs[-1][1] = position + 1
+        else:
+            runs.append([position, position + 1])
+
+    return [tuple(run) for run in runs]
+
+#################################################################
+#################################################################
+
+def get_chunk_aligned_column_bands(node, runs):
+
+    # widen every run to the chunk boundaries and merge the runs sharing chunks (every chunk is decompressed only once)
+    chunk_columns = node.chunks[1]
+    n_columns = node.shape[1]
+    bands = []
+    for start, stop in runs:
+        band_start = (start // chunk_columns) * chunk_columns
+        band_stop = min(-(-stop // chunk_columns) * chunk_columns, n_columns)
+        if bands and band_start < bands[-1][1]:
+            bands[-1][1] = max(bands[-1][1], band_stop)
+            bands[-1][2].append((start, stop))
+        else:
+            bands.append([band_start, band_stop, [(start, stop)]])
+
+    return bands
+
+#################################################################
+#################################################################
+
+def read_dataset_columns(node, column_positions, progress_callback = None):
+
+    # read every requested column once (sorted), the output follows the requested order
+    positions = np.asarray(column_positions, dtype=np.int64)
+    unique_positions, inverse = np.unique(positions, return_inverse=True)
+    n_rows = node.shape[0]
+    array = np.empty((n_rows, unique_positions.size), dtype=node.dtype)
+    if unique_positions.size == 0 or n_rows == 0:
+        return array[:, inverse]
+
+    # column of the output where every run starts
+    runs = get_column_runs(unique_positions)
+    dest_starts = {}
+    dest = 0
+    for start, stop in runs:
+        dest_starts[start] = dest
+        dest += stop - start
+
+    # contiguous datasets: one strided hyperslab per run
+    if node.chunks is None:
+        for counter, (start, stop) in enumerate(runs):
+            dest = dest_starts[start]
+            node.read_direct(array, source_sel=np.s_[:, start:stop], dest_sel=np.s_[:, dest:dest + stop - start])
+            if progress_callback:
+                progress_callback(counter + 1, len(runs))
+
+    # chunked datasets: chunk aligned blocks of every band of columns, copying only the requested ones
+    else:
+        bands = get_chunk_aligned_column_bands(node, runs)
+        for counter, (band_start, band_stop, band_runs) in enumerate(bands):
+            block_rows = get_chunk_aligned_block_rows(node, block_size_in_bytes=COLUMN_BLOCK_SIZE_IN_BYTES, n_columns=band_stop - band_start)
+            block = np.empty((min(block_rows, n_rows), band_stop - band_start), dtype=node.dtype)
+            for row_start in range(0, n_rows, block_rows):
+                row_stop = min(row_start + block_rows, n_rows)
+                n_block_rows = row_stop - row_start
+                node.read_direct(block, source_sel=np.s_[row_start:row_stop, band_start:band_stop], dest_sel=np.s_[0:n_block_rows, :])
+                for start, stop in band_runs:
+                    dest = dest_starts[start]
+                    array[row_start:row_stop, dest:dest + stop - start] = block[0:n_block_rows, start - band_start:stop - band_start]
+            if progress_callback:
+                progress_callback(counter + 1, len(bands))
+
+    # back to the requested order (no copy when it was already sorted and unique)
+    if positions.size == unique_positions.size and np.array_equal(positions, unique_positions):
+        return array
+
+    return array[:, inverse]
+
+#################################################################
+#################################################################
+
+def read_group_columns(data_node, column_positions):
+
+    # one typed dataset per column (written by the streaming writer)
+    if isinstance(data_node, h5py.Group):
+        frame = HDF5DataFrameHandler.read_column_layout(data_node, column_indexes=[int(position) for position in column_positions])
+        return [frame.iloc[:, counter].to_numpy() for counter in range(frame.shape[1])]
+
+    # single 2d dataset
+    array = read_dataset_columns(data_node, column_positions)
+
+    return [array[:, counter] for counter in range(array.shape[1])]
+
+#################################################################
+#################################################################
+
+def get_file_stat(file_path):
+
+    # mtime and size identify a version of the file
+    try:
+        file_stat = os.stat(file_path)
+    except Exception:
+        return None
+
+    return [file_stat.st_mtime_ns, file_stat.st_size]
+
+#################################################################
+#################################################################
+
+def set_deferred_columns(df, columns, loaded_positions, file_path, read_profile = "default"):
+
+    # remember the full list of columns and which of them are in the dataframe (plain values, the attrs are copied by pandas)
+    df.attrs[DEFERRED_COLUMNS_KEY] = {
+        "columns": [str(column) for column in columns],
+        "loaded_positions": [int(position) for position in loaded_positions],
+        "file_stat": get_file_stat(file_path),
+        "read_profile": read_profile,
+    }
+
+    return
+
+#################################################################
+#################################################################
+
+def get_deferred_columns(df):
+
+    # only dataframes read column by column (and not transposed afterwards)
+    info = df.attrs.get(DEFERRED_COLUMNS_KEY, None)
+    source = df.attrs.get("source", None)
+    if not info or not source or source.get("transposed", False):
+        return None
+
+    return info
+
+#################################################################
+#################################################################
+
+def slice_deferred_columns(df, sliced_df, row_slice, column_slice):
+
+    # nothing to do for dataframes read at once
+    info = get_deferred_columns(df)
+    if not info:
+        return
+
+    # a column slice only keeps some of the columns, so the sliced frame no longer reads the rest
+    if slice(*column_slice).indices(len(df.columns)) != (0, len(df.columns), 1):
+        sliced_df.attrs.pop(DEFERRED_COLUMNS_KEY, None)
+        return
+
+    # rows of the file kept by the slice (composed with the slices applied before), so the columns read later match them
+    rows = range(*info.get("rows", [0, len(df), 1]))[slice(*row_slice)]
+    sliced_df.attrs[DEFERRED_COLUMNS_KEY] = dict(info, loaded_positions=list(info["loaded_positions"]), rows=[rows.start, rows.stop, rows.step])
+
+    return
+
+#################################################################
+#################################################################
+
+def get_selectable_columns(df):
+
+    # every column of the hdf5 group (also the ones not read yet)
+    info = get_deferred_columns(df)
+    if info:
+        return list(info["columns"])
+
+    return list(df.columns.astype(str))
+
+#################################################################
+#################################################################
+
+def load_deferred_columns(df, column_positions):
+
+    # positions (in the full list of columns) that are not in the dataframe yet
+    info = get_deferred_columns(df)
+    if not info:
+        return []
+    missing_positions = [int(position) for position in sorted(set(column_positions)) if int(position) not in info["loaded_positions"]]
+    if not missing_positions:
+        return []
+
+    # check that the file has not been rewritten since the dataframe was created
+    source = df.attrs["source"]
+    if get_file_stat(source["file_path"]) != info["file_stat"]:
+        print("Exception at load_deferred_columns: {} has changed on disk, the columns {} cannot be read".format(source["file_path"], missing_positions))
+        return []
+
+    # read the columns
+    start_time = time.perf_counter()
+    try:
+        h5_file, options = open_hdf5_file(source["file_path"], info["read_profile"])
+        with h5_file:
+            values = read_group_columns(h5_file[source["hdf5_path"]]["data"], missing_positions)
+    except Exception as xcp:
+        print("Exception at load_deferred_columns: {}".format(xcp))
+        return []
+
+    # append them to the dataframe (in place, so every tab sharing it sees them), only keeping the rows of sliced frames
+    loaded_positions = []
+    for position, column_values in zip(missing_positions, values):
+        if "rows" in info:
+            column_values = column_values[slice(*info["rows"])]
+        if len(column_values) != len(df):
+            print("Exception at load_deferred_columns: column {} has {} rows and the dataframe {}".format(info["columns"][position], len(column_values), len(df)))
+            continue
+        df[info["columns"][position]] = column_values
+        info["loaded_positions"].append(position)
+        loaded_positions.append(position)
+
+    # performance log
+    performance_log.record("hdf5_load_deferred_columns", file_path=source["file_path"], hdf5_path=source["hdf5_path"], n_columns=len(loaded_positions), read_profile=info["read_profile"], elapsed_s=round(time.perf_counter() - start_time, 6))
+
+    return loaded_positions
+
+#################################################################
+#################################################################
+
+def map_deferred_selection(df, column_positions, names, axis_list):
+
+    # translate positions of the full list of columns into positions of the dataframe by name (derived frames keep the attrs
+    # but not necessarily the columns, so the ones that are not in the dataframe are dropped)
+    info = get_deferred_columns(df)
+    if not info:
+        return column_positions, names, axis_list
+    mapped_positions, mapped_names, mapped_axis_list = [], [], []
+    for position, name, axis in zip(column_positions, names, axis_list):
+        try:
+            df_position = df.columns.get_loc(info["columns"][position])
+        except (KeyError, IndexError):
+            continue
+        if not isinstance(df_position, (int, np.integer)):
+            continue
+        mapped_positions.append(int(df_position))
+        mapped_names.append(name)
+        mapped_axis_list.append(axis)
+
+    return mapped_positions, mapped_names, mapped_axis_list
+
+#################################################################
+#################################################################
@@ -0,0 +1,328 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+from davit.utils.hdf5_read_profiles import open_hdf5_file
+from davit.utils.performance_log import performance_log
+import time
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# default limits (overwritten by the settings)
+DEFAULT_MAX_OPEN_FILES = 64
+DEFAULT_METADATA_CACHE_MB = 128
+
+# limits of the hdf5 metadata cache of a single file (H5C__MIN_MAX_CACHE_SIZE and H5C__MAX_MAX_CACHE_SIZE)
+MIN_METADATA_CACHE_BYTES = 1024
+MAX_METADATA_CACHE_BYTES = 128 * 1024 * 1024
+
+# minimum time (in seconds) between two mtime/size checks of the same file
+STAT_CHECK_INTERVAL = 1.0
+
+#################################################################
+#################################################################
+
+class HDF5FilePool:
+    """
+    Bounded pool of open h5py files, used in place of the old hdf_dict (same "in", [] and get() access).
+    The least recently used files are closed when there are too many open and reopened transparently when accessed again.
+    Files rewritten on disk (different mtime or size) are reopened too.
+    Files that still have open objects (e.g. nodes or attributes used by a window) are never closed by the eviction.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, max_open_files = DEFAULT_MAX_OPEN_FILES, metadata_cache_mb = DEFAULT_METADATA_CACHE_MB, read_profile = "default"):
+
+        # limits and read options
+        self.max_open_files = max(1, int(max_open_files))
+        self.metadata_cache_mb = metadata_cache_mb
+        self.read_profile = read_profile
+
+        # open files (least recently used first), stat when they were opened and last check
+        self.handles = collections.OrderedDict()
+        self.file_stats = {}
+        self.last_checks = {}
+
+        # files that could not be opened
+        self.errors = {}
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.reopens = 0
+        self.evictions = 0
+
+        return
+
+    #----------------------------------------------#
+
+    def configure(self, max_open_files = None, metadata_cache_mb = None, read_profile = None):
+
+        # update limits (applied to the files opened from now on)
+        if max_open_files is not None:
+            self.max_open_files = max(1, int(max_open_files))
+        if metadata_cache_mb is not None:
+            self.metadata_cache_mb = metadata_cache_mb
+
+        # a new read profile needs the files to be opened again (the ones in use are only released)
+        if read_profile is not None and read_profile != self.read_profile:
+            self.read_profile = read_profile
+            for path in list(self.handles.keys()):
+                self.close_handle(path, force = False)
+
+        # close the files above the new limit
+        self.evict()
+
+        return
+
+    #----------------------------------------------#
+
+    def __contains__(self, path):
+
+        # known files (open, evicted or failed)
+        return path in self.file_stats or path in self.errors
+
+    #----------------------------------------------#
+
+    def __getitem__(self, path):
+
+        # files that could not be opened
+        if path in self.errors:
+            return None
+
+        # unknown files
+        if path not in self.file_stats:
+            raise KeyError(path)
+
+        return self.get_file(path)
+
+    #----------------------------------------------#
+
+    def get(self, path, default = None):
+
+        if path not in self:
+            return default
+
+        return self[path]
+
+    #----------------------------------------------#
+
+    def keys(self):
+
+        return list(self.file_stats.keys()) + list(self.errors.keys())
+
+    #----------------------------------------------#
+
+    def values(self):
+
+        # only the files that are open at the moment
+        return list(self.handles.values())
+
+    #----------------------------------------------#
+
+    def open_file(self, path):
+
+        # forget previous errors and open the file
+        self.errors.pop(path, None)
+        try:
+            self.get_file(path, count = False)
+        except Exception as xcp:
+            print("Exception at {} for path {}: {}".format("HDF5FilePool.open_file", path, xcp))
+            self.forget(path)
+            self.errors[path] = xcp
+            return xcp
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_file(self, path, count = True):
+
+        # check if the file was rewritten underneath us (at most once per interval)
+        handle = self.handles.get(path)
+        now = time.monotonic()
+        if handle is not None and now - self.last_checks.get(path, 0) >= STAT_CHECK_INTERVAL:
+            self.last_checks[path] = now
+            if self.get_file_stat(path) != self.file_stats.get(path):
+                self.close_handle(path)
+                handle = None
+                self.reopens += 1
+
+        # hit
+        if handle is not None and handle.id.valid:
+            if count:
+                self.hits += 1
+            self.handles.move_to_end(path)
+            return handle
+
+        # miss (first access, evicted or closed)
+        if count:
+            self.misses += 1
+        start_time = time.perf_counter()
+        try:
+            handle, options = open_hdf5_file(path, self.read_profile)
+        except Exception as xcp:
+            if path in self.file_stats:
+                print("Exception at {} for path {}: {}".format("HDF5FilePool.get_file", path, xcp))
+                return None
+            raise
+        self.configure_metadata_cache(handle)
+
+        # record the options used to open the file
+        performance_log.record("hdf5_file_open", file_path=path, read_profile=self.read_profile, options=options, elapsed_s=round(time.perf_counter() - start_time, 6), pool_stats=self.get_stats())
+
+        # store
+        self.handles[path] = handle
+        self.file_stats[path] = self.get_file_stat(path)
+        self.last_checks[path] = now
+
+        # keep the limit
+        self.evict()
+
+        return handle
+
+    #----------------------------------------------#
+
+    def get_file_stat(self, path):
+
+        # mtime and size identify a version of the file
+        try:
+            file_stat = os.stat(path)
+        except Exception:
+            return None
+
+        return (file_stat.st_mtime_ns, file_stat.st_size)
+
+    #----------------------------------------------#
+
+    def configure_metadata_cache(self, handle):
+
+        # share the metadata memory between the open files
+        max_bytes = int(self.metadata_cache_mb * 1024 * 1024 / self.max_open_files)
+        max_bytes = min(max(max_bytes, MIN_METADATA_CACHE_BYTES), MAX_METADATA_CACHE_BYTES)
+
+        # the initial size is also limited, so small limits are respected from the start
+        try:
+            config = handle.id.get_mdc_config()
+            config.set_initial_size = True
+            config.initial_size = max_bytes
+            config.min_size = min(config.min_size, max_bytes)
+            config.max_size = max_bytes
+            handle.id.set_mdc_config(config)
+        except Exception as xcp:
+            print("Exception at HDF5FilePool.configure_metadata_cache: {}".format(xcp))
+
+        return
+
+    #----------------------------------------------#
+
+    def is_in_use(self, handle):
+
+        # objects opened from the file (the file itself counts as one)
+        try:
+            return handle.id.valid and handle.id.get_obj_count() > 1
+        except Exception:
+            return False
+
+    #----------------------------------------------#
+
+    def evict(self):
+
+        # close the least recently used files that are not in use
+        # (the most recently used file is the one being accessed, it is never closed here)
+        n_open = len(self.handles)
+        for path in list(self.handles.keys())[:-1]:
+            if n_open <= self.max_open_files:
+                break
+            if self.is_in_use(self.handles[path]):
+                continue
+            self.close_handle(path)
+            self.evictions += 1
+            n_open -= 1
+            performance_log.record("hdf5_file_evict", file_path=path, pool_stats=self.get_stats())
+
+        return
+
+    #----------------------------------------------#
+
+    def close_handle(self, path, force = True):
+
+        # close the file (files in use are only released unless forced)
+        handle = self.handles.pop(path, None)
+        if handle is not None and (force or not self.is_in_use(handle)):
+            try:
+                handle.close()
+            except Exception as xcp:
+                print("Exception at HDF5FilePool.close_handle for path {}: {}".format(path, xcp))
+
+        return
+
+    #----------------------------------------------#
+
+    def forget(self, path):
+
+        # remove every trace of the file
+        self.close_handle(path)
+        self.file_stats.pop(path, None)
+        self.last_checks.pop(path, None)
+        self.errors.pop(path, None)
+
+        return
+
+    #----------------------------------------------#
+
+    def clear(self):
+
+        # release every file (files still used by other windows are left open for them)
+        for path in list(self.handles.keys()):
+            self.close_handle(path, force = False)
+        self.file_stats = {}
+        self.last_checks = {}
+        self.errors = {}
+
+        return
+
+    #----------------------------------------------#
+
+    def close_all(self):
+
+        # close every file
+        for path in list(self.handles.keys()):
+            self.close_handle(path)
+        self.clear()
+
+        return
+
+    #----------------------------------------------#
+
+    def get_stats(self):
+
+        # counters of the pool
+        stats = {
+            "read_profile": self.read_profile,
+            "open_files": len(self.handles),
+            "known_files": len(self.file_stats),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reopens": self.reopens,
+            "evictions": self.evictions,
+        }
+
+        return stats
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,201 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# kinds of attribute conditions
+CONDITION_PRESENCE = "presence"
+CONDITION_INTERVAL = "interval"
+CONDITION_EXACT = "exact"
+
+#################################################################
+#################################################################
+
+def compile_pattern(pattern):
+
+    # empty patterns do not filter anything
+    if not pattern:
+        return None
+
+    # invalid expressions are searched literally
+    try:
+        re_object = re.compile("{}".format(pattern))
+    except re.error as xcp:
+        print("Exception at compile_pattern for pattern {}: {} (searching it literally)".format(pattern, xcp))
+        re_object = re.compile(re.escape(pattern))
+
+    return re_object
+
+#################################################################
+#################################################################
+
+def compile_attribute_conditions(attribute_filters):
+
+    # parse every filtered attribute once
+    conditions = []
+    for attr_name, interval in attribute_filters.items():
+
+        # get bounds
+        lower = interval[0] if interval[0] is not None else ""
+        upper = interval[1] if interval[1] is not None else ""
+
+        # CASE 1 (INTERVAL SEARCH): bounds that are not numeric only check the presence
+        if lower != "" and upper != "":
+            try:
+                conditions.append((str(attr_name), CONDITION_INTERVAL, (float(lower), float(upper))))
+            except Exception as xcp:
+                print("Exception at compile_attribute_conditions for attribute {}: {}".format(attr_name, xcp))
+                conditions.append((str(attr_name), CONDITION_PRESENCE, None))
+
+        # CASE 2 (EXACT KEY VALUE)
+        elif lower != "":
+            conditions.append((str(attr_name), CONDITION_EXACT, str(lower).lower()))
+
+        # CASE 3 (ONLY PRESENCE)
+        else:
+            conditions.append((str(attr_name), CONDITION_PRESENCE, None))
+
+    return conditions
+
+#################################################################
+#################################################################
+
+class CompiledFilter:
+
+    def __init__(self, filters):
+
+        # precompiled regular expressions
+        self.dir_regex = compile_pattern(filters["path"]["dir"])
+        self.hdf5_regex = compile_pattern(filters["path"]["hdf5"])
+
+        # pre-parsed attribute conditions
+        self.attribute_conditions = {}
+        for type in ["group", "dataset"]:
+            self.attribute_conditions[type] = compile_attribute_conditions(filters["attributes"][type])
+
+        return
+
+    #----------------------------------------------#
+
+    def has_attribute_conditions(self, type):
+
+        return len(self.attribute_conditions[type]) > 0
+
+    #----------------------------------------------#
+
+    def match_hdf5_path(self, hdf5_path, subpath):
+
+        # only if there is a pattern and the node is inside a file
+        if self.hdf5_regex is None or not hdf5_path:
+            return True
+
+        return self.hdf5_regex.search(subpath) is not None
+
+    #----------------------------------------------#
+
+    def match_dir_path(self, full_path, hdf5_path):
+
+        # only if there is a pattern
+        if self.dir_regex is None:
+            return True
+
+        # nodes inside a file are matched with the file path
+        subpath = hdf5_path if hdf5_path else (full_path if full_path else "")
+
+        return self.dir_regex.search(subpath) is not None
+
+    #----------------------------------------------#
+
+    def match_paths(self, full_path, hdf5_path, subpath):
+
+        return self.match_hdf5_path(hdf5_path, subpath) and self.match_dir_path(full_path, hdf5_path)
+
+    #----------------------------------------------#
+
+    def match_regex_batch(self, re_object, strings):
+
+        # every distinct string is searched only once (node names repeat a lot across files)
+        unique_strings, inverse = np.unique(np.asarray(strings, dtype=object).astype(str), return_inverse=True)
+        unique_matches = np.fromiter((re_object.search(string) is not None for string in unique_strings), dtype=bool, count=len(unique_strings))
+
+        return unique_matches[inverse]
+
+    #----------------------------------------------#
+
+    def match_paths_batch(self, full_paths, hdf5_paths, subpaths):
+
+        # init
+        n_nodes = len(full_paths)
+        mask = np.ones(n_nodes, dtype=bool)
+        if n_nodes == 0:
+            return mask
+        hdf5_paths = np.asarray(hdf5_paths, dtype=object)
+        in_file = hdf5_paths != ""
+
+        # hdf5 pattern (only nodes inside a file)
+        if self.hdf5_regex is not None and in_file.any():
+            mask[in_file] &= self.match_regex_batch(self.hdf5_regex, np.asarray(subpaths, dtype=object)[in_file])
+
+        # dir pattern (file path for the nodes inside a file, full path otherwise)
+        if self.dir_regex is not None:
+            dir_subpaths = np.where(in_file, hdf5_paths, np.asarray(full_paths, dtype=object))
+            mask &= self.match_regex_batch(self.dir_regex, dir_subpaths)
+
+        return mask
+
+    #----------------------------------------------#
+
+    def match_attributes(self, node_attrs, type):
+
+        # no conditions
+        conditions = self.attribute_conditions[type]
+        if not conditions:
+            return True
+
+        # every filtered attribute must exist
+        attr_names = node_attrs.keys()
+        for attr_name, kind, argument in conditions:
+            if attr_name not in attr_names:
+                return False
+            if kind == CONDITION_PRESENCE:
+                continue
+
+            # convert from bytes to string
+            try:
+                at = fromBytesToString(node_attrs[attr_name])
+            except Exception:
+                continue
+
+            # CASE 1 (INTERVAL SEARCH): values that are not numeric are not filtered out
+            if kind == CONDITION_INTERVAL:
+                try:
+                    value = float(at)
+                except Exception:
+                    continue
+                if not (argument[0] <= value <= argument[1]):
+                    return False
+
+            # CASE 2 (EXACT KEY VALUE)
+            elif kind == CONDITION_EXACT:
+                if str(at).lower() != argument:
+                    return False
+
+        return True
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,291 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+from davit.utils.hdf5_parallel_reader import is_parallel_readable_dataset, get_read_mode, get_row_blocks, read_dataset_with_threads
+import atexit
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# target size (in bytes) of every row block copied when spilling a chunked dataset to disk
+SPILL_BLOCK_SIZE_IN_BYTES = 64 * 1024 ** 2
+
+# free space left in the temp dir after a spill (spills that do not fit are refused instead of filling the disk)
+SPILL_FREE_SPACE_MARGIN_IN_BYTES = 1024 ** 3
+
+# prefix used for the temporary spill files
+SPILL_FILE_PREFIX = "davit_lazy_"
+
+# list of spill files created during the session (removed when their map is released, or at exit)
+SPILLED_FILES = []
+
+# maps of the spill files still in use, by (file path, dataset path, file mtime), so reopening a dataset reuses its spill
+SPILLED_ARRAYS = {}
+
+#################################################################
+#################################################################
+
+def is_lazy_loadable_dataset(node):
+
+    # only plain datasets can be lazily mapped
+    if not isinstance(node, h5py.Dataset):
+        return False
+
+    # discard scalars and arrays with more than 2 dimensions
+    if node.ndim not in (1, 2) or node.size == 0:
+        return False
+
+    # discard compound, string and object dtypes
+    if node.dtype.names is not None:
+        return False
+    if not (np.issubdtype(node.dtype, np.number) or np.issubdtype(node.dtype, np.bool_)):
+        return False
+
+    return True
+
+#################################################################
+#################################################################
+
+def is_memory_mappable_dataset(node):
+
+    # contiguous datasets without filters can be mapped directly from the hdf5 file (the rest need a spill)
+    return node.chunks is None and node.compression is None and node.scaleoffset is None
+
+#################################################################
+#################################################################
+
+def memory_map_dataset(node):
+
+    # contiguous datasets without filters can be mapped directly from the hdf5 file
+    if not is_memory_mappable_dataset(node):
+        return None
+
+    # get offset inside the file (None if the dataset has not been allocated yet)
+    try:
+        offset = node.id.get_offset()
+    except Exception as xcp:
+        print("Exception at memory_map_dataset: {}".format(xcp))
+        return None
+    if offset is None:
+        return None
+
+    # external links or in-memory files cannot be mapped
+    file_path = node.file.filename
+    if not os.path.isfile(file_path):
+        return None
+
+    # create the read only memory map
+    try:
+        array = np.memmap(file_path, mode="r", dtype=node.dtype, offset=offset, shape=node.shape, order="C")
+    except Exception as xcp:
+        print("Exception at memory_map_dataset: {}".format(xcp))
+        return None
+
+    return array
+
+#################################################################
+#################################################################
+
+def get_chunk_aligned_block_rows(node, block_size_in_bytes = SPILL_BLOCK_SIZE_IN_BYTES, n_columns = None):
+
+    # number of bytes per row (all the columns unless only some of them are read)
+    if n_columns is None:
+        n_columns = node.shape[1] if node.ndim == 2 else 1
+    row_size_in_bytes = node.dtype.itemsize * n_columns
+
+    # rows that fit in one block
+    block_rows = max(1, block_size_in_bytes // max(1, row_size_in_bytes))
+
+    # round to a multiple of the chunk rows so that every chunk is decompressed only once
+    if node.chunks:
+        chunk_rows = node.chunks[0]
+        block_rows = max(chunk_rows, (block_rows // chunk_rows) * chunk_rows)
+
+    return int(block_rows)
+
+#################################################################
+#################################################################
+
+def get_spill_key(node):
+
+    # datasets are identified by their file, their path and the last modification of the file
+    try:
+        file_path = os.path.realpath(node.file.filename)
+        return (file_path, node.name, os.stat(file_path).st_mtime_ns)
+    except Exception:
+        return None
+
+#################################################################
+#################################################################
+
+def remove_spill_file(spill_key, spill_path):
+
+    # called when the map of the spill is released (kept in the list for the exit cleanup if it cannot be removed yet)
+    if SPILLED_ARRAYS.get(spill_key, (None, None))[1] == spill_path:
+        SPILLED_ARRAYS.pop(spill_key, None)
+    try:
+        os.remove(spill_path)
+    except Exception:
+        return
+    if spill_path in SPILLED_FILES:
+        SPILLED_FILES.remove(spill_path)
+
+    return
+
+#################################################################
+#################################################################
+
+def has_space_for_spill(node):
+
+    # free space of the temp dir for the decompressed dataset plus a margin
+    try:
+        free_bytes = shutil.disk_usage(getSystemTempDir()).free
+    except Exception:
+        return False
+
+    return free_bytes >= node.size * node.dtype.itemsize + SPILL_FREE_SPACE_MARGIN_IN_BYTES
+
+#################################################################
+#################################################################
+
+def copy_dataset_to_array(node, array, n_workers = 1, progress_callback = None):
+
+    # chunks decoded in python are decompressed by several threads straight into the map
+    if n_workers > 1 and node.chunks is not None and is_parallel_readable_dataset(node) and get_read_mode(node) == "threads":
+        try:
+            read_dataset_with_threads(node, array, get_row_blocks(node), n_workers, progress_callback=progress_callback)
+            return
+        except Exception as xcp:
+            print("Exception at copy_dataset_to_array (reading {} sequentially): {}".format(node.name, xcp))
+
+    # otherwise chunk aligned row blocks one after the other (only one block lives in memory at a time)
+    n_rows = node.shape[0]
+    block_rows = get_chunk_aligned_block_rows(node)
+    n_blocks = -(-n_rows // block_rows)
+    for counter, start in enumerate(range(0, n_rows, block_rows)):
+        stop = min(start + block_rows, n_rows)
+        node.read_direct(array, source_sel=np.s_[start:stop], dest_sel=np.s_[start:stop])
+        if progress_callback:
+            progress_callback(counter + 1, n_blocks)
+
+    return
+
+#################################################################
+#################################################################
+
+def spill_dataset_to_memmap(node, progress_callback = None, n_workers = 1):
+
+    # reuse the spill of the same dataset while any frame still holds it
+    spill_key = get_spill_key(node)
+    if spill_key in SPILLED_ARRAYS:
+        array = SPILLED_ARRAYS[spill_key][0]()
+        if array is not None:
+            return array
+
+    # check that there is enough disk space for the spill file
+    tmp_dir = getSystemTempDir()
+    if not has_space_for_spill(node):
+        print("Exception at spill_dataset_to_memmap: not enough free space in {} for {}".format(tmp_dir, node.name))
+        return None
+
+    # create temporary file
+    file_descriptor, spill_path = tempfile.mkstemp(prefix=SPILL_FILE_PREFIX, suffix=".npy", dir=tmp_dir)
+    os.close(file_descriptor)
+    SPILLED_FILES.append(spill_path)
+
+    # create the writable map and copy the dataset into it
+    try:
+        array = np.lib.format.open_memmap(spill_path, mode="w+", dtype=node.dtype, shape=node.shape)
+        copy_dataset_to_array(node, array, n_workers=n_workers, progress_callback=progress_callback)
+
+        # flush and reopen as read only
+        array.flush()
+        del array
+        array = np.load(spill_path, mmap_mode="r")
+    except Exception as xcp:
+        print("Exception at spill_dataset_to_memmap: {}".format(xcp))
+        array = None
+        remove_spill_file(spill_key, spill_path)
+        return None
+
+    # the file is removed as soon as the map (and every frame or view built on it) is released
+    weakref.finalize(array, remove_spill_file, spill_key, spill_path)
+    if spill_key is not None:
+        SPILLED_ARRAYS[spill_key] = (weakref.ref(array), spill_path)
+
+    return array
+
+#################################################################
+#################################################################
+
+def remove_spilled_files():
+
+    # remove every spill file created during the session
+    SPILLED_ARRAYS.clear()
+    while SPILLED_FILES:
+        spill_path = SPILLED_FILES.pop()
+        try:
+            os.remove(spill_path)
+        except Exception as xcp:
+            print("Exception at remove_spilled_files: {}".format(xcp))
+
+    return
+
+atexit.register(remove_spilled_files)
+
+#################################################################
+#################################################################
+
+def create_lazy_array(node, allow_spill = True, progress_callback = None, n_workers = 1):
+
+    # check the dataset is compatible
+    if not is_lazy_loadable_dataset(node):
+        return None
+
+    # try to map the dataset directly
+    array = memory_map_dataset(node)
+
+    # chunked or compressed datasets are decompressed block by block into a temporary map
+    if array is None and allow_spill:
+        array = spill_dataset_to_memmap(node, progress_callback=progress_callback, n_workers=n_workers)
+
+    # expand 1d arrays (view, no copy)
+    if array is not None and array.ndim == 1:
+        array = array.reshape(-1, 1)
+
+    return array
+
+#################################################################
+#################################################################
+
+def create_lazy_dataframe(node, columns = None, index = None, allow_spill = True, progress_callback = None, n_workers = 1):
+
+    # get the lazy array
+    array = create_lazy_array(node, allow_spill=allow_spill, progress_callback=progress_callback, n_workers=n_workers)
+    if array is None:
+        return None
+
+    # default labels
+    if columns is None:
+        columns = np.arange(0, array.shape[1]).astype(str)
+    if index is None:
+        index = pd.RangeIndex(0, array.shape[0])
+
+    # wrap the map without copying (pages are only read when a window is requested)
+    df = pd.DataFrame(array, columns=columns, index=index, copy=False)
+
+    return df
+
+#################################################################
+#################################################################
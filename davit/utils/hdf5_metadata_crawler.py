@@ -0,0 +1,167 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# this module is imported by every worker process of the crawler, so it only imports what the workers need
+# (importing davit.__imports__ would load qt, pytimber, scipy... in each process)
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import h5py
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# default number of worker processes
+DEFAULT_N_WORKERS = 4
+
+#################################################################
+#################################################################
+
+def get_df_node_shape(node):
+
+    # init variables
+    boolean = False
+    shape = None
+
+    # data type should be DataFrame and node should be Group
+    if isinstance(node, h5py.Group):
+        if "data_type" in node.attrs.keys():
+            data_type = node.attrs["data_type"]
+            if isinstance(data_type, bytes):
+                data_type = data_type.decode('utf-8')
+            if data_type == "DataFrame":
+                boolean = True
+                if "data" in node.keys():
+                    child = node["data"]
+                    if isinstance(child, h5py.Dataset):
+                        shape = child.shape
+                    elif isinstance(child, h5py.Group) and "shape" in child.attrs.keys():
+                        shape = tuple(int(x) for x in child.attrs["shape"])
+
+    return boolean, shape
+
+#################################################################
+#################################################################
+
+def get_attribute_record(node_id, position, name, value):
+
+    # same conversion as fromBytesToString (used by the tooltips and the attribute filters)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    value_text = "{}".format(value)
+
+    # numeric value (None if it cannot be converted, the interval filter lets those pass)
+    try:
+        value_num = float(value)
+        if math.isnan(value_num):
+            value_num = None
+    except Exception:
+        value_num = None
+
+    return (node_id, position, str(name), value_text, value_text.lower(), value_num)
+
+#################################################################
+#################################################################
+
+def read_file_records(file_path):
+
+    # init records (plain tuples, cheap to send back from the worker processes)
+    records = {"file_path": file_path, "mtime_ns": None, "size": None, "nodes": [], "attrs": [], "error": None}
+    node_records = records["nodes"]
+    attr_records = records["attrs"]
+
+    # stat before reading (a file modified during the walk is read again next time)
+    try:
+        file_stat = os.stat(file_path)
+        records["mtime_ns"] = file_stat.st_mtime_ns
+        records["size"] = file_stat.st_size
+    except Exception as xcp:
+        records["error"] = str(xcp)
+        return records
+
+    # walk the file once
+    try:
+        with h5py.File(file_path, "r") as h5_file:
+
+            def visitor(name, node):
+                node_id = len(node_records)
+                if isinstance(node, h5py.Dataset):
+                    node_records.append((node.name, "dataset", str(node.shape), str(node.dtype), len(node.attrs)))
+                elif isinstance(node, h5py.Group):
+                    df_node_boolean, df_node_shape = get_df_node_shape(node)
+                    shape = str(df_node_shape) if df_node_boolean else ""
+                    node_records.append((node.name, "group", shape, "", len(node.attrs)))
+                else:
+                    return None
+                for position, attr_name in enumerate(node.attrs.keys()):
+                    try:
+                        attr_records.append(get_attribute_record(node_id, position, attr_name, node.attrs[attr_name]))
+                    except Exception as xcp:
+                        print("Exception at read_file_records for attribute {} of {}: {}".format(attr_name, node.name, xcp))
+                return None
+
+            # the root group is not visited by visititems
+            visitor("/", h5_file)
+            h5_file.visititems(visitor)
+
+    except Exception as xcp:
+        print("Exception at read_file_records for path {}: {}".format(file_path, xcp))
+        records["error"] = str(xcp)
+        records["nodes"] = []
+        records["attrs"] = []
+
+    return records
+
+#################################################################
+#################################################################
+
+class HDF5MetadataCrawler:
+
+    def __init__(self, n_workers = DEFAULT_N_WORKERS):
+
+        # init variables
+        self.n_workers = max(1, int(n_workers))
+
+        return
+
+    #----------------------------------------------#
+
+    def crawl(self, file_paths):
+
+        # serial crawl (one worker or nothing to parallelize)
+        if self.n_workers == 1 or len(file_paths) < 2:
+            for file_path in file_paths:
+                yield read_file_records(file_path)
+            return
+
+        # fan out the files over worker processes (spawn is safe with the qt threads of the parent)
+        n_workers = min(self.n_workers, len(file_paths))
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(read_file_records, file_path): file_path for file_path in file_paths}
+
+            # yield the records as soon as every file is done
+            for future in as_completed(futures):
+                try:
+                    records = future.result()
+                except Exception as xcp:
+                    print("Exception at HDF5MetadataCrawler.crawl for path {}: {}".format(futures[future], xcp))
+                    records = {"file_path": futures[future], "mtime_ns": None, "size": None, "nodes": [], "attrs": [], "error": str(xcp)}
+                yield records
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
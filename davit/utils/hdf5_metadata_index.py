@@ -0,0 +1,278 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+from davit.utils.hdf5_metadata_crawler import HDF5MetadataCrawler, read_file_records
+from davit.utils.hdf5_filter_predicate import CONDITION_INTERVAL, CONDITION_EXACT
+import sqlite3
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# name of the database file (inside the temp dir)
+INDEX_FILE_NAME = "davit_hdf5_metadata_index.sqlite"
+
+# bump when the schema changes (old databases are rebuilt)
+INDEX_SCHEMA_VERSION = 1
+
+# tables and indexes
+INDEX_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS files (file_path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, error TEXT)",
+    "CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, file_path TEXT, node_path TEXT, h5_type TEXT, shape TEXT, dtype TEXT, n_attrs INTEGER)",
+    "CREATE TABLE IF NOT EXISTS attrs (node_id INTEGER, position INTEGER, name TEXT, value_text TEXT, value_lower TEXT, value_num REAL)",
+    "CREATE INDEX IF NOT EXISTS nodes_file_path ON nodes (file_path)",
+    "CREATE INDEX IF NOT EXISTS attrs_node_name ON attrs (node_id, name)",
+    "CREATE INDEX IF NOT EXISTS attrs_name_num ON attrs (name, value_num)",
+    "CREATE INDEX IF NOT EXISTS attrs_name_lower ON attrs (name, value_lower)",
+]
+
+#################################################################
+#################################################################
+
+class HDF5MetadataIndex:
+
+    def __init__(self, db_path = None):
+
+        # init variables
+        self.db_path = db_path if db_path else os.path.join(getSystemTempDir(), INDEX_FILE_NAME)
+        self.connection = None
+
+        return
+
+    #----------------------------------------------#
+
+    def connect(self):
+
+        # reuse the connection
+        if self.connection is not None:
+            return self.connection
+
+        # open the database
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        # rebuild old databases
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_SCHEMA_VERSION:
+            for table in ["files", "nodes", "attrs"]:
+                self.connection.execute("DROP TABLE IF EXISTS {}".format(table))
+            self.connection.execute("PRAGMA user_version={}".format(INDEX_SCHEMA_VERSION))
+
+        # create tables
+        for statement in INDEX_SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+        return self.connection
+
+    #----------------------------------------------#
+
+    def close(self):
+
+        # close the database
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+        return
+
+    #----------------------------------------------#
+
+    def is_up_to_date(self, file_path, file_stat):
+
+        # compare the stored mtime and size with the current ones
+        row = self.connect().execute("SELECT mtime_ns, size FROM files WHERE file_path = ?", (file_path,)).fetchone()
+        if row is None:
+            return False
+
+        return row[0] == file_stat.st_mtime_ns and row[1] == file_stat.st_size
+
+    #----------------------------------------------#
+
+    def remove_file(self, file_path):
+
+        # remove every record of the file
+        connection = self.connect()
+        connection.execute("DELETE FROM attrs WHERE node_id IN (SELECT id FROM nodes WHERE file_path = ?)", (file_path,))
+        connection.execute("DELETE FROM nodes WHERE file_path = ?", (file_path,))
+        connection.execute("DELETE FROM files WHERE file_path = ?", (file_path,))
+
+        return
+
+    #----------------------------------------------#
+
+    def index_file(self, file_path):
+
+        # walk the file and store its records
+        records = read_file_records(file_path)
+        self.store_file_records(records)
+
+        return records["error"]
+
+    #----------------------------------------------#
+
+    def store_file_records(self, records):
+
+        # files that could not even be stat are not stored (they are tried again next time)
+        file_path = records["file_path"]
+        if records["mtime_ns"] is None:
+            return
+
+        # replace the records of the file in one transaction
+        connection = self.connect()
+        with connection:
+            self.remove_file(file_path)
+            first_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM nodes").fetchone()[0]
+            connection.executemany(
+                "INSERT INTO nodes (id, file_path, node_path, h5_type, shape, dtype, n_attrs) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(first_id + i, file_path) + record for i, record in enumerate(records["nodes"])],
+            )
+            connection.executemany(
+                "INSERT INTO attrs (node_id, position, name, value_text, value_lower, value_num) VALUES (?, ?, ?, ?, ?, ?)",
+                [(first_id + record[0],) + record[1:] for record in records["attrs"]],
+            )
+            connection.execute(
+                "INSERT INTO files (file_path, mtime_ns, size, error) VALUES (?, ?, ?, ?)",
+                (file_path, records["mtime_ns"], records["size"], records["error"]),
+            )
+
+        return
+
+    #----------------------------------------------#
+
+    def update_files(self, file_paths, progress_callback = None, n_workers = 1):
+
+        # only new or modified files are read again
+        stale_file_paths = []
+        for file_path in file_paths:
+            try:
+                file_stat = os.stat(file_path)
+            except Exception as xcp:
+                print("Exception at HDF5MetadataIndex.update_files for path {}: {}".format(file_path, xcp))
+                continue
+            if not self.is_up_to_date(file_path, file_stat):
+                stale_file_paths.append(file_path)
+            elif progress_callback:
+                progress_callback(file_path)
+
+        # crawl the stale files in parallel and store the records as they arrive
+        crawler = HDF5MetadataCrawler(n_workers=n_workers)
+        for records in crawler.crawl(stale_file_paths):
+            self.store_file_records(records)
+            if progress_callback:
+                progress_callback(records["file_path"])
+
+        return len(stale_file_paths)
+
+    #----------------------------------------------#
+
+    def remove_missing_files(self, root_path, file_paths):
+
+        # forget files under the root that do not exist anymore
+        file_paths = set(file_paths)
+        connection = self.connect()
+        with connection:
+            for (file_path,) in connection.execute(self.get_root_condition("SELECT file_path FROM files WHERE"), self.get_root_parameters(root_path)).fetchall():
+                if file_path not in file_paths:
+                    self.remove_file(file_path)
+
+        return
+
+    #----------------------------------------------#
+
+    def get_root_condition(self, statement, column = "file_path"):
+
+        # the file itself or every file below the directory (range scan over the index)
+        return "{} ({} = ? OR ({} >= ? AND {} < ?))".format(statement, column, column, column)
+
+    #----------------------------------------------#
+
+    def get_root_parameters(self, root_path):
+
+        # prefix range of the directory
+        prefix = root_path.rstrip(os.sep) + os.sep
+        prefix_end = prefix[:-1] + chr(ord(os.sep) + 1)
+
+        return (root_path, prefix, prefix_end)
+
+    #----------------------------------------------#
+
+    def get_file_error(self, file_path):
+
+        # error stored when the file could not be read
+        row = self.connect().execute("SELECT error FROM files WHERE file_path = ?", (file_path,)).fetchone()
+
+        return row[0] if row else None
+
+    #----------------------------------------------#
+
+    def get_file_nodes(self, file_path, with_attrs = True):
+
+        # get every node of the file
+        connection = self.connect()
+        nodes = {}
+        for node_id, node_path, h5_type, shape, dtype, n_attrs in connection.execute(
+            "SELECT id, node_path, h5_type, shape, dtype, n_attrs FROM nodes WHERE file_path = ?", (file_path,)
+        ):
+            nodes[node_path] = {"id": node_id, "node_path": node_path, "h5_type": h5_type, "shape": shape, "dtype": dtype, "n_attrs": n_attrs, "attrs": {}}
+
+        # attach the attributes (in the original order, used for the tooltips)
+        if not with_attrs:
+            return nodes
+        nodes_by_id = {node["id"]: node for node in nodes.values()}
+        for node_id, name, value_text in connection.execute(
+            "SELECT attrs.node_id, attrs.name, attrs.value_text FROM attrs JOIN nodes ON nodes.id = attrs.node_id WHERE nodes.file_path = ? ORDER BY attrs.node_id, attrs.position", (file_path,)
+        ):
+            nodes_by_id[node_id]["attrs"][name] = value_text
+
+        return nodes
+
+    #----------------------------------------------#
+
+    def query_attributes(self, root_path, h5_type, attribute_conditions):
+
+        # build one exists clause per condition (already parsed by CompiledFilter)
+        conditions = []
+        parameters = list(self.get_root_parameters(root_path))
+        for attr_name, kind, argument in attribute_conditions:
+
+            # presence of the attribute
+            clause = "EXISTS (SELECT 1 FROM attrs WHERE attrs.node_id = nodes.id AND attrs.name = ?"
+            parameters.append(attr_name)
+
+            # CASE 1 (INTERVAL SEARCH): values that are not numeric are not filtered out
+            if kind == CONDITION_INTERVAL:
+                clause += " AND (attrs.value_num IS NULL OR attrs.value_num BETWEEN ? AND ?)"
+                parameters.extend(argument)
+
+            # CASE 2 (EXACT KEY VALUE)
+            elif kind == CONDITION_EXACT:
+                clause += " AND attrs.value_lower = ?"
+                parameters.append(argument)
+
+            conditions.append(clause + ")")
+
+        # run the query
+        statement = self.get_root_condition("SELECT id FROM nodes WHERE") + " AND h5_type = ?"
+        parameters.insert(3, h5_type)
+        for condition in conditions:
+            statement += " AND " + condition
+        node_ids = {row[0] for row in self.connect().execute(statement, parameters)}
+
+        return node_ids
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
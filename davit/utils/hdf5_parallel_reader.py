@@ -0,0 +1,275 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# this module is imported by every worker process of the reader, so it only imports what the workers need
+# (importing davit.__imports__ would load qt, pytimber, scipy... in each process)
+import os
+import zlib
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import h5py
+
+# optional compression filters (lz4 and blosc), needed by the worker processes to decompress them
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# default number of workers
+DEFAULT_N_WORKERS = 4
+
+# datasets smaller than this are read sequentially (starting the workers costs more than it saves)
+PARALLEL_READ_MIN_BYTES = 128 * 1024 ** 2
+
+# target size (in bytes) of the row blocks handed to every worker
+PARALLEL_BLOCK_SIZE_IN_BYTES = 32 * 1024 ** 2
+
+# filters that can be undone in python (zlib releases the gil, so the threads decompress concurrently)
+PYTHON_DECODABLE_FILTERS = [h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE, h5py.h5z.FILTER_FLETCHER32]
+
+#################################################################
+#################################################################
+
+def is_parallel_readable_dataset(node, min_bytes = PARALLEL_READ_MIN_BYTES):
+
+    # only big plain numeric datasets with 1 or 2 dimensions stored in a file on disk
+    if not isinstance(node, h5py.Dataset) or node.ndim not in (1, 2) or node.size == 0:
+        return False
+    if node.dtype.names is not None or not (np.issubdtype(node.dtype, np.number) or np.issubdtype(node.dtype, np.bool_)):
+        return False
+    if node.size * node.dtype.itemsize < min_bytes:
+        return False
+    if not os.path.isfile(node.file.filename):
+        return False
+
+    return True
+
+#################################################################
+#################################################################
+
+def get_filter_codes(node):
+
+    # filters of the pipeline in the order they were applied when writing
+    create_plist = node.id.get_create_plist()
+
+    return [create_plist.get_filter(position)[0] for position in range(create_plist.get_nfilters())]
+
+#################################################################
+#################################################################
+
+def get_read_mode(node):
+
+    # filtered chunks decoded in python by threads, everything else read by processes (each with its own hdf5 library)
+    filter_codes = get_filter_codes(node)
+    if node.chunks is not None and filter_codes and all(code in PYTHON_DECODABLE_FILTERS for code in filter_codes):
+        return "threads"
+
+    return "processes"
+
+#################################################################
+#################################################################
+
+def get_row_blocks(node, block_size_in_bytes = PARALLEL_BLOCK_SIZE_IN_BYTES):
+
+    # rows that fit in one block, rounded to a multiple of the chunk rows (every chunk belongs to a single block)
+    n_rows = node.shape[0]
+    row_size_in_bytes = node.dtype.itemsize * (node.shape[1] if node.ndim == 2 else 1)
+    block_rows = max(1, block_size_in_bytes // max(1, row_size_in_bytes))
+    if node.chunks:
+        chunk_rows = node.chunks[0]
+        block_rows = max(chunk_rows, (block_rows // chunk_rows) * chunk_rows)
+
+    return [(row_start, min(row_start + block_rows, n_rows)) for row_start in range(0, n_rows, block_rows)]
+
+#################################################################
+#################################################################
+
+def decode_chunk(raw_chunk, filter_mask, filter_codes, dtype, chunk_shape):
+
+    # undo the filters in reverse order (bit i of the mask set means that filter i was skipped for this chunk)
+    data = raw_chunk
+    for position in reversed(range(len(filter_codes))):
+        if filter_mask & (1 << position):
+            continue
+        code = filter_codes[position]
+        if code == h5py.h5z.FILTER_DEFLATE:
+            data = zlib.decompress(data)
+        elif code == h5py.h5z.FILTER_SHUFFLE:
+            byte_array = np.frombuffer(data, dtype=np.uint8)
+            n_items = byte_array.size // dtype.itemsize
+            data = np.ascontiguousarray(byte_array[:n_items * dtype.itemsize].reshape(dtype.itemsize, n_items).T)
+        elif code == h5py.h5z.FILTER_FLETCHER32:
+            data = data[:-4]
+
+    return np.frombuffer(data, dtype=dtype, count=int(np.prod(chunk_shape))).reshape(chunk_shape)
+
+#################################################################
+#################################################################
+
+def read_block_chunks(node, array, row_start, row_stop, filter_codes):
+
+    # raw chunks of the block (the read itself is serialized by h5py, the decompression is not)
+    chunk_shape = node.chunks
+    n_columns = node.shape[1] if node.ndim == 2 else 1
+    chunk_columns = chunk_shape[1] if node.ndim == 2 else 1
+    for chunk_row in range(row_start, row_stop, chunk_shape[0]):
+        n_valid_rows = min(chunk_shape[0], node.shape[0] - chunk_row)
+        for chunk_column in range(0, n_columns, chunk_columns):
+            offset = (chunk_row, chunk_column) if node.ndim == 2 else (chunk_row,)
+            destination = np.s_[chunk_row:chunk_row + n_valid_rows, chunk_column:chunk_column + chunk_columns] if node.ndim == 2 else np.s_[chunk_row:chunk_row + n_valid_rows]
+
+            # chunks never written hold the fill value (any other error goes up, so the caller falls back to the sequential read)
+            if node.id.get_chunk_info_by_coord(offset).byte_offset is None:
+                array[destination] = node.fillvalue
+                continue
+            filter_mask, raw_chunk = node.id.read_direct_chunk(offset)
+
+            # decode and copy the part inside the dataset (edge chunks are stored with their full size)
+            chunk = decode_chunk(raw_chunk, filter_mask, filter_codes, node.dtype, chunk_shape)
+            if node.ndim == 2:
+                array[destination] = chunk[0:n_valid_rows, 0:min(chunk_columns, n_columns - chunk_column)]
+            else:
+                array[destination] = chunk[0:n_valid_rows]
+
+    return row_stop - row_start
+
+#################################################################
+#################################################################
+
+def read_block_to_shared_memory(file_path, hdf5_path, row_start, row_stop, shared_memory_name):
+
+    # attach to the block allocated by the parent (untracked when possible, the parent owns and unlinks it)
+    try:
+        block_memory = shared_memory.SharedMemory(name=shared_memory_name, track=False)
+    except TypeError:
+        block_memory = shared_memory.SharedMemory(name=shared_memory_name)
+
+    # read the rows straight into it
+    try:
+        with h5py.File(file_path, "r") as h5_file:
+            node = h5_file[hdf5_path]
+            block = np.ndarray((row_stop - row_start,) + node.shape[1:], dtype=node.dtype, buffer=block_memory.buf)
+            node.read_direct(block, source_sel=np.s_[row_start:row_stop])
+            del block
+    finally:
+        block_memory.close()
+
+    return row_stop - row_start
+
+#################################################################
+#################################################################
+
+def read_dataset_with_threads(node, array, row_blocks, n_workers, progress_callback = None):
+
+    # every thread decodes the chunks of one block at a time
+    filter_codes = get_filter_codes(node)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(read_block_chunks, node, array, row_start, row_stop, filter_codes) for row_start, row_stop in row_blocks]
+        n_done = 0
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+                n_done += 1
+                if progress_callback:
+                    progress_callback(n_done, len(row_blocks))
+
+    return array
+
+#################################################################
+#################################################################
+
+def read_dataset_with_processes(node, array, row_blocks, n_workers, progress_callback = None):
+
+    # keep at most two blocks per worker in shared memory (the memory needed on top of the output stays bounded)
+    file_path = node.file.filename
+    hdf5_path = node.name
+    row_size_in_bytes = node.dtype.itemsize * (node.shape[1] if node.ndim == 2 else 1)
+    max_pending = 2 * n_workers
+    block_memories = {}
+    n_done = 0
+
+    # spawn is safe with the qt threads of the parent
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        try:
+            next_block = 0
+            pending = set()
+            while next_block < len(row_blocks) or pending:
+
+                # submit new blocks
+                while next_block < len(row_blocks) and len(pending) < max_pending:
+                    row_start, row_stop = row_blocks[next_block]
+                    block_memory = shared_memory.SharedMemory(create=True, size=max(1, (row_stop - row_start) * row_size_in_bytes))
+                    future = executor.submit(read_block_to_shared_memory, file_path, hdf5_path, row_start, row_stop, block_memory.name)
+                    block_memories[future] = (block_memory, row_start, row_stop)
+                    pending.add(future)
+                    next_block += 1
+
+                # copy the finished blocks into the output and release their memory
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    block_memory, row_start, row_stop = block_memories.pop(future)
+                    try:
+                        future.result()
+                        array[row_start:row_stop] = np.ndarray((row_stop - row_start,) + node.shape[1:], dtype=node.dtype, buffer=block_memory.buf)
+                    finally:
+                        block_memory.close()
+                        block_memory.unlink()
+                    n_done += 1
+                    if progress_callback:
+                        progress_callback(n_done, len(row_blocks))
+
+        # release the blocks still allocated when something failed
+        finally:
+            for future, (block_memory, row_start, row_stop) in block_memories.items():
+                future.cancel()
+                block_memory.close()
+                block_memory.unlink()
+
+    return array
+
+#################################################################
+#################################################################
+
+def read_dataset_parallel(node, n_workers = DEFAULT_N_WORKERS, progress_callback = None, mode = None):
+
+    # split the dataset into chunk aligned row blocks
+    n_workers = max(1, int(n_workers))
+    row_blocks = get_row_blocks(node)
+    if n_workers == 1 or len(row_blocks) < 2:
+        return None
+
+    # read and decompress the blocks concurrently into one preallocated buffer
+    array = np.empty(node.shape, dtype=node.dtype)
+    n_workers = min(n_workers, len(row_blocks))
+    if mode is None:
+        mode = get_read_mode(node)
+    try:
+        if mode == "threads":
+            read_dataset_with_threads(node, array, row_blocks, n_workers, progress_callback=progress_callback)
+        else:
+            read_dataset_with_processes(node, array, row_blocks, n_workers, progress_callback=progress_callback)
+    except Exception as xcp:
+        print("Exception at read_dataset_parallel for {} ({}): {}".format(node.name, mode, xcp))
+        return None
+
+    return array
+
+#################################################################
+#################################################################
@@ -0,0 +1,142 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# named sets of h5py.File options (the order is the one of the settings combobox)
+# rdcc_nbytes is the chunk cache of every dataset opened from the file, so it is kept small enough to be held by many of them
+HDF5_READ_PROFILES = collections.OrderedDict([
+
+    # h5py defaults (1 MB chunk cache per dataset)
+    ("default", {}),
+
+    # whole datasets read row block after row block: a big cache that drops the chunks already read first
+    ("large sequential", {
+        "rdcc_nbytes": 128 * 1024 * 1024,
+        "rdcc_nslots": 100_003,
+        "rdcc_w0": 1.0,
+        "page_buf_size": 16 * 1024 * 1024,
+    }),
+
+    # column slices of chunked 2D datasets: keep as many decompressed chunks as possible
+    ("random column access", {
+        "rdcc_nbytes": 256 * 1024 * 1024,
+        "rdcc_nslots": 400_009,
+        "rdcc_w0": 0.0,
+        "page_buf_size": 4 * 1024 * 1024,
+    }),
+
+    # files still being written by an acquisition (single writer multiple readers)
+    ("live files (swmr)", {
+        "rdcc_nbytes": 16 * 1024 * 1024,
+        "rdcc_nslots": 10_007,
+        "swmr": True,
+    }),
+])
+
+# upper limit of the chunk cache of a dataset, whatever the profile
+MAX_CHUNK_CACHE_BYTES = 256 * 1024 * 1024
+
+# options that only work for some files (files written with swmr), dropped when the file cannot be opened with them
+OPTIONAL_READ_OPTIONS = ["swmr"]
+
+# hdf5 refuses the page buffer for files not written with paged aggregation, so it is only used for the paged ones
+# (checked the first time every version of a file is opened)
+PAGED_FILES = {}
+
+#################################################################
+#################################################################
+
+def get_read_profile_names():
+
+    return list(HDF5_READ_PROFILES.keys())
+
+#################################################################
+#################################################################
+
+def get_read_profile_name(profile_index):
+
+    # index stored in the settings (unknown values fall back to the defaults)
+    names = get_read_profile_names()
+    try:
+        return names[int(profile_index)]
+    except Exception:
+        return names[0]
+
+#################################################################
+#################################################################
+
+def get_file_version(path):
+
+    # mtime and size identify a version of the file
+    try:
+        file_stat = os.stat(path)
+    except Exception:
+        return None
+
+    return (file_stat.st_mtime_ns, file_stat.st_size)
+
+#################################################################
+#################################################################
+
+def is_paged_file(handle):
+
+    # space strategy of the file creation property list
+    try:
+        return handle.id.get_create_plist().get_file_space_strategy()[0] == h5py.h5f.FSPACE_STRATEGY_PAGE
+    except Exception:
+        return False
+
+#################################################################
+#################################################################
+
+def open_hdf5_file(path, profile_name = "default"):
+
+    # options of the profile
+    options = dict(HDF5_READ_PROFILES.get(profile_name, {}))
+    if "rdcc_nbytes" in options:
+        options["rdcc_nbytes"] = min(options["rdcc_nbytes"], MAX_CHUNK_CACHE_BYTES)
+
+    # the page buffer is only requested for files known to be paged
+    page_buf_size = options.pop("page_buf_size", None)
+    version = get_file_version(path)
+    is_paged = PAGED_FILES.get((path, version), None)
+    if page_buf_size and is_paged:
+        options["page_buf_size"] = page_buf_size
+
+    # try the full profile first, then without the options the file does not support
+    try:
+        handle = h5py.File(path, "r", **options)
+    except Exception as xcp:
+        reduced_options = {key: value for key, value in options.items() if key not in OPTIONAL_READ_OPTIONS}
+        if reduced_options == options:
+            raise
+        print("Exception at open_hdf5_file for path {} with profile {} (opening it without {}): {}".format(path, profile_name, OPTIONAL_READ_OPTIONS, xcp))
+        options = reduced_options
+        handle = h5py.File(path, "r", **options)
+
+    # first open of this version of the file: remember if it is paged (and reopen it with the page buffer if it is)
+    if page_buf_size and is_paged is None:
+        PAGED_FILES[(path, version)] = is_paged_file(handle)
+        if PAGED_FILES[(path, version)]:
+            handle.close()
+            options["page_buf_size"] = page_buf_size
+            handle = h5py.File(path, "r", **options)
+
+    return handle, options
+
+#################################################################
+#################################################################
@@ -10,6 +10,32 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from typing import Any, Dict, Optional, Tuple, Union
+
+# optional compression filters (lz4 and blosc)
+try:
+    import hdf5plugin
+    HDF5PLUGIN_AVAILABLE = True
+except ImportError:
+    hdf5plugin = None
+    HDF5PLUGIN_AVAILABLE = False
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# encodings of a datetime index
+INDEX_ENCODING_STRING = "string"
+INDEX_ENCODING_EPOCH_NS = "epoch_ns"
+
+# layouts of the data (single 2d dataset or one typed dataset per column)
+DATA_LAYOUT_MATRIX = "matrix"
+DATA_LAYOUT_COLUMNS = "columns"
+
+# defaults of the streaming writer
+DEFAULT_CHUNK_SIZE_IN_BYTES = 1024 ** 2
+DEFAULT_BLOCK_ROWS = 1_000_000
 
 #################################################################
 #################################################################
@@ -19,8 +45,9 @@ class HDF5DataFrameHandler:
 
     #----------------------------------------------#
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, time_index_encoding: str = INDEX_ENCODING_EPOCH_NS):
         self.file_path = file_path
+        self.time_index_encoding = time_index_encoding
         return
 
     #----------------------------------------------#
@@ -41,24 +68,185 @@ class HDF5DataFrameHandler:
 
     #----------------------------------------------#
 
+    def time_index_to_epoch_ns(self, index: pd.DatetimeIndex) -> Tuple[np.ndarray, Dict[str, str]]:
+        # naive indexes keep their wall time, aware ones are stored in utc with their timezone as attribute
+        timezone = "" if index.tz is None else str(index.tz)
+        attributes = {"INDEX_ENCODING": INDEX_ENCODING_EPOCH_NS, "TIME_UNIT": "ns", "TIMEZONE": timezone}
+        return index.asi8, attributes
+
+    #----------------------------------------------#
+
+    @staticmethod
+    def decode_index(index: np.ndarray, attributes: Any) -> Union[pd.Index, np.ndarray]:
+        # new encoding (int64 epoch + unit and timezone attributes)
+        encoding = fromBytesToString(attributes.get("INDEX_ENCODING", INDEX_ENCODING_STRING)) if attributes is not None else INDEX_ENCODING_STRING
+        if encoding == INDEX_ENCODING_EPOCH_NS and np.issubdtype(index.dtype, np.integer):
+            unit = str(fromBytesToString(attributes.get("TIME_UNIT", "ns")))
+            timezone = str(fromBytesToString(attributes.get("TIMEZONE", "")))
+            datetime_index = pd.DatetimeIndex(pd.to_datetime(index, unit=unit))
+            if timezone:
+                datetime_index = datetime_index.tz_localize("UTC").tz_convert(timezone)
+            return datetime_index
+        # old encoding (strings)
+        return index.astype(str)
+
+    #----------------------------------------------#
+
     def save_dataframe_to_hdf5(self, dataframe: pd.DataFrame) -> None:
         with h5py.File(self.file_path, 'w') as h5_file:
             result_group = h5_file.create_group("dataframe")
             result_group.attrs["data_type"] = "DataFrame"
             index = dataframe.index
+            index_attributes = {}
             is_timestamp = False
             if isinstance(index, pd.DatetimeIndex):
-                index = self.time_index_to_string(index)
+                if self.time_index_encoding == INDEX_ENCODING_EPOCH_NS:
+                    index, index_attributes = self.time_index_to_epoch_ns(index)
+                else:
+                    index = self.time_index_to_string(index)
                 is_timestamp = True
             else:
                 index = index.to_numpy()
             columns_dataset = result_group.create_dataset("columns", data=dataframe.columns.to_numpy().astype(np.dtype("S")))
             index_dataset = result_group.create_dataset("index", data=index)
             index_dataset.attrs["IS_TIMESTAMP"] = is_timestamp
+            for key, value in index_attributes.items():
+                index_dataset.attrs[key] = value
             data_dataset = result_group.create_dataset("data", data=dataframe.to_numpy())
             return
 
     #----------------------------------------------#
 
+    @staticmethod
+    def get_compression_kwargs(compression: Optional[str], compression_level: Optional[int] = None) -> Dict[str, Any]:
+        # no compression
+        if not compression:
+            return {}
+        # filters shipped with h5py
+        if compression == "gzip":
+            return {"compression": "gzip", "compression_opts": 4 if compression_level is None else compression_level}
+        if compression == "lzf":
+            return {"compression": "lzf"}
+        # filters provided by hdf5plugin (fall back to gzip if it is not installed)
+        if compression in ("lz4", "blosc"):
+            if not HDF5PLUGIN_AVAILABLE:
+                print("hdf5plugin is not installed, using gzip instead of {}".format(compression))
+                return {"compression": "gzip", "compression_opts": 1 if compression_level is None else compression_level}
+            if compression == "lz4":
+                return dict(hdf5plugin.LZ4())
+            return dict(hdf5plugin.Blosc(cname="lz4", clevel=5 if compression_level is None else compression_level, shuffle=hdf5plugin.Blosc.SHUFFLE))
+        raise ValueError("Unknown compression filter: {}".format(compression))
+
+    #----------------------------------------------#
+
+    @staticmethod
+    def get_column_storage(column: pd.Series) -> Tuple[np.dtype, Dict[str, Any]]:
+        # datetime columns are stored as int64 epoch ns
+        if pd.api.types.is_datetime64_any_dtype(column.dtype):
+            timezone = str(column.dt.tz) if column.dt.tz is not None else ""
+            return np.dtype(np.int64), {"INDEX_ENCODING": INDEX_ENCODING_EPOCH_NS, "TIME_UNIT": "ns", "TIMEZONE": timezone}
+        # numeric and boolean columns keep their own type
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufc":
+            return column.dtype, {}
+        # everything else is stored as bytes
+        return np.dtype("S"), {}
+
+    #----------------------------------------------#
+
+    @staticmethod
+    def get_column_block(column: pd.Series, start: int, stop: int, dtype: np.dtype) -> np.ndarray:
+        block = column.iloc[start:stop]
+        if dtype.kind == "S":
+            return block.astype(str).to_numpy().astype(np.dtype("S"))
+        if pd.api.types.is_datetime64_any_dtype(column.dtype):
+            return block.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return block.to_numpy()
+
+    #----------------------------------------------#
+
+    def save_dataframe_to_hdf5_streaming(self, dataframe: pd.DataFrame, layout: str = "auto", chunk_rows: Optional[int] = None, compression: Optional[str] = None, compression_level: Optional[int] = None, block_rows: int = DEFAULT_BLOCK_ROWS, group_name: str = "dataframe") -> None:
+        # datasets stay contiguous (and memory mappable) unless a chunk shape or a compression filter is requested
+        # homogeneous numeric frames keep the 2d layout (readable by older versions), mixed frames are split by column
+        if layout == "auto":
+            dtypes = set(dataframe.dtypes)
+            homogeneous = len(dtypes) == 1 and isinstance(list(dtypes)[0], np.dtype) and list(dtypes)[0].kind in "biufc"
+            layout = DATA_LAYOUT_MATRIX if homogeneous else DATA_LAYOUT_COLUMNS
+        n_rows, n_cols = dataframe.shape
+        compression_kwargs = self.get_compression_kwargs(compression, compression_level)
+        with h5py.File(self.file_path, 'w') as h5_file:
+            result_group = h5_file.create_group(group_name)
+            result_group.attrs["data_type"] = "DataFrame"
+            result_group.attrs["DATA_LAYOUT"] = layout
+            # columns and index
+            result_group.create_dataset("columns", data=dataframe.columns.to_numpy().astype(str).astype(np.dtype("S")))
+            index = dataframe.index
+            index_attributes = {}
+            is_timestamp = False
+            if isinstance(index, pd.DatetimeIndex):
+                index, index_attributes = self.time_index_to_epoch_ns(index)
+                is_timestamp = True
+            elif index.dtype.kind in "biuf":
+                index = index.to_numpy()
+            else:
+                index = index.to_numpy().astype(str).astype(np.dtype("S"))
+            index_dataset = result_group.create_dataset("index", data=index, **(compression_kwargs if len(index) > 0 else {}))
+            index_dataset.attrs["IS_TIMESTAMP"] = is_timestamp
+            for key, value in index_attributes.items():
+                index_dataset.attrs[key] = value
+            # single 2d dataset written by row blocks (only one block is copied at a time)
+            if layout == DATA_LAYOUT_MATRIX:
+                dtype = dataframe.dtypes.iloc[0] if n_cols > 0 else np.dtype(np.float64)
+                matrix_chunk_rows = chunk_rows if chunk_rows else max(1, DEFAULT_CHUNK_SIZE_IN_BYTES // max(1, dtype.itemsize * n_cols))
+                chunks = (max(1, min(matrix_chunk_rows, n_rows)), max(1, n_cols)) if n_rows > 0 and n_cols > 0 and (chunk_rows or compression_kwargs) else None
+                data_dataset = result_group.create_dataset("data", shape=(n_rows, n_cols), dtype=dtype, chunks=chunks, **(compression_kwargs if chunks else {}))
+                for start in range(0, n_rows, block_rows):
+                    stop = min(start + block_rows, n_rows)
+                    data_dataset[start:stop] = dataframe.iloc[start:stop].to_numpy()
+            # one typed dataset per column (no object upcast)
+            else:
+                data_group = result_group.create_group("data")
+                data_group.attrs["DATA_LAYOUT"] = DATA_LAYOUT_COLUMNS
+                data_group.attrs["shape"] = np.array([n_rows, n_cols], dtype=np.int64)
+                for col_idx in range(n_cols):
+                    column = dataframe.iloc[:, col_idx]
+                    dtype, column_attributes = self.get_column_storage(column)
+                    if dtype.kind == "S":
+                        dtype = np.dtype("S{}".format(max(1, int(column.astype(str).str.len().max() if n_rows > 0 else 1))))
+                    column_chunk_rows = chunk_rows if chunk_rows else max(1, DEFAULT_CHUNK_SIZE_IN_BYTES // dtype.itemsize)
+                    chunks = (max(1, min(column_chunk_rows, n_rows)),) if n_rows > 0 and (chunk_rows or compression_kwargs) else None
+                    column_dataset = data_group.create_dataset(str(col_idx), shape=(n_rows,), dtype=dtype, chunks=chunks, **(compression_kwargs if chunks else {}))
+                    for key, value in column_attributes.items():
+                        column_dataset.attrs[key] = value
+                    for start in range(0, n_rows, block_rows):
+                        stop = min(start + block_rows, n_rows)
+                        column_dataset[start:stop] = self.get_column_block(column, start, stop, dtype)
+            return
+
+    #----------------------------------------------#
+
+    @staticmethod
+    def read_column_layout(data_group: h5py.Group, columns: Optional[np.ndarray] = None, column_indexes: Optional[list] = None) -> pd.DataFrame:
+        # read the typed column datasets written by the streaming writer
+        n_rows, n_cols = [int(x) for x in data_group.attrs["shape"]]
+        if column_indexes is None:
+            column_indexes = list(range(n_cols))
+        data = {}
+        for col_idx in column_indexes:
+            column_dataset = data_group[str(col_idx)]
+            values = column_dataset[()]
+            if fromBytesToString(column_dataset.attrs.get("INDEX_ENCODING", "")) == INDEX_ENCODING_EPOCH_NS:
+                values = HDF5DataFrameHandler.decode_index(values, column_dataset.attrs)
+            elif values.dtype.kind == "S":
+                values = values.astype(str)
+            data[col_idx] = values
+        dataframe = pd.DataFrame(data, index=pd.RangeIndex(0, n_rows))
+        if columns is not None:
+            dataframe.columns = np.asarray(columns)[column_indexes]
+        else:
+            dataframe.columns = np.array(column_indexes).astype(str)
+        return dataframe
+
+    #----------------------------------------------#
+
 #################################################################
 #################################################################
\ No newline at end of file
@@ -0,0 +1,118 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+
+#################################################################
+#################################################################
+
+class HDF5TreeFilterProxyModel(QSortFilterProxyModel):
+    """
+    Shows the visible nodes of a filtered HDF5TreeViewModel.
+    The source model keeps every node, so changing the filters only recomputes the visibility and invalidates this proxy.
+    It also forwards the helpers of HDF5TreeViewModel used by the views (itemFromIndex, get_type_from_index...).
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, source_model):
+
+        # inheritance
+        super().__init__()
+
+        # attributes
+        self.source_model = source_model
+        self.header_labels = source_model.header_labels
+        self.async_directory_scan = True
+
+        # set source
+        self.setSourceModel(source_model)
+
+        return
+
+    #----------------------------------------------#
+
+    def filterAcceptsRow(self, source_row, source_parent):
+
+        # the root node is always shown
+        if not source_parent.isValid():
+            return True
+
+        # visibility computed by the source model
+        parent_node = self.source_model.get_node(source_parent)
+        if source_row >= len(parent_node.children):
+            return False
+
+        return parent_node.children[source_row].visible
+
+    #----------------------------------------------#
+
+    def update_filters(self, filters, metadata_index):
+
+        # re-evaluate only what changed in the source and filter the rows again
+        updated = self.source_model.update_filters(filters, metadata_index)
+        if updated:
+            self.invalidateFilter()
+
+        return updated
+
+    #----------------------------------------------#
+
+    def itemFromIndex(self, index):
+
+        return self.source_model.itemFromIndex(self.mapToSource(index))
+
+    #----------------------------------------------#
+
+    def get_type_from_index(self, index):
+
+        return self.source_model.get_type_from_index(self.mapToSource(index))
+
+    #----------------------------------------------#
+
+    def get_hdf5_path_from_index(self, index):
+
+        return self.source_model.get_hdf5_path_from_index(self.mapToSource(index))
+
+    #----------------------------------------------#
+
+    def handle_expanded(self, index):
+
+        return self.source_model.handle_expanded(self.mapToSource(index))
+
+    #----------------------------------------------#
+
+    def handle_collapsed(self, index, disabled = True):
+
+        return self.source_model.handle_collapsed(self.mapToSource(index), disabled = disabled)
+
+    #----------------------------------------------#
+
+    def open_h5_file(self, path):
+
+        return self.source_model.open_h5_file(path)
+
+    #----------------------------------------------#
+
+    def cancel_directory_scans(self):
+
+        return self.source_model.cancel_directory_scans()
+
+    #----------------------------------------------#
+
+    def clear(self):
+
+        return self.source_model.clear()
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -10,6 +10,13 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from davit.utils.directory_scan_thread import DirectoryScanThread, scan_directory
+from davit.utils.hdf5_metadata_crawler import get_df_node_shape
+from davit.utils.hdf5_filter_predicate import CompiledFilter
+import bisect
+import heapq
+import copy
+from davit.utils.memory_bounded_lru_cache import MemoryBoundedLRUCache
 
 #################################################################
 #################################################################
@@ -19,7 +26,119 @@ from davit.__imports__ import *
 MIN_N_ELEMENTS_PROGRESS_BAR = 999
 DESIRED_UPDATES_FOR_PROGRESS_BAR = 100 # (e.g. 100 for 1% increments)
 
-class HDF5TreeViewModel(QStandardItemModel):
+# columns of the tree (same order as the default header labels)
+COLUMN_OBJECT = 0
+COLUMN_TYPE = 1
+COLUMN_HDF5 = 2
+COLUMN_N_ATTRS = 3
+COLUMN_SHAPE = 4
+COLUMN_ICON_STR = 5
+
+# maximum memory used by the formatted tooltips
+TOOLTIP_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+#################################################################
+#################################################################
+
+class HDF5TreeNode:
+    """
+    Lightweight record for one row of the HDF5 tree (instead of six QStandardItems per row).
+    The full path is only stored for the top-level nodes, the rest derive it from their parent.
+    text() and data() follow the QStandardItem API so model.itemFromIndex(index) keeps working in the views.
+    """
+
+    __slots__ = ("name", "path", "type_item", "hdf5_path", "n_attrs", "shape", "icon_str", "tooltip", "foreground_color", "parent", "children", "row", "rows_dirty", "loaded")
+
+    #----------------------------------------------#
+
+    def __init__(self, name, path = None, type_item = "", hdf5_path = "", n_attrs = 0, shape = "", icon_str = "", tooltip = None, foreground_color = None, parent = None, expandable = False):
+
+        # names and file paths repeat a lot (e.g. the same groups in every file), so they are interned
+        self.name = sys.intern(str(name))
+        self.path = path
+        self.type_item = type_item
+        self.hdf5_path = sys.intern(str(hdf5_path)) if hdf5_path else ""
+        self.n_attrs = n_attrs
+        self.shape = shape
+        self.icon_str = icon_str
+
+        # tooltips are built when requested unless they are given (errors, filtered trees)
+        self.tooltip = tooltip
+        self.foreground_color = foreground_color
+
+        # hierarchy (expandable nodes load their children when they are expanded)
+        self.parent = parent
+        self.children = []
+        self.row = 0
+        self.rows_dirty = False
+        self.loaded = not expandable
+
+        return
+
+    #----------------------------------------------#
+
+    def get_full_path(self):
+
+        # stored for the top-level nodes, derived from the parent otherwise
+        if self.path is not None:
+            return self.path
+
+        return os.path.join(self.parent.get_full_path(), self.name)
+
+    #----------------------------------------------#
+
+    def text(self):
+
+        return self.name
+
+    #----------------------------------------------#
+
+    def data(self, role = Qt.ItemDataRole.UserRole):
+
+        # same roles as the first column of the old standard items
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.name
+        elif role == Qt.ItemDataRole.UserRole:
+            return self.get_full_path()
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return self.tooltip
+
+        return None
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class HDF5FilterTreeNode(HDF5TreeNode):
+    """
+    Node of the filtered tree. It keeps its own predicate bits (path, group attributes, dataset attributes)
+    so a filter change only re-evaluates the bits that changed and then the visibility.
+    """
+
+    __slots__ = ("h5_type", "node_id", "show", "visible")
+
+    #----------------------------------------------#
+
+    def __init__(self, name, h5_type = "", node_id = None, show = None, **kwargs):
+
+        # inheritance
+        super().__init__(name, **kwargs)
+
+        # metadata index identifiers and predicate bits
+        self.h5_type = h5_type
+        self.node_id = node_id
+        self.show = list(show) if show is not None else [True, True, True]
+        self.visible = True
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class HDF5TreeViewModel(QAbstractItemModel):
 
     #----------------------------------------------#
 
@@ -28,21 +147,28 @@ class HDF5TreeViewModel(QStandardItemModel):
         # inheritance
         super().__init__()
 
-        # attributes
+        # attributes (the view is not stored as self.parent because it would shadow QAbstractItemModel.parent)
         self.path = path
         self.header_labels = header_labels
         self.only_h5_and_dirs = only_h5_and_dirs
         self.filters = filters
         self.filter_mode = filter_mode
         self.tree_dict = tree_dict
-        self.parent = parent
+        self.hdf5_tree_view = parent
         self.global_parent = global_parent
 
-        # init properties
-        self.clear()
-        self.setRowCount(0)
-        self.setColumnCount(len(self.header_labels))
-        self.setHorizontalHeaderLabels(self.header_labels)
+        # directories are scanned in a worker thread (disabled temporarily when the whole tree has to be loaded at once)
+        self.async_directory_scan = True
+        self.directory_scan_threads = {}
+        self.natsort_key = natsort.natsort_keygen()
+
+        # invisible root and shared icons (one QIcon per icon string)
+        self.root_node = HDF5TreeNode("", path = "")
+        self.icon_cache = {}
+        self.progress_dialog_handle_expanded = None
+
+        # tooltips are formatted when they are shown and kept in a bounded cache
+        self.tooltip_cache = MemoryBoundedLRUCache(max_bytes=TOOLTIP_CACHE_MAX_BYTES)
 
         # CASE 1: NO FILTERS (DYNAMICALLY BUILT / LAZY LOADING)
         if not self.filter_mode:
@@ -54,21 +180,30 @@ class HDF5TreeViewModel(QStandardItemModel):
                 xcp = self.open_h5_file(path)
                 if xcp:
                     self.error_message_wrong_h5_file(xcp)
-                hdf = self.parent.hdf_dict[self.path]
+                hdf = self.hdf5_tree_view.hdf_dict[self.path]
 
                 # create a top-level item representing the root of this single HDF5 file
                 if hdf:
-                    root = self.add_h5_node(parent_item=self, node=hdf, hdf_path=self.path)
+                    root = self.create_h5_node(self.root_node, node=hdf, hdf_path=self.path)
+                    self.insert_nodes(self.root_node, [root])
 
             # normal directory procedure
             else:
 
                 # add a top-level directory item and do not drill further
-                root = self.add_node(self, self.path, os.sep)
+                root = self.create_node(self.root_node, self.path, os.sep)
+                self.insert_nodes(self.root_node, [root])
 
         # CASE 2: FILTERS (NOT DYNAMICALLY BUILT)
         else:
 
+            # every node is kept (also the hidden ones) so the filters can be changed without rebuilding the tree
+            self.filters = copy.deepcopy(self.filters)
+            self.compiled_filter = CompiledFilter(self.filters) if self.filters else None
+            self.filter_nodes = []
+            self.h5_file_paths = []
+            self.dir_mtimes = {}
+
             # add the root node and all the children
             root_dict = self.tree_dict["/"]
             type_item = root_dict["type_item"]
@@ -78,9 +213,276 @@ class HDF5TreeViewModel(QStandardItemModel):
             tooltip_str = root_dict["tooltip_str"]
             icon_str = root_dict["icon_str"]
             foreground_color = root_dict["foreground_color"]
-            root = self.add_node_after_filter(self, root_dict["full_path"], "/", type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color)
+            root = self.add_node_after_filter(self.root_node, root_dict["full_path"], "/", type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color, h5_type=root_dict["h5_type"], node_id=root_dict.get("node_id"), show=root_dict["show"])
             self.load_dict_children(parent_item=root, parent_dict=root_dict)
 
+            # evaluate the visibility of every node
+            self.update_visibility()
+
+        return
+
+    #----------------------------------------------#
+
+    def index(self, row, column, parent = QModelIndex()):
+
+        # check the row exists
+        parent_node = self.get_node(parent)
+        if row < 0 or column < 0 or row >= len(parent_node.children) or column >= len(self.header_labels):
+            return QModelIndex()
+
+        return self.createIndex(row, column, parent_node.children[row])
+
+    #----------------------------------------------#
+
+    def parent(self, index):
+
+        # top-level nodes have no parent index
+        if not index.isValid():
+            return QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self.root_node:
+            return QModelIndex()
+
+        return self.createIndex(self.get_row(parent_node), 0, parent_node)
+
+    #----------------------------------------------#
+
+    def rowCount(self, parent = QModelIndex()):
+
+        # only the first column has children
+        if parent.column() > 0:
+            return 0
+
+        return len(self.get_node(parent).children)
+
+    #----------------------------------------------#
+
+    def columnCount(self, parent = QModelIndex()):
+
+        return len(self.header_labels)
+
+    #----------------------------------------------#
+
+    def hasChildren(self, parent = QModelIndex()):
+
+        # nodes not loaded yet show the expand arrow (replaces the old dummy child)
+        if parent.column() > 0:
+            return False
+        node = self.get_node(parent)
+
+        return len(node.children) > 0 or not node.loaded
+
+    #----------------------------------------------#
+
+    def flags(self, index):
+
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    #----------------------------------------------#
+
+    def headerData(self, section, orientation, role = Qt.ItemDataRole.DisplayRole):
+
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if section < len(self.header_labels):
+                return self.header_labels[section]
+
+        return None
+
+    #----------------------------------------------#
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+
+        # check index
+        if not index.isValid():
+            return None
+
+        # get node and column
+        node = index.internalPointer()
+        column = index.column()
+
+        # text of every column
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.get_column_text(node, column)
+
+        # first column (computed only when the view asks for it)
+        if column == COLUMN_OBJECT:
+            if role == Qt.ItemDataRole.UserRole:
+                return node.get_full_path()
+            elif role == Qt.ItemDataRole.DecorationRole:
+                return self.get_icon(node.icon_str)
+            elif role == Qt.ItemDataRole.ToolTipRole:
+                return self.get_tooltip(node)
+            elif role == Qt.ItemDataRole.ForegroundRole:
+                if node.foreground_color:
+                    return QBrush(QColor(node.foreground_color))
+
+        # metadata columns
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            if column in [COLUMN_N_ATTRS, COLUMN_SHAPE] or (node.hdf5_path and column in [COLUMN_TYPE, COLUMN_HDF5]):
+                return QBrush(Qt.GlobalColor.darkGray)
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_column_text(self, node, column):
+
+        # same text as the old items of each column
+        if column == COLUMN_OBJECT:
+            return node.name
+        elif column == COLUMN_TYPE:
+            return node.type_item
+        elif column == COLUMN_HDF5:
+            return node.hdf5_path
+        elif column == COLUMN_N_ATTRS:
+            return str(node.n_attrs) if node.n_attrs > 0 else ""
+        elif column == COLUMN_SHAPE:
+            return str(node.shape)
+        elif column == COLUMN_ICON_STR:
+            return node.icon_str
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_icon(self, icon_str):
+
+        # nodes without icon (e.g. other files)
+        if not icon_str:
+            return None
+
+        # create every icon only once
+        icon = self.icon_cache.get(icon_str)
+        if icon is None:
+            icon = QIcon(qta.icon(icon_str))
+            self.icon_cache[icon_str] = icon
+
+        return icon
+
+    #----------------------------------------------#
+
+    def get_tooltip(self, node):
+
+        # given tooltip (errors)
+        if node.tooltip is not None:
+            return node.tooltip
+
+        # formatted before
+        full_path = node.get_full_path()
+        tooltip = self.tooltip_cache.get(full_path)
+        if tooltip is not None:
+            return tooltip
+
+        # hdf5 nodes read their attributes when the tooltip is shown (top-level files show no attributes)
+        node_attrs = []
+        if node.type_item == "hdf5" and node.hdf5_path and full_path != node.hdf5_path:
+            try:
+                hdf = self.hdf5_tree_view.hdf_dict.get(node.hdf5_path)
+                if hdf:
+                    h5_node = hdf.get(os.path.relpath(full_path, node.hdf5_path))
+                    if h5_node is not None:
+                        node_attrs = h5_node.attrs
+            except Exception as xcp:
+                print("Exception at get_tooltip for path {}: {}".format(full_path, xcp))
+
+        # format and cache
+        tooltip = self.create_tooltip(node_attrs, full_path)
+        self.tooltip_cache.put(full_path, tooltip)
+
+        return tooltip
+
+    #----------------------------------------------#
+
+    def itemFromIndex(self, index):
+
+        # node record of the index (None for the invisible root)
+        if not index.isValid():
+            return None
+
+        return index.internalPointer()
+
+    #----------------------------------------------#
+
+    def get_node(self, index):
+
+        # invalid indexes refer to the invisible root
+        if not index.isValid():
+            return self.root_node
+
+        return index.internalPointer()
+
+    #----------------------------------------------#
+
+    def get_row(self, node):
+
+        # rows inserted in the middle (sorted directory scans) renumber the siblings only once
+        parent_node = node.parent
+        if parent_node.rows_dirty:
+            for row, child in enumerate(parent_node.children):
+                child.row = row
+            parent_node.rows_dirty = False
+
+        return node.row
+
+    #----------------------------------------------#
+
+    def get_index(self, node, column = 0):
+
+        # index of a node (invalid for the invisible root)
+        if node is None or node is self.root_node:
+            return QModelIndex()
+
+        return self.createIndex(self.get_row(node), column, node)
+
+    #----------------------------------------------#
+
+    def insert_nodes(self, parent_node, nodes, row = None):
+
+        # nothing to insert
+        if not nodes:
+            return
+
+        # insert all the rows at once
+        if row is None:
+            row = len(parent_node.children)
+        appended = row == len(parent_node.children)
+        self.beginInsertRows(self.get_index(parent_node), row, row + len(nodes) - 1)
+        parent_node.children[row:row] = nodes
+        for position, node in enumerate(nodes, row):
+            node.parent = parent_node
+            node.row = position
+        if not appended:
+            parent_node.rows_dirty = True
+        self.endInsertRows()
+
+        return
+
+    #----------------------------------------------#
+
+    def remove_children(self, node):
+
+        # remove every row of the node
+        if not node.children:
+            return
+        self.beginRemoveRows(self.get_index(node), 0, len(node.children) - 1)
+        node.children = []
+        node.rows_dirty = False
+        self.endRemoveRows()
+
+        return
+
+    #----------------------------------------------#
+
+    def clear(self):
+
+        # remove all the nodes
+        self.beginResetModel()
+        self.root_node.children = []
+        self.endResetModel()
+
         return
 
     #----------------------------------------------#
@@ -93,19 +495,16 @@ class HDF5TreeViewModel(QStandardItemModel):
         # iterate over children
         if children_dict is not None:
             for child_name, child_dict in children_dict.items():
-                if child_name == "Loading...":
-                    continue
-                if child_dict["show"][0] and child_dict["show"][1] and child_dict["show"][2]:
-                    type_item = child_dict["type_item"]
-                    hdf5_path_item = child_dict["hdf5_path_item"]
-                    attrs_item = child_dict["attrs_item"]
-                    dataset_item = child_dict["dataset_item"]
-                    tooltip_str = child_dict["tooltip_str"]
-                    icon_str = child_dict["icon_str"]
-                    foreground_color = child_dict["foreground_color"]
-                    node = self.add_node_after_filter(parent_item, child_dict["full_path"], child_name, type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color)
-                    if "children" in child_dict.keys():
-                        self.load_dict_children(parent_item=node, parent_dict=child_dict)
+                type_item = child_dict["type_item"]
+                hdf5_path_item = child_dict["hdf5_path_item"]
+                attrs_item = child_dict["attrs_item"]
+                dataset_item = child_dict["dataset_item"]
+                tooltip_str = child_dict["tooltip_str"]
+                icon_str = child_dict["icon_str"]
+                foreground_color = child_dict["foreground_color"]
+                node = self.add_node_after_filter(parent_item, child_dict["full_path"], child_name, type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color, h5_type=child_dict["h5_type"], node_id=child_dict.get("node_id"), show=child_dict["show"])
+                if "children" in child_dict.keys():
+                    self.load_dict_children(parent_item=node, parent_dict=child_dict)
 
         return
 
@@ -113,8 +512,9 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def filter_data(self, filters, verbose = False):
 
-        # store filters
+        # store filters (and compile them once for all the nodes)
         self.filters = filters
+        self.compiled_filter = CompiledFilter(filters)
 
         # iterate with the filters
         result_dict = self.iterate_model()
@@ -136,6 +536,210 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     #----------------------------------------------#
 
+    def filter_data_with_index(self, filters, metadata_index, verbose = False):
+
+        # tree with the own predicate bits of every node
+        result_dict = self.get_filter_tree_dict(filters, metadata_index)
+
+        # for debugging
+        if verbose:
+            print("TREE")
+            print(json.dumps(result_dict, indent=2))
+
+        # recursively backpropagate the 'show' attribute from leaf nodes to top nodes of the tree
+        self.propagate_show(result_dict["/"])
+
+        return result_dict
+
+    #----------------------------------------------#
+
+    def get_filter_tree_dict(self, filters, metadata_index):
+
+        # store filters (and compile them once for all the nodes)
+        self.filters = filters
+        self.compiled_filter = CompiledFilter(filters)
+
+        # collect the hdf5 files under the root path and update the index (only new or modified files are read, in parallel)
+        h5_file_paths = []
+        if self.is_h5_file(self.path):
+            h5_file_paths = [self.path]
+            root_dict = None
+        else:
+            root_dict = self.get_dir_dict(self.path, h5_file_paths)
+        n_workers = self.global_parent.dict_for_settings["n_workers_metadata_crawler"] if self.global_parent else 1
+        metadata_index.update_files(h5_file_paths, progress_callback=lambda file_path: self.update_waiting_widget(), n_workers=n_workers)
+        metadata_index.remove_missing_files(self.path, h5_file_paths)
+
+        # attribute filters are resolved with one indexed query per type
+        self.index_passing_nodes = {}
+        for type in ["group", "dataset"]:
+            if self.compiled_filter.has_attribute_conditions(type):
+                self.index_passing_nodes[type] = metadata_index.query_attributes(self.path, type, self.compiled_filter.attribute_conditions[type])
+
+        # build the tree dict (same structure as iterate_model)
+        if root_dict is None:
+            root_dict = self.get_h5_file_dict(self.path, metadata_index, as_root=True)
+        else:
+            self.fill_dir_dict_with_index(root_dict, metadata_index)
+        result_dict = {"/": root_dict}
+
+        return result_dict
+
+    #----------------------------------------------#
+
+    def update_waiting_widget(self):
+
+        # update waiting widget
+        if self.global_parent:
+            if self.global_parent.waiting_widget:
+                self.global_parent.waiting_widget.updateLabel()
+
+        return
+
+    #----------------------------------------------#
+
+    def get_filtered_node_dict(self, full_path, hdf_path, type_item, attrs_item, dataset_item, icon_str, tooltip_str, h5_type = "", node_id = None, foreground_color = "#000000", path_show = None):
+
+        # metadata (same keys as iterate_model)
+        value = {"full_path": full_path, "h5_type": h5_type, "node_id": node_id}
+        value["type_item"] = type_item
+        value["hdf5_path_item"] = hdf_path
+        value["attrs_item"] = attrs_item
+        value["dataset_item"] = dataset_item
+        value["icon_str"] = icon_str
+        value["tooltip_str"] = tooltip_str
+        value["foreground_color"] = foreground_color
+
+        # apply filters (the path filters of the hdf5 nodes come already evaluated in batch)
+        if path_show is None:
+            sub_hdf_path = os.path.relpath(full_path, hdf_path) if hdf_path else ""
+            path_show = self.compiled_filter.match_paths(full_path, hdf_path, sub_hdf_path)
+        b3 = h5_type != "group" or "group" not in self.index_passing_nodes or node_id in self.index_passing_nodes["group"]
+        b4 = h5_type != "dataset" or "dataset" not in self.index_passing_nodes or node_id in self.index_passing_nodes["dataset"]
+        value["show"] = [bool(path_show), b3, b4]
+
+        return value
+
+    #----------------------------------------------#
+
+    def get_dir_dict(self, path, h5_file_paths):
+
+        # directory item
+        value = self.get_filtered_node_dict(path, "", "dir", "", "", "ei.folder", None)
+
+        # list the directory (same filtering and order as the lazy tree)
+        try:
+            elements = scan_directory(path, only_h5_and_dirs=self.only_h5_and_dirs)
+        except Exception as xcp:
+            print("Exception at get_dir_dict for path {}: {}".format(path, xcp))
+            elements = []
+        elements = sorted(elements, key=lambda element: self.natsort_key(element[0]))
+
+        # children (hdf5 files are filled later, once the index is up to date)
+        children = {}
+        for element, element_path, is_dir in elements:
+            if is_dir:
+                children[element] = self.get_dir_dict(element_path, h5_file_paths)
+            elif self.is_h5_file(element_path):
+                h5_file_paths.append(element_path)
+                children[element] = {"h5_file_path": element_path}
+            else:
+                children[element] = self.get_filtered_node_dict(element_path, "", "", "", "", "", None)
+        if children:
+            value["children"] = children
+
+        return value
+
+    #----------------------------------------------#
+
+    def fill_dir_dict_with_index(self, dir_dict, metadata_index):
+
+        # replace the hdf5 file placeholders
+        for name, child_dict in dir_dict.get("children", {}).items():
+            if "h5_file_path" in child_dict:
+                dir_dict["children"][name] = self.get_h5_file_dict(child_dict["h5_file_path"], metadata_index)
+            else:
+                self.fill_dir_dict_with_index(child_dict, metadata_index)
+
+        return
+
+    #----------------------------------------------#
+
+    def get_h5_file_dict(self, file_path, metadata_index, as_root = False):
+
+        # get the indexed nodes (the attributes are only needed by the tooltips, which are read from the file when shown)
+        nodes = metadata_index.get_file_nodes(file_path, with_attrs=False)
+        root_node = nodes.get("/")
+
+        # the file could not be read
+        if root_node is None:
+            error = metadata_index.get_file_error(file_path)
+            if as_root:
+                return self.get_filtered_node_dict(os.path.join(file_path, ""), file_path, "hdf5", "", "", "", str(error), foreground_color="#ff0000")
+            return self.get_filtered_node_dict(file_path, file_path, "hdf5", "", "", "ri.database-line", str(error), foreground_color="#ff0000")
+
+        # evaluate the path filters of all the nodes of the file in one batch
+        node_paths = list(nodes.keys())
+        full_paths = [os.path.join(file_path, node_path[1:]) for node_path in node_paths]
+        subpaths = [node_path[1:] if node_path != "/" else "." for node_path in node_paths]
+        path_mask = self.compiled_filter.match_paths_batch(full_paths, [file_path] * len(node_paths), subpaths)
+        for node_path, path_show in zip(node_paths, path_mask):
+            nodes[node_path]["path_show"] = path_show
+
+        # file item (the root group is the one used by the filters)
+        if as_root:
+            value = self.get_h5_node_dict(root_node, file_path)
+        else:
+            value = self.get_filtered_node_dict(file_path, file_path, "hdf5", "", "", "ri.database-line", None, h5_type="group", node_id=root_node["id"], path_show=root_node["path_show"])
+
+        # group the nodes by parent
+        children_paths = {}
+        for node_path in nodes.keys():
+            if node_path != "/":
+                children_paths.setdefault(node_path.rsplit("/", 1)[0] or "/", []).append(node_path)
+
+        # add the children recursively
+        self.fill_h5_node_dict(value, "/", nodes, children_paths, file_path)
+
+        # update waiting widget
+        self.update_waiting_widget()
+
+        return value
+
+    #----------------------------------------------#
+
+    def fill_h5_node_dict(self, value, node_path, nodes, children_paths, file_path):
+
+        # children in natural order
+        child_paths = children_paths.get(node_path, [])
+        if not child_paths:
+            return
+        child_paths = sorted(child_paths, key=lambda child_path: self.natsort_key(child_path.rsplit("/", 1)[-1]))
+
+        # build every child
+        children = {}
+        for child_path in child_paths:
+            child_value = self.get_h5_node_dict(nodes[child_path], file_path)
+            self.fill_h5_node_dict(child_value, child_path, nodes, children_paths, file_path)
+            children[child_path.rsplit("/", 1)[-1]] = child_value
+        value["children"] = children
+
+        return
+
+    #----------------------------------------------#
+
+    def get_h5_node_dict(self, node, file_path):
+
+        # same values as create_h5_node
+        node_path = node["node_path"]
+        full_path = os.path.join(file_path, node_path[1:] if node_path.startswith(os.sep) else node_path)
+        attrs_item = str(node["n_attrs"]) if node["n_attrs"] > 0 else ""
+        icon_str = "mdi.data-matrix" if node["h5_type"] == "dataset" else "fa5s.layer-group"
+
+        return self.get_filtered_node_dict(full_path, file_path, "hdf5", attrs_item, node["shape"], icon_str, None, h5_type=node["h5_type"], node_id=node["id"], path_show=node["path_show"])
+
+    #----------------------------------------------#
+
     def propagate_show(self, node, propagate_1 = True):
 
         # base case: bottom node, nothing to propagate
@@ -173,51 +777,35 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     #----------------------------------------------#
 
-    def iterate_model(self, parent=QModelIndex()):
+    def iterate_model(self, parent_node = None):
 
         # init result
         result = {}
+        if parent_node is None:
+            parent_node = self.root_node
 
-        # iterate over rows
-        for row in range(self.rowCount(parent)):
-
-            # get first column
-            index = self.index(row, 0, parent)
-            item = self.itemFromIndex(index)
-
-            # skip if no item
-            if not item:
-                continue
-
-            # skip if dummy child
-            display_text = item.text()
-            if display_text == "Loading...":
-                continue
-
-            # get full path
-            full_path = item.data(Qt.ItemDataRole.UserRole)
+        # iterate over the loaded children
+        for child in parent_node.children:
 
-            # get hdf5 path
-            hdf_path = self.get_hdf5_path_from_index(index)
-
-            # get display
-            display = item.data(Qt.ItemDataRole.DisplayRole)
+            # get full path and hdf5 path
+            full_path = child.get_full_path()
+            hdf_path = child.hdf5_path
 
             # init
             node = None
             sub_hdf_path = ""
 
             # get node
-            if hdf_path and (hdf_path in self.parent.hdf_dict):
+            if hdf_path and (hdf_path in self.hdf5_tree_view.hdf_dict):
                 sub_hdf_path = os.path.relpath(full_path, hdf_path)
-                node_obj = self.parent.hdf_dict[hdf_path]
+                node_obj = self.hdf5_tree_view.hdf_dict[hdf_path]
                 if node_obj is not None and sub_hdf_path in node_obj:
                     node = node_obj[sub_hdf_path]
                 else:
                     node = None
 
             # get data from item
-            key = display
+            key = child.name
             value = {"full_path": full_path}
 
             # store group or dataset
@@ -228,18 +816,14 @@ class HDF5TreeViewModel(QStandardItemModel):
                 elif isinstance(node, h5py.Dataset):
                     value["h5_type"] = "dataset"
 
-            # get index and item
-            index = self.index(row, 0, parent)
-            item = self.itemFromIndex(index)
-
             # store more metadata
-            value["type_item"] = self.itemFromIndex(self.index(row, 1, parent)).text()
+            value["type_item"] = child.type_item
             value["hdf5_path_item"] = hdf_path
-            value["attrs_item"] = self.itemFromIndex(self.index(row, 3, parent)).text()
-            value["dataset_item"] = self.itemFromIndex(self.index(row, 4, parent)).text()
-            value["icon_str"] = self.itemFromIndex(self.index(row, 5, parent)).text()
-            value["tooltip_str"] = item.data(Qt.ItemDataRole.ToolTipRole)
-            value["foreground_color"] = item.foreground().color().name()
+            value["attrs_item"] = self.get_column_text(child, COLUMN_N_ATTRS)
+            value["dataset_item"] = self.get_column_text(child, COLUMN_SHAPE)
+            value["icon_str"] = child.icon_str
+            value["tooltip_str"] = child.tooltip
+            value["foreground_color"] = child.foreground_color if child.foreground_color else "#000000"
 
             # apply filters
             b1 = self.filter_by_path_h5(hdf_path, sub_hdf_path)
@@ -247,38 +831,18 @@ class HDF5TreeViewModel(QStandardItemModel):
             b3 = self.filter_by_attributes(node, type = "group")
             b4 = self.filter_by_attributes(node, type = "dataset")
 
-            # init show
-            value["show"] = [True, True, True]
-
-            # show or not? (path)
-            if b1 and b2:
-                value["show"][0] = True
-            else:
-                value["show"][0] = False
-
-            # show or not? (group)
-            if b3:
-                value["show"][1] = True
-            else:
-                value["show"][1] = False
-
-            # show or not? (dataset)
-            if b4:
-                value["show"][2] = True
-            else:
-                value["show"][2] = False
+            # show or not? (path, group, dataset)
+            value["show"] = [b1 and b2, b3, b4]
 
-            # recursively iterate over child items
-            if self.hasChildren(index):
-                value["children"] = self.iterate_model(index)
+            # recursively iterate over child items (nodes not loaded yet count as empty)
+            if child.children or not child.loaded:
+                value["children"] = self.iterate_model(child)
 
             # store result
             result[key] = value
 
             # update waiting widget
-            if self.global_parent:
-                if self.global_parent.waiting_widget:
-                    self.global_parent.waiting_widget.updateLabel()
+            self.update_waiting_widget()
 
         return result
 
@@ -305,195 +869,200 @@ class HDF5TreeViewModel(QStandardItemModel):
             if not isinstance(node, h5py.Dataset):
                 return True
 
-        # case 4
-        if not (len(node.attrs) > 0):
-            return False
+        # compiled conditions (bounds parsed once, every filtered attribute must exist)
+        boolean = self.compiled_filter.match_attributes(node.attrs, type)
 
-        # iterate over attributes
-        for filtered_attr in self.filters["attributes"][type].keys():
-
-            # check attribute exists
-            if filtered_attr in node.attrs.keys():
+        return boolean
 
-                # get interval
-                interval = self.filters["attributes"][type][filtered_attr]
+    #----------------------------------------------#
 
-                # try catch flow
-                try:
+    def filter_by_path_h5(self, hdf5_path, subpath):
 
-                    # convert from bytes to string
-                    at = fromBytesToString(node.attrs[filtered_attr])
+        # boolean is true if the row should be included (precompiled pattern)
+        boolean = self.compiled_filter.match_hdf5_path(hdf5_path, subpath)
 
-                    # CASE 1 (INTERVAL SEARCH)
-                    if (interval[0] != "" and interval[0] != None) and (interval[1] != "" and interval[1] != None):
-                        if float(interval[0]) <= float(at) <= float(interval[1]):
-                            boolean = True
-                        else:
-                            return False
+        return boolean
 
-                    # case 2 (EXACT KEY VALUE)
-                    elif (interval[0] != "" and interval[0] != None):
-                        if str(at).lower() == str(interval[0]).lower():
-                            boolean = True
-                        else:
-                            return False
+    #----------------------------------------------#
 
-                # just print exception
-                except Exception as xcp:
-                    print("Exception at filter_by_attributes function: {}".format(xcp))
-                    pass
+    def filter_by_path_dir(self, full_path, hdf5_path):
 
-            # if attribute does not exist filter it out
-            else:
-                return False
+        # boolean is true if the row should be included (precompiled pattern)
+        boolean = self.compiled_filter.match_dir_path(full_path, hdf5_path)
 
         return boolean
 
     #----------------------------------------------#
 
-    def filter_by_path_h5(self, hdf5_path, subpath):
+    def add_node_after_filter(self, parent_item, node_path, node_name, type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color, h5_type = "", node_id = None, show = None):
 
-        # boolean is true if the row should be included
-        boolean = True
+        # init node (the filtered tree is complete, nothing is loaded later)
+        tree_item = HDF5FilterTreeNode(node_name, h5_type=h5_type, node_id=node_id, show=show, path=node_path, type_item=type_item, hdf5_path=hdf5_path_item, n_attrs=int(attrs_item) if attrs_item else 0, shape=dataset_item, icon_str=icon_str, tooltip=tooltip_str, foreground_color=foreground_color)
 
-        # only if user introduced some filtering (hdf5)
-        if self.filters["path"]["hdf5"]:
+        # append the row (the tree is built before the model is set in the view, so no signals are needed)
+        tree_item.parent = parent_item
+        tree_item.row = len(parent_item.children)
+        parent_item.children.append(tree_item)
 
-            # check hdf5 path exists
-            if hdf5_path:
+        # keep a flat list of the nodes for the incremental filter updates
+        self.filter_nodes.append(tree_item)
 
-                # get pattern
-                pattern = self.filters["path"]["hdf5"]
+        # files and directories checked before reusing the tree
+        if type_item == "hdf5" and node_path.rstrip(os.sep) == hdf5_path_item:
+            self.h5_file_paths.append(hdf5_path_item)
+        elif type_item == "dir":
+            try:
+                self.dir_mtimes[node_path] = os.stat(node_path).st_mtime_ns
+            except Exception as xcp:
+                print("Exception at add_node_after_filter for path {}: {}".format(node_path, xcp))
+                self.dir_mtimes[node_path] = None
 
-                # proceed with pattern matching
-                re_object = re.compile("{}".format(pattern))
+        return tree_item
 
-                # if path is found row is included
-                if re_object.search(subpath):
-                    boolean = True
-                else:
-                    boolean = False
+    #----------------------------------------------#
 
-        return boolean
+    def get_sub_hdf_path(self, full_path, hdf_path):
+
+        # same result as os.path.relpath for the nodes of a file (without normalizing every path)
+        if not hdf_path:
+            return ""
+        sub_hdf_path = full_path[len(hdf_path):].strip(os.sep)
+
+        return sub_hdf_path if sub_hdf_path else "."
 
     #----------------------------------------------#
 
-    def filter_by_path_dir(self, full_path, hdf5_path):
+    def is_filter_tree_up_to_date(self, metadata_index):
 
-        # boolean is true if the row should be included
-        boolean = True
+        # directories with added or removed entries
+        for dir_path, mtime_ns in self.dir_mtimes.items():
+            try:
+                if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                    return False
+            except Exception:
+                return False
 
-        # only if user introduced some filtering (dir)
-        if self.filters["path"]["dir"]:
+        # files rewritten since the tree was built (their node ids in the index have changed)
+        n_workers = self.global_parent.dict_for_settings["n_workers_metadata_crawler"] if self.global_parent else 1
+        n_stale_files = metadata_index.update_files(self.h5_file_paths, n_workers=n_workers)
 
-            # which subpath to use
-            subpath = ""
-            if hdf5_path:
-                subpath = hdf5_path
-            elif full_path:
-                subpath = full_path
+        return n_stale_files == 0
 
-            # get pattern
-            pattern = self.filters["path"]["dir"]
+    #----------------------------------------------#
 
-            # proceed with pattern matching
-            re_object = re.compile("{}".format(pattern))
+    def update_filters(self, filters, metadata_index):
 
-            # if path is found row is included
-            if re_object.search(subpath):
-                boolean = True
-            else:
-                boolean = False
+        # the tree can only be reused if nothing changed on disk
+        if not self.filter_mode or not self.is_filter_tree_up_to_date(metadata_index):
+            return False
 
-        return boolean
+        # compile the new filters
+        compiled_filter = CompiledFilter(filters)
+        path_changed = self.compiled_filter is None or filters["path"]["dir"] != self.filters["path"]["dir"] or filters["path"]["hdf5"] != self.filters["path"]["hdf5"]
+        self.filters = copy.deepcopy(filters)
+
+        # path bits (only when the patterns changed, evaluated in batch)
+        if path_changed:
+            full_paths = [node.get_full_path() for node in self.filter_nodes]
+            hdf5_paths = [node.hdf5_path for node in self.filter_nodes]
+            subpaths = [self.get_sub_hdf_path(full_path, hdf5_path) for full_path, hdf5_path in zip(full_paths, hdf5_paths)]
+            path_mask = compiled_filter.match_paths_batch(full_paths, hdf5_paths, subpaths)
+            for node, path_show in zip(self.filter_nodes, path_mask):
+                node.show[0] = bool(path_show)
+
+        # attribute bits (only for the types whose conditions changed, one indexed query per type)
+        for position, type in [(1, "group"), (2, "dataset")]:
+            conditions = compiled_filter.attribute_conditions[type]
+            if self.compiled_filter is not None and conditions == self.compiled_filter.attribute_conditions[type]:
+                continue
+            passing_nodes = metadata_index.query_attributes(self.path, type, conditions) if conditions else None
+            for node in self.filter_nodes:
+                if node.h5_type == type:
+                    node.show[position] = passing_nodes is None or node.node_id in passing_nodes
+
+        # store the compiled filters and recompute the visibility
+        self.compiled_filter = compiled_filter
+        self.update_visibility()
+
+        return True
 
     #----------------------------------------------#
 
-    def add_node_after_filter(self, parent_item, node_path, node_name, type_item, hdf5_path_item, attrs_item, dataset_item, tooltip_str, icon_str, foreground_color):
+    def update_visibility(self):
 
-        # init item
-        tree_item = QStandardItem(str(node_name))
-        tree_item.setData(node_path, Qt.ItemDataRole.UserRole)
-        tree_item.setToolTip(tooltip_str)
+        # propagate the predicate bits of every node (same rules as propagate_show)
+        for node in self.root_node.children:
+            self.propagate_node_show(node)
 
-        # create items for the header info
-        type_item = QStandardItem(type_item)
-        hdf5_path_item = QStandardItem(hdf5_path_item)
-        attrs_item = QStandardItem(attrs_item)
-        dataset_item = QStandardItem(dataset_item)
-        icon_str_item = QStandardItem(icon_str)
+        return
 
-        # set icon
-        tree_item.setIcon(QIcon(qta.icon(icon_str)))
+    #----------------------------------------------#
 
-        # foreground for the tree item
-        tree_item.setForeground(QBrush(QColor(foreground_color)))
+    def propagate_node_show(self, node, propagate_1 = True):
 
-        # set foregrounds
-        attrs_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-        dataset_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
+        # base case: bottom node, nothing to propagate
+        if not node.children:
+            if node.h5_type == "dataset":
+                propagate_1 = False
+            node.visible = all(node.show)
+            return node.show, propagate_1
 
-        # append the row
-        parent_item.appendRow([tree_item, type_item, hdf5_path_item, attrs_item, dataset_item, icon_str_item])
+        # recursive case: propagate show value up the tree
+        show = [False, False, node.show[2]]
+        for child in node.children:
 
-        return tree_item
+            # recursive call
+            child_show, propagate_1 = self.propagate_node_show(child, propagate_1)
+
+            # update booleans
+            show[0] = show[0] or child_show[0]
+            if propagate_1:
+                show[1] = show[1] or child_show[1]
+            else:
+                show[1] = node.show[1]
+
+            # update propagation booleans
+            if node.h5_type == "group":
+                propagate_1 = True
+
+        # update value
+        node.visible = all(show)
+        return show, propagate_1
 
     #----------------------------------------------#
 
-    def add_node(self, parent_item, node_path, node_name):
+    def create_node(self, parent_item, node_path, node_name, is_dir = None):
         """
-        This method is used for creating an item that represents either:
+        This method is used for creating a node that represents either:
           - A directory
           - An HDF5 file
-        We do NOT load children right away. Instead, we add a dummy child to handle lazy loading.
+        We do NOT load children right away. The node is marked as not loaded and its children are read when it is expanded.
+        The is_dir flag can be passed when it is already known (e.g. from os.scandir) to avoid another stat call.
         """
 
-        # create the main item
-        tree_item = QStandardItem(str(node_name))
-        tree_item.setData(node_path, Qt.ItemDataRole.UserRole)
-        tree_item.setToolTip(self.create_tooltip([], node_path))
+        # the full path is only stored for the top-level node
+        path = node_path if parent_item is self.root_node else None
 
-        # create empty items for the header info
-        type_item = QStandardItem('')
-        hdf5_path_item = QStandardItem('')
-        attrs_item = QStandardItem('')
-        dataset_item = QStandardItem('')
-        icon_str_item = QStandardItem('')
+        # check the type only if it was not given
+        if is_dir is None:
+            is_dir = os.path.isdir(node_path)
 
         # if directory
-        if os.path.isdir(node_path):
-            tree_item.setIcon(QIcon(qta.icon("ei.folder")))
-            icon_str_item = QStandardItem("ei.folder")
-            type_item = QStandardItem('dir')
-            dummy_child = QStandardItem("Loading...")
-            tree_item.appendRow([
-                dummy_child, QStandardItem(""), QStandardItem(""),
-                QStandardItem(""), QStandardItem(""), QStandardItem("")
-            ])
+        if is_dir:
+            return HDF5TreeNode(node_name, path=path, type_item="dir", icon_str="ei.folder", parent=parent_item, expandable=True)
 
         # if single h5 file
         elif self.is_h5_file(node_path):
-            tree_item.setIcon(QIcon(qta.icon("ri.database-line")))
-            icon_str_item = QStandardItem("ri.database-line")
-            type_item = QStandardItem('hdf5')
-            hdf5_path_item = QStandardItem(str(node_path))
-            dummy_child = QStandardItem("Loading...")
-            tree_item.appendRow([
-                dummy_child, QStandardItem(""), QStandardItem(""),
-                QStandardItem(""), QStandardItem(""), QStandardItem("")
-            ])
-
-        # append the row
-        parent_item.appendRow([tree_item, type_item, hdf5_path_item, attrs_item, dataset_item, icon_str_item])
+            return HDF5TreeNode(node_name, path=path, type_item="hdf5", hdf5_path=node_path, icon_str="ri.database-line", parent=parent_item, expandable=True)
 
-        return tree_item
+        return HDF5TreeNode(node_name, path=path, parent=parent_item)
 
     #----------------------------------------------#
 
-    def add_h5_node(self, parent_item, node, hdf_path, sub_hdf_path = ""):
+    def create_h5_node(self, parent_item, node, hdf_path):
         """
-        Create an item representing a single HDF5 object (Group or Dataset).
-        We do NOT load grandchildren. Instead, if it's a group, we add a dummy child.
+        Create a node representing a single HDF5 object (Group or Dataset).
+        We do NOT load grandchildren. Groups are only marked as expandable.
         """
 
         # get node path and name
@@ -502,88 +1071,267 @@ class HDF5TreeViewModel(QStandardItemModel):
         if not node_name:
             node_name = node_path
 
-        # create full path
-        if node_path.startswith(os.sep):
-            node_path_formatted = node_path[1:]
-        else:
-            node_path_formatted = node_path
-        full_path = os.path.join(hdf_path, node_path_formatted)
-
-        # init item
-        tree_item = QStandardItem(node_name)
-        tree_item.setData(full_path, Qt.ItemDataRole.UserRole)
-        tree_item.setToolTip(self.create_tooltip(node.attrs, full_path))
-
-        # init type item
-        type_item = QStandardItem('hdf5')
-        type_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-
-        # init h5 path item
-        hdf5_path_item = QStandardItem(str(hdf_path))
-        hdf5_path_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-
-        # create item for the number of attributes
-        num_attrs = len(node.attrs)
-        if num_attrs > 0:
-            attrs_item = QStandardItem(str(num_attrs))
-        else:
-            attrs_item = QStandardItem('')
-
-        # set foreground
-        attrs_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
+        # the full path is only stored for the top-level node
+        path = None
+        if parent_item is self.root_node:
+            if node_path.startswith(os.sep):
+                node_path = node_path[1:]
+            path = os.path.join(hdf_path, node_path)
 
         # init
-        icon_str_item = QStandardItem('')
-        dataset_item = QStandardItem('')
+        icon_str = ""
+        shape = ""
+        expandable = False
 
         # if dataset
         if isinstance(node, h5py.Dataset):
-            tree_item.setIcon(QIcon(qta.icon("mdi.data-matrix")))
-            icon_str_item = QStandardItem("mdi.data-matrix")
-            dataset_item = QStandardItem(str(node.shape))
+            icon_str = "mdi.data-matrix"
+            shape = node.shape
 
         # if group
         elif isinstance(node, h5py.Group):
-            tree_item.setIcon(QIcon(qta.icon("fa5s.layer-group")))
-            icon_str_item = QStandardItem("fa5s.layer-group")
+            icon_str = "fa5s.layer-group"
+            expandable = True
 
             # check if it's a DataFrame-like group
             df_node_boolean, df_node_shape = self.is_df_node(node)
             if df_node_boolean:
-                dataset_item = QStandardItem(str(df_node_shape))
+                shape = df_node_shape
 
-            # add a dummy child so the user can expand
-            dummy_child = QStandardItem("Loading...")
-            tree_item.appendRow([
-                dummy_child, QStandardItem(""), QStandardItem(""),
-                QStandardItem(""), QStandardItem(""), QStandardItem("")
-            ])
+        return HDF5TreeNode(node_name, path=path, type_item="hdf5", hdf5_path=hdf_path, n_attrs=len(node.attrs), shape=shape, icon_str=icon_str, parent=parent_item, expandable=expandable)
 
-        # set foreground
-        dataset_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
+    #----------------------------------------------#
 
-        # append the row
-        parent_item.appendRow([tree_item, type_item, hdf5_path_item, attrs_item, dataset_item, icon_str_item])
+    def load_h5_children(self, item, group, hdf_path, message):
 
-        return tree_item
+        # gather the immediate children of the group
+        child_keys = group.keys()
+        num_keys = len(child_keys)
+        update_interval = max(1, num_keys // DESIRED_UPDATES_FOR_PROGRESS_BAR)
+
+        self.progress_dialog_handle_expanded = None
+        if num_keys >= MIN_N_ELEMENTS_PROGRESS_BAR:
+            self.create_progress_bar_for_handle_expanded("{} (N_ELEMENTS = {})".format(message, num_keys), num_keys)
+
+        # create the nodes and insert them at once
+        children = []
+        for i, (name, h5_type, n_attrs) in enumerate(self.get_h5_children_info(group, natsort.natsorted(child_keys))):
+            children.append(self.create_h5_node_from_info(item, group, name, h5_type, n_attrs, hdf_path))
+
+            if (i % update_interval) == 0:
+                self.update_progress_bar_for_handle_expanded(i)
+
+        self.insert_nodes(item, children)
+        self.delete_progress_bar_for_handle_expanded()
+
+        return
+
+    #----------------------------------------------#
+
+    def get_h5_children_info(self, group, names):
+
+        # object type and number of attributes of every child read from the object headers in one pass
+        # (the attributes themselves are not opened, the tooltips read them when they are shown)
+        infos = []
+        for name in names:
+            try:
+                info = h5py.h5o.get_info(group.id, name.encode("utf-8"))
+                infos.append((name, info.type, getattr(info, "num_attrs", None)))
+            except Exception as xcp:
+                print("Exception at get_h5_children_info for {} in {}: {}".format(name, group.name, xcp))
+                infos.append((name, None, None))
+
+        return infos
+
+    #----------------------------------------------#
+
+    def create_h5_node_from_info(self, parent_item, group, name, h5_type, n_attrs, hdf_path):
+
+        # unknown objects or attribute counts are read from the object
+        if n_attrs is None or h5_type not in [h5py.h5o.TYPE_GROUP, h5py.h5o.TYPE_DATASET]:
+            return self.create_h5_node(parent_item, group[name], hdf_path=hdf_path)
+
+        # init
+        icon_str = ""
+        shape = ""
+        expandable = False
+
+        # datasets only open their dataspace
+        if h5_type == h5py.h5o.TYPE_DATASET:
+            icon_str = "mdi.data-matrix"
+            shape = group[name].shape
+
+        # groups without attributes cannot be DataFrame-like groups
+        else:
+            icon_str = "fa5s.layer-group"
+            expandable = True
+            if n_attrs > 0:
+                df_node_boolean, df_node_shape = self.is_df_node(group[name])
+                if df_node_boolean:
+                    shape = df_node_shape
+
+        return HDF5TreeNode(name, type_item="hdf5", hdf5_path=hdf_path, n_attrs=n_attrs, shape=shape, icon_str=icon_str, parent=parent_item, expandable=expandable)
 
     #----------------------------------------------#
 
     def load_dir(self, item, path):
 
-        # get list of files and dirs
-        elements = os.listdir(path)
+        # get list of files and dirs (already filtered)
+        elements = scan_directory(path, only_h5_and_dirs=self.only_h5_and_dirs)
 
         # sort list
-        elements = natsort.natsorted(elements)
+        elements = sorted(elements, key=lambda element: self.natsort_key(element[0]))
+
+        # progress bar for big directories
+        num_elements = len(elements)
+        update_interval = max(1, num_elements // DESIRED_UPDATES_FOR_PROGRESS_BAR)
+        self.progress_dialog_handle_expanded = None
+        if num_elements >= MIN_N_ELEMENTS_PROGRESS_BAR:
+            self.create_progress_bar_for_handle_expanded("Loading directory children... (N_ELEMENTS = {})".format(num_elements), num_elements)
+
+        # create nodes for all elements and insert them at once
+        children = []
+        for i, (element, element_path, is_dir) in enumerate(elements):
+            children.append(self.create_node(item, element_path, element, is_dir=is_dir))
+
+            if (i % update_interval) == 0:
+                self.update_progress_bar_for_handle_expanded(i)
+
+        self.insert_nodes(item, children)
+        self.delete_progress_bar_for_handle_expanded()
+
+        return
+
+    #----------------------------------------------#
+
+    def is_descendant(self, item, ancestor):
+
+        # walk up the parents
+        while item is not None:
+            if item is ancestor:
+                return True
+            item = item.parent
+
+        return False
+
+    #----------------------------------------------#
+
+    def get_depth(self, item):
+
+        # number of parents up to the invisible root
+        depth = 0
+        while item.parent is not None:
+            item = item.parent
+            depth += 1
+
+        return depth
+
+    #----------------------------------------------#
+
+    def get_directory_scan_thread(self, item):
+
+        # look for a running scan of the item
+        for thread, scan_dict in self.directory_scan_threads.items():
+            if thread.is_cancelled():
+                continue
+            if scan_dict["item"] is item:
+                return thread
+
+        return None
+
+    #----------------------------------------------#
+
+    def start_directory_scan(self, item, path):
+
+        # create the worker
+        thread = DirectoryScanThread(path, only_h5_and_dirs=self.only_h5_and_dirs)
+
+        # keep the node and the sorting keys of the rows already inserted
+        self.directory_scan_threads[thread] = {"item": item, "keys": []}
+
+        # bindings (the reference is only released when the thread has completely finished)
+        thread.batch_ready.connect(self.handle_directory_scan_batch)
+        thread.finished.connect(functools.partial(self.handle_directory_scan_finished, thread))
+
+        # start
+        thread.start()
+
+        return
+
+    #----------------------------------------------#
+
+    def handle_directory_scan_batch(self, thread, batch):
+
+        # ignore batches of cancelled scans
+        scan_dict = self.directory_scan_threads.get(thread)
+        if scan_dict is None or thread.is_cancelled():
+            return
+
+        # sort the batch and find the position of every entry among the rows already inserted
+        item = scan_dict["item"]
+        keys = scan_dict["keys"]
+        entries = sorted([(self.natsort_key(element), element, element_path, is_dir) for element, element_path, is_dir in batch], key=lambda entry: entry[0])
+        runs = []
+        for entry in entries:
+            row = bisect.bisect_right(keys, entry[0])
+            if runs and runs[-1][0] == row:
+                runs[-1][1].append(entry)
+            else:
+                runs.append((row, [entry]))
+
+        # one insertion per run of contiguous rows (from the last one, so the rows of the previous runs do not move)
+        for row, run in reversed(runs):
+            self.insert_nodes(item, [self.create_node(item, element_path, element, is_dir=is_dir) for key, element, element_path, is_dir in run], row=row)
+
+        # merge the sorting keys
+        scan_dict["keys"] = list(heapq.merge(keys, [entry[0] for entry in entries]))
+
+        return
+
+    #----------------------------------------------#
+
+    def handle_directory_scan_finished(self, thread):
 
-        # create nodes for all elements
-        for element in elements:
-            element_path = os.path.join(path, element)
-            if self.only_h5_and_dirs:
-                if not (os.path.isdir(element_path) or self.is_h5_file(element_path)):
-                    continue
-            self.add_node(item, element_path, element)
+        # release the thread (once it has completely stopped)
+        thread.wait()
+        thread.deleteLater()
+        scan_dict = self.directory_scan_threads.pop(thread, None)
+        if scan_dict is None or thread.is_cancelled():
+            return
+
+        # mark the item if the directory could not be read
+        if thread.error is not None:
+            self.item_has_to_be_red(scan_dict["item"], thread.error)
+
+        return
+
+    #----------------------------------------------#
+
+    def cancel_directory_scan(self, item):
+
+        # running scans of the item and of its subdirectories
+        scanned_items = []
+        for thread, scan_dict in self.directory_scan_threads.items():
+            if not thread.is_cancelled() and self.is_descendant(scan_dict["item"], item):
+                thread.cancel()
+                scanned_items.append(scan_dict["item"])
+
+        # the partially loaded directories are scanned again when expanded (deepest first, while they are still in the tree)
+        for scanned_item in sorted(scanned_items, key=self.get_depth, reverse=True):
+            self.remove_children(scanned_item)
+            scanned_item.loaded = False
+
+        return
+
+    #----------------------------------------------#
+
+    def cancel_directory_scans(self):
+
+        # stop every scan and wait for the threads (must be called before the model is discarded)
+        for thread in list(self.directory_scan_threads.keys()):
+            thread.cancel()
+            thread.wait()
+        self.directory_scan_threads = {}
 
         return
 
@@ -631,62 +1379,38 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def handle_expanded(self, index):
         """
-        Key method that checks if an item has a single dummy child.
-        If so, remove it and load the real children (lazy loading).
+        Key method that checks if a node has not been loaded yet.
+        If so, load the real children (lazy loading).
         """
 
         item = self.itemFromIndex(index)
         if not item:
             return
 
-        # we only load children if exactly 1 child = "Loading..."
-        if item.rowCount() != 1:
-            return
-
-        child_dummy = item.child(0)
-        if not child_dummy or child_dummy.text() != "Loading...":
+        # we only load children once
+        if item.loaded:
             return
+        item.loaded = True
 
-        # remove the dummy row
-        item.removeRow(0)
+        # grab item type (e.g. "dir" or "hdf5") and hdf_path (e.g. "/my/path/file.h5" or "")
+        item_type = item.type_item
+        path_hdf5 = item.hdf5_path
 
-        # grab item type (col=1) and hdf_path (col=2)
-        idx_type = index.siblingAtColumn(1)
-        idx_hdf5 = index.siblingAtColumn(2)
-        item_type = self.itemFromIndex(idx_type).text() # e.g. "dir" or "hdf5"
-        path_hdf5 = self.itemFromIndex(idx_hdf5).text() # e.g. "/my/path/file.h5" or ""
-
-        # the "full_path" is what's stored in the first column's UserRole
         # it may be an actual directory path or an HDF5 path with group info
-        full_path = item.data(Qt.ItemDataRole.UserRole)
+        full_path = item.get_full_path()
 
         # -------------------------------------------------
         # 1) DIRECTORY CASE
         # -------------------------------------------------
         if item_type == 'dir':
-            if os.path.isdir(full_path):
-                elements = os.listdir(full_path)
-                elements = natsort.natsorted(elements)
-
-                num_elements = len(elements)
-                update_interval = max(1, num_elements // DESIRED_UPDATES_FOR_PROGRESS_BAR)
-                self.progress_dialog_handle_expanded = None
-                if num_elements >= MIN_N_ELEMENTS_PROGRESS_BAR:
-                    self.create_progress_bar_for_handle_expanded("Loading directory children... (N_ELEMENTS = {})".format(num_elements), num_elements)
-
-                for i, elem in enumerate(elements):
-                    elem_path = os.path.join(full_path, elem)
-                    if self.only_h5_and_dirs:
-                        # only show subdirs and h5 files
-                        if not (os.path.isdir(elem_path) or self.is_h5_file(elem_path)):
-                            continue
 
-                    self.add_node(item, elem_path, elem)
+            # scan in a worker thread and insert the rows in batches
+            if self.async_directory_scan:
+                self.start_directory_scan(item, full_path)
 
-                    if (i % update_interval) == 0:
-                        self.update_progress_bar_for_handle_expanded(i)
-
-                self.delete_progress_bar_for_handle_expanded()
+            # synchronous scan (used when the whole tree has to be loaded at once)
+            elif os.path.isdir(full_path):
+                self.load_dir(item, full_path)
 
         # -------------------------------------------------
         # 2) HDF5 CASE
@@ -712,63 +1436,33 @@ class HDF5TreeViewModel(QStandardItemModel):
                 if xcp:
                     self.item_has_to_be_red(item, xcp)
                     self.show_red_error_message()
-                    self.parent.treeView.selectionModel().clearSelection()
-                    self.parent.treeView.setCurrentIndex(QModelIndex())
+                    self.hdf5_tree_view.treeView.selectionModel().clearSelection()
+                    self.hdf5_tree_view.treeView.setCurrentIndex(QModelIndex())
                     return
-                root_group = self.parent.hdf_dict[actual_h5_file]
+                root_group = self.hdf5_tree_view.hdf_dict[actual_h5_file]
                 if root_group:
-                    # we'll gather the immediate children of the root group
-                    child_keys = root_group.keys()
-                    num_keys = len(child_keys)
-                    update_interval = max(1, num_keys // DESIRED_UPDATES_FOR_PROGRESS_BAR)
-
-                    self.progress_dialog_handle_expanded = None
-                    if num_keys >= MIN_N_ELEMENTS_PROGRESS_BAR:
-                        self.create_progress_bar_for_handle_expanded("Loading HDF5 root group in {} (N_ELEMENTS = {})".format(os.path.basename(actual_h5_file), num_keys), num_keys)
-
-                    for i, name in enumerate(natsort.natsorted(child_keys)):
-                        child_node = root_group[name]
-                        self.add_h5_node(item, child_node, hdf_path=actual_h5_file)
-
-                        if (i % update_interval) == 0:
-                            self.update_progress_bar_for_handle_expanded(i)
-
-                    self.delete_progress_bar_for_handle_expanded()
-
-                return
+                    self.load_h5_children(item, root_group, actual_h5_file, "Loading HDF5 root group in {}".format(os.path.basename(actual_h5_file)))
 
             # -------------------------------
             # 2b) GROUP/ DATASET INSIDE h5
             # -------------------------------
-            if path_hdf5 and path_hdf5 != full_path:
+            elif path_hdf5 and path_hdf5 != full_path:
                 # sub_path is "GroupName/..." relative to the file
                 sub_path = os.path.relpath(full_path, path_hdf5)
-                hdf_file_obj = self.parent.hdf_dict.get(path_hdf5, None)
+                hdf_file_obj = self.hdf5_tree_view.hdf_dict.get(path_hdf5, None)
                 if hdf_file_obj:
                     node = hdf_file_obj.get(sub_path, None)
                     if node and isinstance(node, h5py.Group):
-                        # load immediate children
-                        child_keys = node.keys()
-                        num_keys = len(child_keys)
-                        update_interval = max(1, num_keys // DESIRED_UPDATES_FOR_PROGRESS_BAR)
-
-                        self.progress_dialog_handle_expanded = None
-                        if num_keys >= MIN_N_ELEMENTS_PROGRESS_BAR:
-                            self.create_progress_bar_for_handle_expanded("Loading HDF5 group {} in {} (N_ELEMENTS = {})".format(node.name, os.path.basename(path_hdf5), num_keys), num_keys)
-
-                        for i, name in enumerate(natsort.natsorted(child_keys)):
-                            child_node = node[name]
-                            self.add_h5_node(item, child_node, hdf_path=path_hdf5)
-
-                            if (i % update_interval) == 0:
-                                self.update_progress_bar_for_handle_expanded(i)
-
-                        self.delete_progress_bar_for_handle_expanded()
+                        self.load_h5_children(item, node, path_hdf5, "Loading HDF5 group {} in {}".format(node.name, os.path.basename(path_hdf5)))
 
         # item_type == 'other' or something else
         else:
             pass
 
+        # refresh the expand arrow of nodes that turned out to be empty
+        if not item.children and not self.get_directory_scan_thread(item):
+            self.dataChanged.emit(index, index)
+
         return
 
     #----------------------------------------------#
@@ -778,8 +1472,8 @@ class HDF5TreeViewModel(QStandardItemModel):
         # show error message
         message_title = "Error"
         message_text = ("{}".format(xcp))
-        message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self.parent.global_parent)
-        message_box.setWindowIcon(QIcon(self.parent.global_parent.window_icon_path))
+        message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self.hdf5_tree_view.global_parent)
+        message_box.setWindowIcon(QIcon(self.hdf5_tree_view.global_parent.window_icon_path))
         message_box.exec()
 
         return
@@ -789,8 +1483,13 @@ class HDF5TreeViewModel(QStandardItemModel):
     def item_has_to_be_red(self, item, error_message):
 
         # item error
-        item.setForeground(QBrush((Qt.GlobalColor.red)))
-        item.setToolTip(str(error_message))
+        item.foreground_color = "#ff0000"
+        item.tooltip = str(error_message)
+
+        # repaint the row
+        index = self.get_index(item)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
 
         return
 
@@ -801,8 +1500,8 @@ class HDF5TreeViewModel(QStandardItemModel):
         # show message
         message_title = "Error"
         message_text = "The file cannot be opened because it is probably corrupted."
-        message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self.parent.global_parent)
-        message_box.setWindowIcon(QIcon(self.parent.global_parent.window_icon_path))
+        message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self.hdf5_tree_view.global_parent)
+        message_box.setWindowIcon(QIcon(self.hdf5_tree_view.global_parent.window_icon_path))
         message_box.exec()
 
         return
@@ -811,6 +1510,11 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def handle_collapsed(self, index, disabled = True):
 
+        # cancel the directory scan of the item if it is still running
+        collapsed_item = self.itemFromIndex(index)
+        if collapsed_item:
+            self.cancel_directory_scan(collapsed_item)
+
         # disable this function
         if disabled:
             return
@@ -827,10 +1531,9 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def get_type_from_index(self, index):
 
-        # first column index
-        idx_col = index.siblingAtColumn(1)
-        item_col = self.itemFromIndex(idx_col)
-        type = str(item_col.data(Qt.ItemDataRole.DisplayRole))
+        # type column of the node
+        item = self.itemFromIndex(index)
+        type = str(item.type_item) if item else ""
 
         return type
 
@@ -838,10 +1541,9 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def get_hdf5_path_from_index(self, index):
 
-        # second column index
-        idx_col = index.siblingAtColumn(2)
-        item_col = self.itemFromIndex(idx_col)
-        type = str(item_col.data(Qt.ItemDataRole.DisplayRole))
+        # hdf5 column of the node
+        item = self.itemFromIndex(index)
+        type = str(item.hdf5_path) if item else ""
 
         return type
 
@@ -849,12 +1551,10 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def open_h5_file(self, path):
 
-        # open and store hdf
-        try:
-            self.parent.hdf_dict[path] = h5py.File(path, "r")
-        except Exception as xcp:
+        # open the file in the pool (it is reopened transparently if it is closed later)
+        xcp = self.hdf5_tree_view.hdf_dict.open_file(path)
+        if xcp:
             print("Exception at {} for path {}: {}".format("open_h5_file", path, xcp))
-            self.parent.hdf_dict[path] = None
             return xcp
 
         return None
@@ -863,19 +1563,8 @@ class HDF5TreeViewModel(QStandardItemModel):
 
     def is_df_node(self, node):
 
-        # init variables
-        boolean = False
-        shape = None
-
-        # data type should be DataFrame and node should be Group
-        if isinstance(node, h5py.Group):
-            if "data_type" in node.attrs.keys():
-                if fromBytesToString(node.attrs["data_type"]) == "DataFrame":
-                    boolean = True
-                    if "data" in node.keys():
-                        child = node["data"]
-                        if isinstance(child, h5py.Dataset):
-                            shape = child.shape
+        # shared with the metadata index
+        boolean, shape = get_df_node_shape(node)
 
         return boolean, shape
 
@@ -0,0 +1,118 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+
+#################################################################
+#################################################################
+
+class MemoryBoundedLRUCache:
+    """
+    Least recently used cache limited by the approximate memory of its values (sys.getsizeof by default).
+    The least recently used entries are evicted when the limit is exceeded.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, max_bytes, get_size = sys.getsizeof):
+
+        # attributes
+        self.max_bytes = max_bytes
+        self.get_size = get_size
+
+        # entries (oldest first) and their sizes
+        self.entries = collections.OrderedDict()
+        self.sizes = {}
+        self.n_bytes = 0
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+        return
+
+    #----------------------------------------------#
+
+    def __contains__(self, key):
+
+        return key in self.entries
+
+    #----------------------------------------------#
+
+    def __len__(self):
+
+        return len(self.entries)
+
+    #----------------------------------------------#
+
+    def get(self, key, default = None):
+
+        # miss
+        if key not in self.entries:
+            self.misses += 1
+            return default
+
+        # hit (mark as most recently used)
+        self.hits += 1
+        self.entries.move_to_end(key)
+
+        return self.entries[key]
+
+    #----------------------------------------------#
+
+    def put(self, key, value):
+
+        # replace the previous value
+        if key in self.entries:
+            self.pop(key)
+
+        # values bigger than the whole cache are not stored
+        size = self.get_size(value)
+        if size > self.max_bytes:
+            return
+
+        # store the value
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.n_bytes += size
+
+        # evict the least recently used entries
+        while self.n_bytes > self.max_bytes:
+            self.pop(next(iter(self.entries)))
+
+        return
+
+    #----------------------------------------------#
+
+    def pop(self, key, default = None):
+
+        # remove the entry
+        if key not in self.entries:
+            return default
+        self.n_bytes -= self.sizes.pop(key)
+
+        return self.entries.pop(key)
+
+    #----------------------------------------------#
+
+    def clear(self):
+
+        # remove all the entries
+        self.entries.clear()
+        self.sizes.clear()
+        self.n_bytes = 0
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,426 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# no qt and no pytimber here (used by the query threads and by the scripts with stub sessions)
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import getpass
+import threading
+import contextlib
+import numpy as np
+from davit.utils.nxcals_result_block import NXCALSResultBlock
+
+# file locks between the processes sharing the store
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# name of the folder (inside the temp dir, followed by the user name) where the segments are stored
+CACHE_DIR_NAME = "davit_nxcals_cache"
+
+# index of the store (coverage of every query and variable, segments and last accesses)
+INDEX_FILE_NAME = "index.json"
+
+# file locked while the index is read, modified and written (several instances of the application share the store)
+LOCK_FILE_NAME = "index.lock"
+
+# default size limit of the whole store
+DEFAULT_MAX_SIZE_IN_MB = 2048
+
+# the last seconds before now are never marked as covered (nxcals can still receive data for them)
+SETTLE_SECONDS = 300
+
+# segments of a variable are merged into one when there are more than this
+MAX_SEGMENTS_PER_VARIABLE = 32
+
+#################################################################
+#################################################################
+
+def merge_intervals(intervals):
+
+    # sorted union of closed intervals
+    merged = []
+    for t1, t2 in sorted(intervals):
+        if merged and t1 <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], t2)
+        else:
+            merged.append([t1, t2])
+
+    return merged
+
+#################################################################
+#################################################################
+
+def intersect_intervals(intervals_a, intervals_b):
+
+    # parts covered by both lists of merged intervals
+    intersection = []
+    for a1, a2 in intervals_a:
+        for b1, b2 in intervals_b:
+            if min(a2, b2) > max(a1, b1):
+                intersection.append([max(a1, b1), min(a2, b2)])
+
+    return merge_intervals(intersection)
+
+#################################################################
+#################################################################
+
+def subtract_intervals(t1, t2, intervals):
+
+    # parts of [t1, t2] not covered by the merged intervals
+    missing = []
+    start = t1
+    for c1, c2 in intervals:
+        if c2 <= start or c1 >= t2:
+            continue
+        if c1 > start:
+            missing.append((start, c1))
+        start = max(start, c2)
+    if start < t2:
+        missing.append((start, t2))
+
+    return missing
+
+#################################################################
+#################################################################
+
+def get_user_cache_dir(base_dir = None):
+
+    # private folder of the user inside the temp dir (the extractions are not readable by the other users of the node)
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = str(os.getuid()) if hasattr(os, "getuid") else "user"
+    base_dir = base_dir if base_dir else tempfile.gettempdir()
+    cache_dir = os.path.join(base_dir, "{}_{}".format(CACHE_DIR_NAME, user))
+
+    # the folder must belong to the user (otherwise the one in the home directory is used)
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if hasattr(os, "getuid"):
+            if os.stat(cache_dir).st_uid != os.getuid():
+                raise PermissionError("{} belongs to another user".format(cache_dir))
+            os.chmod(cache_dir, 0o700)
+    except Exception as xcp:
+        print("Exception at get_user_cache_dir: {}".format(xcp))
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "davit", CACHE_DIR_NAME)
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    return cache_dir
+
+#################################################################
+#################################################################
+
+def lock_file(lock_file_handle):
+
+    # exclusive lock of the whole file (blocks until the other process releases it)
+    if fcntl is not None:
+        fcntl.flock(lock_file_handle.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        while True:
+            try:
+                msvcrt.locking(lock_file_handle.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                continue
+
+    return
+
+#################################################################
+#################################################################
+
+def unlock_file(lock_file_handle):
+
+    if fcntl is not None:
+        fcntl.flock(lock_file_handle.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        lock_file_handle.seek(0)
+        msvcrt.locking(lock_file_handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    return
+
+#################################################################
+#################################################################
+
+class NXCALSCacheStore:
+    """
+    Local store of NXCALS results: the rows of every variable are kept in segments on disk and the index records which
+    time intervals of every query and variable are already stored, so only the missing sub-intervals have to be fetched.
+    Variables are evicted by last access when the store is over its size limit.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, cache_dir = None, max_size_in_mb = DEFAULT_MAX_SIZE_IN_MB, base_dir = None):
+
+        # init variables
+        self.cache_dir = cache_dir if cache_dir else get_user_cache_dir(base_dir)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE_NAME)
+        self.lock_path = os.path.join(self.cache_dir, LOCK_FILE_NAME)
+        self.max_size_in_mb = max_size_in_mb
+
+        # the query threads share the store (and the lock file is only taken by the outermost call of the thread holding it)
+        self.thread_lock = threading.RLock()
+        self.lock_depth = 0
+        self.lock_file_handle = None
+
+        return
+
+    #----------------------------------------------#
+
+    @contextlib.contextmanager
+    def lock(self):
+
+        # threads of this process first, then the other processes
+        with self.thread_lock:
+            if self.lock_depth == 0:
+                os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+                self.lock_file_handle = open(self.lock_path, "a+")
+                try:
+                    lock_file(self.lock_file_handle)
+                except Exception:
+                    self.lock_file_handle.close()
+                    self.lock_file_handle = None
+                    raise
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    try:
+                        unlock_file(self.lock_file_handle)
+                    finally:
+                        self.lock_file_handle.close()
+                        self.lock_file_handle = None
+
+        return
+
+    #----------------------------------------------#
+
+    def loadIndex(self):
+
+        # empty index when the store does not exist yet (or it is unreadable)
+        try:
+            with open(self.index_path, "r") as index_file:
+                index = json.load(index_file)
+        except Exception:
+            index = {}
+        index.setdefault("variables", {})
+        index.setdefault("queries", {})
+
+        return index
+
+    #----------------------------------------------#
+
+    def saveIndex(self, index):
+
+        # write into a temporary file first and rename at the end (readers never see partial indexes)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(self.index_path, uuid.uuid4().hex)
+            with open(tmp_path, "w") as index_file:
+                json.dump(index, index_file)
+            os.replace(tmp_path, self.index_path)
+        except Exception as xcp:
+            print("Exception at NXCALSCacheStore.saveIndex: {}".format(xcp))
+
+        return
+
+    #----------------------------------------------#
+
+    def getVariableDir(self, name):
+
+        return os.path.join(self.cache_dir, hashlib.sha1(str(name).encode("utf-8")).hexdigest())
+
+    #----------------------------------------------#
+
+    def getCoverage(self, index, query):
+
+        # intervals fetched for the query, plus the ones stored for all of its variables (by other queries)
+        query_entry = index["queries"].get(query, None)
+        if not query_entry:
+            return []
+        coverage = merge_intervals(query_entry["coverage"])
+        variables = [index["variables"].get(name, None) for name in query_entry["variables"]]
+        if variables and all(variables):
+            variables_coverage = merge_intervals(variables[0]["coverage"])
+            for variable in variables[1:]:
+                variables_coverage = intersect_intervals(variables_coverage, merge_intervals(variable["coverage"]))
+            coverage = merge_intervals(coverage + variables_coverage)
+
+        return coverage
+
+    #----------------------------------------------#
+
+    def readSegment(self, path):
+
+        # one block saved by writeSegment
+        with np.load(path, allow_pickle=False) as segment:
+            offsets = segment["offsets"] if segment["offsets"].size else None
+            return NXCALSResultBlock(segment["timestamps"], values=segment["values"], offsets=offsets, scalar=bool(segment["scalar"]))
+
+    #----------------------------------------------#
+
+    def writeSegment(self, name, block):
+
+        # new file in the folder of the variable (the name is unique, so the threads never write the same file)
+        variable_dir = self.getVariableDir(name)
+        os.makedirs(variable_dir, exist_ok=True)
+        path = os.path.join(variable_dir, "segment_{}.npz".format(uuid.uuid4().hex))
+        offsets = block.offsets if block.is_ragged() else np.empty(0, dtype=np.int64)
+        with open(path, "wb") as segment_file:
+            np.savez(segment_file, timestamps=block.timestamps, values=block.values, offsets=offsets, scalar=np.array(block.scalar))
+
+        return os.path.basename(path), os.path.getsize(path)
+
+    #----------------------------------------------#
+
+    def lookup(self, query, t1, t2):
+
+        with self.lock():
+
+            # missing parts of the interval
+            index = self.loadIndex()
+            coverage = self.getCoverage(index, query)
+            missing = subtract_intervals(t1, t2, coverage)
+            if not coverage or missing == [(t1, t2)]:
+                return {}, [(t1, t2)]
+
+            # stored rows of every variable of the query inside the interval
+            cached_dict = {}
+            now = time.time()
+            try:
+                for name in index["queries"][query]["variables"]:
+                    variable = index["variables"][name]
+                    variable_dir = self.getVariableDir(name)
+                    blocks = [self.readSegment(os.path.join(variable_dir, segment["file"])) for segment in variable["segments"] if segment["t2"] >= t1 and segment["t1"] <= t2]
+                    cached_dict[name] = NXCALSResultBlock.concatenate(blocks).between(t1, t2)
+                    variable["last_access"] = now
+            except Exception as xcp:
+                print("Exception at NXCALSCacheStore.lookup: {}".format(xcp))
+                del index["queries"][query]
+                self.saveIndex(index)
+                return {}, [(t1, t2)]
+            index["queries"][query]["last_access"] = now
+            self.saveIndex(index)
+
+        return cached_dict, missing
+
+    #----------------------------------------------#
+
+    def save(self, query, t1, t2, response_dict):
+
+        # recent data can still change, so only the settled part of the interval is stored
+        t2 = min(t2, time.time() - SETTLE_SECONDS)
+        if t2 <= t1:
+            return False
+
+        # only plain arrays can be stored (a query with any other variable is never marked as covered)
+        if any(block.values.dtype == object for block in response_dict.values()):
+            return False
+
+        with self.lock():
+
+            # one segment per variable
+            index = self.loadIndex()
+            now = time.time()
+            try:
+                for name, block in response_dict.items():
+                    variable = index["variables"].setdefault(name, {"coverage": [], "segments": [], "last_access": now})
+                    block = block.between(t1, t2)
+                    if len(block) > 0:
+                        segment_file, segment_size = self.writeSegment(name, block)
+                        variable["segments"].append({"file": segment_file, "t1": float(block.timestamps[0]), "t2": float(block.timestamps[-1]), "size": segment_size})
+                    variable["coverage"] = merge_intervals(variable["coverage"] + [[t1, t2]])
+                    variable["last_access"] = now
+                    if len(variable["segments"]) > MAX_SEGMENTS_PER_VARIABLE:
+                        self.compactVariable(name, variable)
+            except Exception as xcp:
+                print("Exception at NXCALSCacheStore.save: {}".format(xcp))
+                return False
+
+            # coverage of the query
+            query_entry = index["queries"].setdefault(query, {"coverage": [], "variables": [], "last_access": now})
+            query_entry["coverage"] = merge_intervals(query_entry["coverage"] + [[t1, t2]])
+            query_entry["variables"] += [name for name in response_dict.keys() if name not in query_entry["variables"]]
+            query_entry["last_access"] = now
+            self.saveIndex(index)
+
+            # keep the store under the size limit
+            self.prune()
+
+        return True
+
+    #----------------------------------------------#
+
+    def compactVariable(self, name, variable):
+
+        # merge every segment of the variable into a single one
+        variable_dir = self.getVariableDir(name)
+        blocks = [self.readSegment(os.path.join(variable_dir, segment["file"])) for segment in variable["segments"]]
+        block = NXCALSResultBlock.concatenate(blocks)
+        segment_file, segment_size = self.writeSegment(name, block)
+        for segment in variable["segments"]:
+            try:
+                os.remove(os.path.join(variable_dir, segment["file"]))
+            except Exception:
+                pass
+        variable["segments"] = [{"file": segment_file, "t1": float(block.timestamps[0]), "t2": float(block.timestamps[-1]), "size": segment_size}]
+
+        return
+
+    #----------------------------------------------#
+
+    def prune(self):
+
+        with self.lock():
+
+            # size of every variable
+            index = self.loadIndex()
+            sizes = {name: sum(segment["size"] for segment in variable["segments"]) for name, variable in index["variables"].items()}
+            total_size = sum(sizes.values())
+
+            # remove least recently used variables (and the queries that need them) until the limit is respected
+            max_size = self.max_size_in_mb * 1024 ** 2
+            if total_size <= max_size:
+                return
+            for name in sorted(index["variables"].keys(), key=lambda name: index["variables"][name]["last_access"]):
+                if total_size <= max_size:
+                    break
+                shutil.rmtree(self.getVariableDir(name), ignore_errors=True)
+                del index["variables"][name]
+                total_size -= sizes[name]
+                for query in [query for query, query_entry in index["queries"].items() if name in query_entry["variables"]]:
+                    del index["queries"][query]
+            self.saveIndex(index)
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,309 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# no qt and no pytimber here: the planner only needs an object with a get(query, ts1, ts2) method (a stub session in the scripts)
+import time
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+from davit.utils.nxcals_result_block import NXCALSResultBlock
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# how the interval of a query is split (the order is the one of the settings combobox)
+QUERY_WINDOW_MODES = collections.OrderedDict([
+    ("whole interval", None),
+    ("1 hour", 3600),
+    ("1 day", 86400),
+    ("estimated rows", "rows"),
+])
+
+# default number of windows fetched at the same time by every query
+DEFAULT_N_WORKERS = 4
+
+# attempts of every window on top of the first one
+DEFAULT_N_RETRIES = 2
+
+# seconds waited before the first retry of a window (doubled for every attempt)
+RETRY_DELAY_S = 1.0
+
+# estimated rows mode: target rows of every window and length of the first window (used to estimate the rate)
+ROWS_PER_WINDOW = 500_000
+PROBE_WINDOW_SECONDS = 3600
+
+# every call is a full nxcals extraction, so the windows are never shorter than this and never more than that
+MIN_WINDOW_SECONDS = 60
+MAX_WINDOWS = 256
+
+#################################################################
+#################################################################
+
+def get_query_window_names():
+
+    return list(QUERY_WINDOW_MODES.keys())
+
+#################################################################
+#################################################################
+
+def get_query_window_mode(mode_index):
+
+    # index stored in the settings (unknown values fall back to the whole interval)
+    names = get_query_window_names()
+    try:
+        return QUERY_WINDOW_MODES[names[int(mode_index)]]
+    except Exception:
+        return None
+
+#################################################################
+#################################################################
+
+def to_unix_seconds(ts):
+
+    # numbers are already unix seconds, strings and naive datetimes are local time (as for pytimber)
+    if isinstance(ts, (int, float, np.integer, np.floating)):
+        return float(ts)
+
+    return pd.Timestamp(ts).to_pydatetime().timestamp()
+
+#################################################################
+#################################################################
+
+def split_interval(t1, t2, window_seconds, max_windows = MAX_WINDOWS):
+
+    # consecutive windows sharing their edges (the stamps on the edges are de-duplicated when stitching)
+    duration = t2 - t1
+    if duration <= 0 or not window_seconds:
+        return [(t1, t2)]
+    window_seconds = max(float(window_seconds), MIN_WINDOW_SECONDS, duration / max_windows)
+    n_windows = max(1, int(np.ceil(duration / window_seconds - 1e-9)))
+    edges = [t1 + counter * window_seconds for counter in range(n_windows)] + [t2]
+
+    return [(edges[counter], edges[counter + 1]) for counter in range(n_windows)]
+
+#################################################################
+#################################################################
+
+def get_n_rows(blocks):
+
+    # rows of the biggest variable of a window
+    return max([len(block) for block in blocks.values()], default=0)
+
+#################################################################
+#################################################################
+
+def stitch_responses(responses):
+
+    # one block per variable from the blocks of consecutive intervals (keys missing in some of them are only stitched from the others)
+    keys = []
+    for blocks in responses:
+        keys += [key for key in blocks.keys() if key not in keys]
+
+    return {key: NXCALSResultBlock.concatenate([blocks[key] for blocks in responses if key in blocks]) for key in keys}
+
+#################################################################
+#################################################################
+
+class NXCALSQueryPlanner:
+    """
+    Fetches a query window by window with a bounded pool of threads and stitches the windows of every variable into one
+    NXCALSResultBlock. Failed windows are retried on their own. The slots semaphore is shared by all the running queries,
+    so the number of calls to the logging database at the same time never exceeds its size.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, ldb, window_mode = None, n_workers = DEFAULT_N_WORKERS, n_retries = DEFAULT_N_RETRIES, slots = None, progress_callback = None, is_cancelled = None, retry_delay = RETRY_DELAY_S):
+
+        # attributes
+        self.ldb = ldb
+        self.window_mode = window_mode
+        self.n_workers = max(1, int(n_workers))
+        self.n_retries = max(0, int(n_retries))
+        self.slots = slots
+        self.progress_callback = progress_callback
+        self.is_cancelled = is_cancelled
+        self.retry_delay = retry_delay
+
+        # progress
+        self.n_done = 0
+        self.n_total = 0
+        self.n_retried = 0
+        self.lock = threading.Lock()
+
+        return
+
+    #----------------------------------------------#
+
+    def cancelled(self):
+
+        return bool(self.is_cancelled and self.is_cancelled())
+
+    #----------------------------------------------#
+
+    def report_progress(self, n_done = 0, n_total = 0, n_retried = 0):
+
+        # counters are updated by the worker threads
+        with self.lock:
+            self.n_done += n_done
+            self.n_total += n_total
+            self.n_retried += n_retried
+            progress = (self.n_done, self.n_total, self.n_retried)
+        if self.progress_callback:
+            self.progress_callback(*progress)
+
+        return
+
+    #----------------------------------------------#
+
+    def fetch_window(self, query, ts1, ts2):
+
+        # one call per attempt, waiting longer after every failure
+        for attempt in range(self.n_retries + 1):
+            if self.cancelled():
+                raise RuntimeError("Query cancelled")
+            if attempt > 0:
+                self.report_progress(n_retried=1)
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                if self.slots is not None:
+                    self.slots.acquire()
+                try:
+                    response = self.ldb.get(query, ts1, ts2)
+                finally:
+                    if self.slots is not None:
+                        self.slots.release()
+                blocks = {key: NXCALSResultBlock.from_response(value[0], value[1]) for key, value in response.items()}
+                break
+            except Exception as xcp:
+                if attempt == self.n_retries:
+                    raise
+                print("Exception at fetch_window ({} from {} to {}), attempt {}: {}".format(query, ts1, ts2, attempt + 1, xcp))
+
+        # window done
+        self.report_progress(n_done=1)
+
+        return blocks
+
+    #----------------------------------------------#
+
+    def fetch_windows(self, query, windows):
+
+        # bounded pool, the results keep the order of the windows
+        results = [None] * len(windows)
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(self.n_workers, len(windows))) as executor:
+            futures = {executor.submit(self.fetch_window, query, ts1, ts2): counter for counter, (ts1, ts2) in enumerate(windows)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counter = futures[future]
+                    try:
+                        results[counter] = future.result()
+                    except Exception as xcp:
+                        errors.append((windows[counter], xcp))
+
+        return results, errors
+
+    #----------------------------------------------#
+
+    def plan_windows(self, query, t1, t2):
+
+        # fixed length windows
+        if self.window_mode != "rows":
+            return [], split_interval(t1, t2, self.window_mode)
+
+        # estimated rows: fetch a first window and size the rest from its rate
+        probe_stop = min(t2, t1 + PROBE_WINDOW_SECONDS)
+        self.report_progress(n_total=1)
+        probe_blocks = self.fetch_window(query, t1, probe_stop)
+        if probe_stop >= t2:
+            return [probe_blocks], []
+        rate = get_n_rows(probe_blocks) / (probe_stop - t1)
+        window_seconds = ROWS_PER_WINDOW / rate if rate > 0 else QUERY_WINDOW_MODES["1 day"]
+
+        return [probe_blocks], split_interval(probe_stop, t2, window_seconds)
+
+    #----------------------------------------------#
+
+    def run(self, query, ts1, ts2):
+
+        # whole interval: a single call with the original stamps (only retried)
+        if self.window_mode is None:
+            self.report_progress(n_total=1)
+            return self.fetch_window(query, ts1, ts2), None
+
+        # plan the windows
+        t1 = to_unix_seconds(ts1)
+        t2 = to_unix_seconds(ts2)
+        results, windows = self.plan_windows(query, t1, t2)
+        self.report_progress(n_total=len(windows))
+
+        # fetch them
+        errors = []
+        if windows:
+            window_results, errors = self.fetch_windows(query, windows)
+            results += [result for result in window_results if result is not None]
+        if errors and len(errors) == len(windows) and not results:
+            raise errors[0][1]
+
+        # stitch every variable
+        response_dict = stitch_responses(results)
+
+        # failed windows are reported with the partial result
+        error = None
+        if errors:
+            error = "{} of {} time windows failed after {} retries (first: {} to {}: {})".format(len(errors), len(windows), self.n_retries, pd.Timestamp.fromtimestamp(errors[0][0][0]), pd.Timestamp.fromtimestamp(errors[0][0][1]), errors[0][1])
+
+        return response_dict, error
+
+    #----------------------------------------------#
+
+    def run_with_cache(self, query, ts1, ts2, cache_store):
+
+        # stored rows and sub-intervals that still have to be fetched
+        t1 = to_unix_seconds(ts1)
+        t2 = to_unix_seconds(ts2)
+        cached_dict, missing = cache_store.lookup(query, t1, t2)
+        if not missing:
+            self.report_progress()
+
+        # fetch and store the missing parts (only the complete ones are marked as covered)
+        responses = [cached_dict]
+        errors = []
+        for missing_t1, missing_t2 in missing:
+            try:
+                response_dict, error = self.run(query, missing_t1, missing_t2)
+            except Exception as xcp:
+                errors.append(xcp)
+                continue
+            if error:
+                errors.append(error)
+            else:
+                cache_store.save(query, missing_t1, missing_t2, response_dict)
+            responses.append(response_dict)
+        if errors and len(errors) == len(missing) and not cached_dict:
+            raise errors[0] if isinstance(errors[0], Exception) else RuntimeError(errors[0])
+
+        # merge the stored rows with the new ones
+        response_dict = stitch_responses(responses)
+
+        return response_dict, (str(errors[0]) if errors else None)
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -4,6 +4,7 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from davit.utils.nxcals_query_planner import NXCALSQueryPlanner, DEFAULT_N_WORKERS, DEFAULT_N_RETRIES
 
 #################################################################
 #################################################################
@@ -14,10 +15,11 @@ class NXCALSQueryThread(QThread):
 
     # signals
     finished = pyqtSignal(tuple)
+    progress = pyqtSignal(int, int, int, int)
 
     #----------------------------------------------#
 
-    def __init__(self, ldb, query, ts1, ts2, id):
+    def __init__(self, ldb, query, ts1, ts2, id, window_mode = None, n_workers = DEFAULT_N_WORKERS, n_retries = DEFAULT_N_RETRIES, slots = None, cache_store = None):
 
         # inheritance
         super().__init__()
@@ -28,6 +30,21 @@ class NXCALSQueryThread(QThread):
         self.ts1 = ts1
         self.ts2 = ts2
         self.id = id
+        self.window_mode = window_mode
+        self.n_workers = n_workers
+        self.n_retries = n_retries
+        self.slots = slots
+        self.cache_store = cache_store
+        self.is_cancelled = False
+
+        return
+
+    #----------------------------------------------#
+
+    def cancel(self):
+
+        # the windows not started yet are skipped
+        self.is_cancelled = True
 
         return
 
@@ -35,10 +52,18 @@ class NXCALSQueryThread(QThread):
 
     def search_query(self, query, ts1, ts2, verbose=True):
 
-        # perform the call
+        # fetch the time windows and keep every variable as a columnar block (built here, outside the gui thread)
         error = None
+        planner = NXCALSQueryPlanner(self.ldb, window_mode=self.window_mode, n_workers=self.n_workers, n_retries=self.n_retries, slots=self.slots,
+                                     progress_callback=lambda n_done, n_total, n_retried: self.progress.emit(self.id, n_done, n_total, n_retried),
+                                     is_cancelled=lambda: self.is_cancelled)
         try:
-            response_dict = self.ldb.get(query, ts1, ts2)
+            if self.cache_store is None:
+                response_dict, error = planner.run(query, ts1, ts2)
+            else:
+                response_dict, error = planner.run_with_cache(query, ts1, ts2, self.cache_store)
+            if error and verbose:
+                print(error)
         except Exception as xcp:
             response_dict = {}
             error = xcp
@@ -0,0 +1,209 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# only data libraries (the blocks are also built by the query planner, which runs without qt or pytimber against stub sessions)
+from datetime import datetime
+from dateutil import tz
+import numpy as np
+import pandas as pd
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# format of the acquisition stamps shown in the tree and used as column names
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+#################################################################
+#################################################################
+
+def get_local_datetime_index(timestamps):
+
+    # unix seconds to naive local datetimes (same as datetime.fromtimestamp but vectorized)
+    return pd.to_datetime(timestamps, unit="s", utc=True).tz_convert(tz.tzlocal()).tz_localize(None)
+
+#################################################################
+#################################################################
+
+class NXCALSResultBlock:
+    """
+    Columnar result of one NXCALS variable: a timestamp array plus either a contiguous 2D value array (one row per stamp)
+    or a ragged pair of offsets and flat values (when the stamps have vectors of different lengths).
+    Rows are only turned into arrays or strings when they are requested.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, timestamps, values = None, offsets = None, scalar = False):
+
+        # attributes
+        self.timestamps = timestamps
+        self.values = values
+        self.offsets = offsets
+        self.scalar = scalar
+
+        return
+
+    #----------------------------------------------#
+
+    @classmethod
+    def from_response(cls, timestamps, values):
+
+        # timestamps as float seconds
+        timestamps = np.asarray(timestamps, dtype=np.float64).ravel()
+        n_rows = timestamps.size
+        values = values if isinstance(values, np.ndarray) else np.asarray(values)
+
+        # plain arrays: scalars (one column) or vectors of the same length (already contiguous)
+        if values.dtype != object:
+            if values.ndim <= 1:
+                return cls(timestamps, values=np.ascontiguousarray(values.reshape(n_rows, 1)), scalar=True)
+            return cls(timestamps, values=np.ascontiguousarray(values.reshape(n_rows, -1)))
+
+        # object arrays: stack the rows if they have the same length, otherwise keep them ragged
+        scalar = all(np.ndim(row) == 0 for row in values)
+        rows = [np.ravel(np.asarray(row)) for row in values]
+        lengths = np.array([row.size for row in rows], dtype=np.int64)
+        if n_rows == 0:
+            return cls(timestamps, values=np.empty((0, 1)), scalar=True)
+        if np.all(lengths == lengths[0]):
+            return cls(timestamps, values=np.stack(rows), scalar=scalar)
+        offsets = np.zeros(n_rows + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+
+        return cls(timestamps, values=np.concatenate(rows), offsets=offsets)
+
+    #----------------------------------------------#
+
+    @classmethod
+    def concatenate(cls, blocks):
+
+        # blocks of consecutive time windows (the stamps on the window edges can be returned twice)
+        blocks = [block for block in blocks if len(block) > 0]
+        if not blocks:
+            return cls(np.empty(0, dtype=np.float64), values=np.empty((0, 1)), scalar=True)
+        if len(blocks) == 1:
+            return blocks[0]
+
+        # keep the first row of every stamp, sorted by time
+        timestamps = np.concatenate([block.timestamps for block in blocks])
+        unique_timestamps, keep = np.unique(timestamps, return_index=True)
+
+        # plain blocks with the same number of columns: stack them
+        widths = set(block.values.shape[1] for block in blocks if not block.is_ragged())
+        if not any(block.is_ragged() for block in blocks) and len(widths) == 1:
+            values = np.concatenate([block.values for block in blocks])[keep]
+            return cls(unique_timestamps, values=values, scalar=all(block.scalar for block in blocks))
+
+        # otherwise merge them as ragged rows
+        rows = [block.get_row(row) for block in blocks for row in range(len(block))]
+        values = np.empty(keep.size, dtype=object)
+        for counter, row in enumerate(keep):
+            values[counter] = rows[row]
+
+        return cls.from_response(unique_timestamps, values)
+
+    #----------------------------------------------#
+
+    def __len__(self):
+
+        return self.timestamps.size
+
+    #----------------------------------------------#
+
+    def is_ragged(self):
+
+        return self.offsets is not None
+
+    #----------------------------------------------#
+
+    def get_row(self, row):
+
+        # values of one acquisition stamp (a view, scalars as arrays of one element)
+        if self.is_ragged():
+            return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+        return self.values[row]
+
+    #----------------------------------------------#
+
+    def get_row_shape(self, row):
+
+        # shape of the values of one acquisition stamp
+        if self.is_ragged():
+            return (int(self.offsets[row + 1] - self.offsets[row]),)
+
+        return (self.values.shape[1],)
+
+    #----------------------------------------------#
+
+    def take(self, rows):
+
+        # new block with the selected rows (in the given order)
+        rows = np.asarray(rows, dtype=np.int64)
+        if not self.is_ragged():
+            return NXCALSResultBlock(self.timestamps[rows], values=self.values[rows], scalar=self.scalar)
+        lengths = np.diff(self.offsets)[rows]
+        offsets = np.zeros(rows.size + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        values = np.concatenate([self.get_row(row) for row in rows]) if rows.size else self.values[0:0]
+
+        return NXCALSResultBlock(self.timestamps[rows], values=values, offsets=offsets)
+
+    #----------------------------------------------#
+
+    def between(self, t1, t2):
+
+        # rows with stamps inside [t1, t2] (the stamps are sorted)
+        start = np.searchsorted(self.timestamps, t1, side="left")
+        stop = np.searchsorted(self.timestamps, t2, side="right")
+
+        return self.take(np.arange(start, stop))
+
+    #----------------------------------------------#
+
+    def get_timestamp_text(self, row):
+
+        # readable stamp (only computed for the rows shown)
+        return datetime.fromtimestamp(self.timestamps[row]).strftime(TIMESTAMP_FORMAT)
+
+    #----------------------------------------------#
+
+    def to_dataframe(self, name, rows = None):
+
+        # selected rows (all by default)
+        timestamps = self.timestamps if rows is None else self.timestamps[rows]
+
+        # acquisition stamps as text (same keys as the tree)
+        stamps = get_local_datetime_index(timestamps).strftime(TIMESTAMP_FORMAT)
+
+        # scalars (or vectors of one element): one column indexed by the acquisition stamps
+        if not self.is_ragged() and self.values.shape[1] == 1:
+            values = self.values[:, 0] if rows is None else self.values[rows, 0]
+            return pd.DataFrame({str(name): values}, index=stamps, copy=False)
+
+        # vectors of different lengths cannot be merged
+        if self.is_ragged():
+            lengths = np.diff(self.offsets) if rows is None else np.diff(self.offsets)[rows]
+            if lengths.size and np.any(lengths != lengths[0]):
+                raise ValueError("Not all the acquisition stamps have the same number of elements. Unable to merge.")
+            values = np.stack([self.get_row(row) for row in (range(len(self)) if rows is None else rows)]) if lengths.size else np.empty((0, 0))
+        else:
+            values = self.values if rows is None else self.values[rows]
+
+        # vectors: one column per acquisition stamp
+        return pd.DataFrame(values.T, columns=stamps, copy=False)
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
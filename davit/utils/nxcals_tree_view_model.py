@@ -10,11 +10,129 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from davit.utils.nxcals_result_block import NXCALSResultBlock
 
 #################################################################
 #################################################################
 
-class NXCALSTreeViewModel(QStandardItemModel):
+# CONSTANTS
+
+# columns of the tree (same order as the default header labels)
+COLUMN_QUERY = 0
+COLUMN_TS1 = 1
+COLUMN_TS2 = 2
+COLUMN_ELAPSED_TIME = 3
+COLUMN_SHAPE = 4
+
+#################################################################
+#################################################################
+
+class NXCALSTreeNode:
+    """
+    Record for a query row or a variable row of the NXCALS tree.
+    Variables keep their result as a columnar block, their acquisition stamps are virtual rows (no record per stamp).
+    """
+
+    __slots__ = ("name", "ts1", "ts2", "elapsed_time", "icon_str", "background_color", "tooltip", "block", "stamp_rows", "parent", "children")
+
+    #----------------------------------------------#
+
+    def __init__(self, name, icon_str = "", ts1 = "", ts2 = "", elapsed_time = "", block = None, parent = None):
+
+        # attributes
+        self.name = str(name)
+        self.ts1 = ts1
+        self.ts2 = ts2
+        self.elapsed_time = elapsed_time
+        self.icon_str = icon_str
+        self.background_color = None
+        self.tooltip = None
+
+        # result of the variable (None for queries)
+        self.block = block
+        self.stamp_rows = NXCALSStampRows(self) if block is not None else None
+
+        # hierarchy
+        self.parent = parent
+        self.children = []
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class NXCALSStampRows:
+    """
+    Internal pointer shared by all the acquisition stamp rows of a variable (the row number selects the stamp).
+    """
+
+    __slots__ = ("node",)
+
+    #----------------------------------------------#
+
+    def __init__(self, node):
+
+        # variable node
+        self.node = node
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class NXCALSTreeItem:
+    """
+    Item returned by NXCALSTreeViewModel.itemFromIndex, with the text() and data() API of the old QStandardItems.
+    """
+
+    __slots__ = ("model", "index")
+
+    #----------------------------------------------#
+
+    def __init__(self, model, index):
+
+        # attributes
+        self.model = model
+        self.index = index
+
+        return
+
+    #----------------------------------------------#
+
+    def text(self):
+
+        text = self.model.data(self.index, Qt.ItemDataRole.DisplayRole)
+
+        return text if text is not None else ""
+
+    #----------------------------------------------#
+
+    def data(self, role = Qt.ItemDataRole.UserRole):
+
+        return self.model.data(self.index, role)
+
+    #----------------------------------------------#
+
+    def hasChildren(self):
+
+        return self.model.hasChildren(self.index)
+
+    #----------------------------------------------#
+
+    def rowCount(self):
+
+        return self.model.rowCount(self.index)
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class NXCALSTreeViewModel(QAbstractItemModel):
 
     #----------------------------------------------#
 
@@ -23,168 +141,376 @@ class NXCALSTreeViewModel(QStandardItemModel):
         # inheritance
         super().__init__()
 
-        # attributes
+        # attributes (the view is not stored as self.parent because it would shadow QAbstractItemModel.parent)
         self.header_labels = header_labels
-        self.parent = parent
+        self.nxcals_tree_view = parent
         self.global_parent = global_parent
 
         # init shape column
         self.shape_column = self.header_labels.index('Shape')
 
-        # init properties
-        self.clear()
-        self.setRowCount(0)
-        self.setColumnCount(len(self.header_labels))
-        self.setHorizontalHeaderLabels(self.header_labels)
+        # invisible root and shared icons (one QIcon per icon string)
+        self.root_node = NXCALSTreeNode("")
+        self.icon_cache = {}
 
         return
 
     #----------------------------------------------#
 
-    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+    def index(self, row, column, parent = QModelIndex()):
 
-        # only intercept display role for Shape column
-        if role == Qt.ItemDataRole.DisplayRole and index.column() == self.shape_column:
+        # check the row and column exist
+        if row < 0 or column < 0 or column >= len(self.header_labels) or row >= self.rowCount(parent):
+            return QModelIndex()
 
-            # detect top-level items (invisible root's direct children)
-            is_top_level = not index.parent().isValid()
+        # acquisition stamps of a variable (virtual rows)
+        parent_node = self.get_node(parent)
+        if parent_node.block is not None:
+            return self.createIndex(row, column, parent_node.stamp_rows)
 
-            # retrieve the corresponding tree item (col 0)
-            tree_item = self.itemFromIndex(index.siblingAtColumn(0))
+        return self.createIndex(row, column, parent_node.children[row])
 
-            # if has children, show count
-            if tree_item.hasChildren():
-                count = tree_item.rowCount()
-                return f"{count} item{'s' if count != 1 else ''}"
+    #----------------------------------------------#
 
-            # leaf node: if top-level and no children, show empty
-            if is_top_level:
-                return ""
+    def parent(self, index):
 
-            # otherwise, display numpy array shape (e.g., "(0,)" for empty arrays)
-            arr = tree_item.data(Qt.ItemDataRole.UserRole)
-            shape = getattr(arr, 'shape', ())
-            return str(shape)
+        # top-level nodes have no parent index
+        if not index.isValid():
+            return QModelIndex()
+        pointer = index.internalPointer()
+        parent_node = pointer.node if isinstance(pointer, NXCALSStampRows) else pointer.parent
+        if parent_node is None or parent_node is self.root_node:
+            return QModelIndex()
 
-        return super().data(index, role)
+        return self.get_index(parent_node)
 
     #----------------------------------------------#
 
-    def add_query(self, query, ts1, ts2, elapsed_time):
+    def rowCount(self, parent = QModelIndex()):
 
-        # add the root for that query
-        root_query = self.add_node(self, node_name = "{}".format(query), node_data = np.array([]), qta_icon_str = "ei.search-alt", ts1 = ts1, ts2 = ts2, elapsed_time = elapsed_time)
+        # only the first column has children
+        if parent.column() > 0:
+            return 0
 
-        return root_query
+        # stamps have no children
+        if parent.isValid() and isinstance(parent.internalPointer(), NXCALSStampRows):
+            return 0
+
+        # variables have one row per stamp
+        node = self.get_node(parent)
+        if node.block is not None:
+            return len(node.block)
+
+        return len(node.children)
 
     #----------------------------------------------#
 
-    def update_query(self, item, elapsed_time):
+    def columnCount(self, parent = QModelIndex()):
 
-        # update elapsed time
-        index = self.indexFromItem(item)
-        column_index = index.siblingAtColumn(3)
-        self.setData(column_index, elapsed_time)
+        return len(self.header_labels)
 
-        return
+    #----------------------------------------------#
+
+    def hasChildren(self, parent = QModelIndex()):
+
+        return self.rowCount(parent) > 0
 
     #----------------------------------------------#
 
-    def add_results_to_query(self, root_query, query, response_dict, error):
+    def flags(self, index):
 
-        # change elapsed time
-        self.update_query(root_query, elapsed_time = "DONE")
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
 
-        # change color first
-        index = self.indexFromItem(root_query)
-        for col in range(0, self.columnCount()):
-            item = self.itemFromIndex(index.siblingAtColumn(col))
-            if error:
-                item.setBackground(QBrush(QColor("#E8A2A2")))
-                item.setToolTip("Error: {}".format(error))
-            else:
-                if response_dict:
-                    item.setBackground(QBrush(QColor("#95EA71")))
-                else:
-                    item.setBackground(QBrush(QColor("#ffdf80")))
-                    item.setToolTip("Query has finished and is empty!")
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
 
-        # add the other nodes
-        for key in response_dict.keys():
-            self.build_key_tree(key, root_query, response_dict)
+    #----------------------------------------------#
+
+    def headerData(self, section, orientation, role = Qt.ItemDataRole.DisplayRole):
+
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if section < len(self.header_labels):
+                return self.header_labels[section]
+
+        return None
+
+    #----------------------------------------------#
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+
+        # check index
+        if not index.isValid():
+            return None
+
+        # acquisition stamp rows (formatted only when they are shown)
+        pointer = index.internalPointer()
+        column = index.column()
+        if isinstance(pointer, NXCALSStampRows):
+            return self.get_stamp_data(pointer.node.block, index.row(), column, role)
+
+        # query and variable rows
+        node = pointer
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.get_column_text(node, column)
+        elif role == Qt.ItemDataRole.BackgroundRole:
+            if node.background_color:
+                return QBrush(QColor(node.background_color))
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return node.tooltip
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            if column != COLUMN_QUERY:
+                return QBrush(Qt.GlobalColor.darkGray)
+        elif column == COLUMN_QUERY:
+            if role == Qt.ItemDataRole.UserRole:
+                return np.array([])
+            elif role == Qt.ItemDataRole.DecorationRole:
+                return self.get_icon(node.icon_str)
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_column_text(self, node, column):
+
+        # same text as the old items of each column
+        if column == COLUMN_QUERY:
+            return node.name
+        elif column == COLUMN_TS1:
+            return node.ts1
+        elif column == COLUMN_TS2:
+            return node.ts2
+        elif column == COLUMN_ELAPSED_TIME:
+            return node.elapsed_time
+        elif column == self.shape_column:
+            count = len(node.block) if node.block is not None else len(node.children)
+            if count == 0:
+                return "(0,)" if node.block is not None else ""
+            return f"{count} item{'s' if count != 1 else ''}"
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_stamp_data(self, block, row, column, role):
+
+        # text of the stamp and shape of its values
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == COLUMN_QUERY:
+                return block.get_timestamp_text(row)
+            elif column == self.shape_column:
+                return str(block.get_row_shape(row))
+            return ""
+
+        # values of the stamp (a view of the block)
+        if column == COLUMN_QUERY:
+            if role == Qt.ItemDataRole.UserRole:
+                return block.get_row(row)
+            elif role == Qt.ItemDataRole.DecorationRole:
+                return self.get_icon("mdi.data-matrix")
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            return QBrush(Qt.GlobalColor.darkGray)
+
+        return None
+
+    #----------------------------------------------#
+
+    def get_icon(self, icon_str):
+
+        # create every icon only once
+        icon = self.icon_cache.get(icon_str)
+        if icon is None:
+            icon = QIcon(qta.icon(icon_str))
+            self.icon_cache[icon_str] = icon
+
+        return icon
+
+    #----------------------------------------------#
+
+    def itemFromIndex(self, index):
+
+        # item with the QStandardItem API (None for the invisible root)
+        if not index.isValid():
+            return None
+
+        return NXCALSTreeItem(self, index)
+
+    #----------------------------------------------#
+
+    def get_node(self, index):
+
+        # invalid indexes refer to the invisible root
+        if not index.isValid():
+            return self.root_node
+
+        return index.internalPointer()
+
+    #----------------------------------------------#
+
+    def get_index(self, node, column = 0):
+
+        # index of a node (invalid for the invisible root or removed nodes)
+        if node is None or node is self.root_node or node.parent is None:
+            return QModelIndex()
+
+        return self.createIndex(node.parent.children.index(node), column, node)
+
+    #----------------------------------------------#
+
+    def get_block(self, index):
+
+        # columnar result of a variable row (None for queries and stamps)
+        if not index.isValid():
+            return None
+        pointer = index.internalPointer()
+        if isinstance(pointer, NXCALSStampRows):
+            return None
+
+        return pointer.block
+
+    #----------------------------------------------#
+
+    def get_block_row(self, index):
+
+        # block and row of an acquisition stamp row (None for queries and variables)
+        if not index.isValid():
+            return None, None
+        pointer = index.internalPointer()
+        if not isinstance(pointer, NXCALSStampRows):
+            return None, None
+
+        return pointer.node.block, index.row()
+
+    #----------------------------------------------#
+
+    def insert_nodes(self, parent_node, nodes):
+
+        # append all the rows at once
+        if not nodes:
+            return
+        row = len(parent_node.children)
+        self.beginInsertRows(self.get_index(parent_node), row, row + len(nodes) - 1)
+        for node in nodes:
+            node.parent = parent_node
+        parent_node.children.extend(nodes)
+        self.endInsertRows()
 
         return
 
     #----------------------------------------------#
 
-    def build_key_tree(self, key, root, response_dict):
+    def removeRows(self, row, count, parent = QModelIndex()):
+
+        # only query and variable rows can be removed
+        node = self.get_node(parent)
+        if isinstance(node, NXCALSStampRows) or node.block is not None or row < 0 or row + count > len(node.children):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for child in node.children[row:row + count]:
+            child.parent = None
+        del node.children[row:row + count]
+        self.endRemoveRows()
 
-        # add the node for that key
-        node = self.add_node(root, node_name = str(key), node_data = np.array([]), qta_icon_str = "mdi.focus-field")
+        return True
 
-        # iterate over acq timestamps
-        for counter_ts, acq_timestamp in enumerate(response_dict[key][0]):
+    #----------------------------------------------#
+
+    def clear(self):
 
-            # get ts in readable way
-            formatted_ts = datetime.fromtimestamp(acq_timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')
+        # remove all the nodes
+        self.beginResetModel()
+        for child in self.root_node.children:
+            child.parent = None
+        self.root_node.children = []
+        self.endResetModel()
 
-            # get node_data
-            node_data = response_dict[key][1][counter_ts]
+        return
+
+    #----------------------------------------------#
 
-            # convert to array if it is an scalar
-            if node_data.ndim == 0:
-                node_data = np.array([node_data])
+    def emit_row_changed(self, node):
 
-            # add the node for the corresponding acq stamp
-            self.add_node(node, node_name = formatted_ts, node_data = node_data, qta_icon_str = "mdi.data-matrix")
+        # repaint every column of the row
+        index = self.get_index(node)
+        if index.isValid():
+            self.dataChanged.emit(index, index.siblingAtColumn(len(self.header_labels) - 1))
 
         return
 
     #----------------------------------------------#
 
-    def add_node(self, parent_item, node_name, node_data, qta_icon_str, ts1 = "", ts2 = "", elapsed_time = ""):
+    def add_query(self, query, ts1, ts2, elapsed_time):
+
+        # add the root for that query
+        root_query = NXCALSTreeNode("{}".format(query), icon_str = "ei.search-alt", ts1 = ts1, ts2 = ts2, elapsed_time = elapsed_time)
+        self.insert_nodes(self.root_node, [root_query])
+
+        return root_query
+
+    #----------------------------------------------#
+
+    def update_query(self, item, elapsed_time):
+
+        # update elapsed time (queries removed from the tree are skipped)
+        item.elapsed_time = elapsed_time
+        self.emit_row_changed(item)
 
-        # init item
-        tree_item = QStandardItem(str(node_name))
-        tree_item.setData(node_data, Qt.ItemDataRole.UserRole)
+        return
+
+    #----------------------------------------------#
+
+    def add_results_to_query(self, root_query, query, response_dict, error):
 
-        # create empty items for the query info
-        ts1_item = QStandardItem(ts1)
-        ts2_item = QStandardItem(ts2)
-        elapsed_time_item = QStandardItem(elapsed_time)
+        # change elapsed time
+        root_query.elapsed_time = "DONE"
 
-        # create shape item
-        if node_data.size > 0:
-            shape_item = QStandardItem("{}".format(node_data.shape))
+        # change color first
+        if error:
+            root_query.background_color = "#E8A2A2"
+            root_query.tooltip = "Error: {}".format(error)
+        elif response_dict:
+            root_query.background_color = "#95EA71"
         else:
-            shape_item = QStandardItem("")
+            root_query.background_color = "#ffdf80"
+            root_query.tooltip = "Query has finished and is empty!"
+        self.emit_row_changed(root_query)
+
+        # query removed from the tree while it was running
+        if root_query.parent is None:
+            return
+
+        # add the other nodes
+        nodes = [self.build_key_tree(key, response_dict) for key in response_dict.keys()]
+        self.insert_nodes(root_query, nodes)
 
-        # set icons
-        tree_item.setIcon(QIcon(qta.icon(qta_icon_str)))
+        return
+
+    #----------------------------------------------#
 
-        # set foregrounds
-        ts1_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-        ts2_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-        elapsed_time_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
-        shape_item.setForeground(QBrush((Qt.GlobalColor.darkGray)))
+    def build_key_tree(self, key, response_dict):
 
-        # append the row
-        parent_item.appendRow([tree_item, ts1_item, ts2_item, elapsed_time_item, shape_item])
+        # results already converted by the query thread, raw (timestamps, values) pairs otherwise
+        block = response_dict[key]
+        if not isinstance(block, NXCALSResultBlock):
+            block = NXCALSResultBlock.from_response(block[0], block[1])
 
-        return tree_item
+        # one node for that key (the acquisition stamps are rows of its block)
+        node = NXCALSTreeNode(str(key), icon_str = "mdi.focus-field", block = block)
+
+        return node
 
     #----------------------------------------------#
 
     def handle_expanded(self, index):
 
         # background colors back to normal
-        for col in range(0, self.columnCount()):
-            item = self.itemFromIndex(index.siblingAtColumn(col))
-            item.setBackground(QBrush(QColor("#ffffff")))
+        node = self.get_node(index)
+        if isinstance(node, NXCALSTreeNode) and node.background_color:
+            node.background_color = "#ffffff"
+            self.emit_row_changed(node)
 
         return
 
     #----------------------------------------------#
 
 #################################################################
-#################################################################
\ No newline at end of file
+#################################################################
@@ -0,0 +1,71 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+from davit.__imports__ import *
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# name of the log file (inside the temp dir)
+PERFORMANCE_LOG_FILE_NAME = "davit_performance_log.jsonl"
+
+# the log is truncated when it grows above this size
+PERFORMANCE_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+#################################################################
+#################################################################
+
+class PerformanceLog:
+    """
+    Append-only log (one json object per line) of timings and i/o settings, used to compare read configurations.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, log_path = None):
+
+        # init variables
+        self.log_path = log_path if log_path else os.path.join(getSystemTempDir(), PERFORMANCE_LOG_FILE_NAME)
+
+        return
+
+    #----------------------------------------------#
+
+    def record(self, event, **fields):
+
+        # build the entry
+        entry = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event}
+        entry.update(fields)
+
+        # append it (a failing log never stops the application)
+        try:
+            mode = "a"
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > PERFORMANCE_LOG_MAX_BYTES:
+                mode = "w"
+            with open(self.log_path, mode) as log_file:
+                log_file.write(json.dumps(entry, default=str) + "\n")
+        except Exception as xcp:
+            print("Exception at PerformanceLog.record: {}".format(xcp))
+
+        return
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+# shared log of the application
+performance_log = PerformanceLog()
+
+#################################################################
+#################################################################
@@ -0,0 +1,197 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# no qt here (the client is also used by the scripts against a stub http server)
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from davit.utils.postmortem_json_decoder import decode_pm_response
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# rest api of the postmortem service
+DEFAULT_PM_SERVER = "http://pm-rest.cern.ch"
+
+# seconds to connect and to wait for the response (big events take a while to be served)
+DEFAULT_TIMEOUT = (10, 300)
+
+# retries of every request (connection errors and busy server answers), waiting backoff * 2 ** retry seconds
+DEFAULT_N_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# connections kept alive with the server (also the default number of workers of the bulk requests)
+DEFAULT_POOL_SIZE = 16
+
+# endpoints (and the json key of their records, None when the whole response is the list of records)
+PM_ENDPOINTS = {
+    "header_range": ("/v3/pmdata/header/within/range", None),
+    "duration": ("/v3/pmdata/within/duration", ["content"]),
+    "range": ("/v3/pmdata/within/range", ["content"]),
+}
+
+#################################################################
+#################################################################
+
+# sessions shared by all the clients of the same server (every query thread reuses the open connections)
+shared_sessions = {}
+shared_sessions_lock = threading.Lock()
+
+#################################################################
+#################################################################
+
+def create_session(n_retries = DEFAULT_N_RETRIES, backoff_factor = DEFAULT_BACKOFF_FACTOR, pool_size = DEFAULT_POOL_SIZE):
+
+    # retry policy (urllib3 < 1.26 calls the methods whitelist)
+    retry_kwargs = dict(total=n_retries, connect=n_retries, read=n_retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUS_CODES, raise_on_status=False)
+    try:
+        retries = Retry(allowed_methods=["GET"], **retry_kwargs)
+    except TypeError:
+        retries = Retry(method_whitelist=["GET"], **retry_kwargs)
+
+    # keep-alive connections and compressed responses
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+
+    return session
+
+#################################################################
+#################################################################
+
+def get_shared_session(pm_server):
+
+    # one pooled session per server
+    with shared_sessions_lock:
+        if pm_server not in shared_sessions:
+            shared_sessions[pm_server] = create_session()
+
+        return shared_sessions[pm_server]
+
+#################################################################
+#################################################################
+
+class PMAccess:
+    """
+    Client of the postmortem rest api. All the requests go through a pooled session (keep-alive, gzip, timeouts and
+    retries with backoff), and the bulk methods fetch many (system, className, source) tuples concurrently.
+    Every request returns a (dataframe, error) pair, with an empty dataframe when it failed or had no content.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, pm_server = DEFAULT_PM_SERVER, session = None, timeout = DEFAULT_TIMEOUT):
+
+        # attributes
+        self.pm_server = pm_server.rstrip("/")
+        self.session = session if session is not None else get_shared_session(self.pm_server)
+        self.timeout = timeout
+
+        return
+
+    #----------------------------------------------#
+
+    def request(self, endpoint, params):
+
+        # url and key of the records
+        path, record_path = PM_ENDPOINTS[endpoint]
+        err = None
+        df = pd.DataFrame([])
+
+        try:
+            # the body is decoded while it is downloaded
+            with self.session.get(self.pm_server + path, params=params, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+
+                if response.status_code == 204:
+                    err = "Status Code: 204 No Content"
+                    print(err)
+                    return df, err
+
+                df = decode_pm_response(response, record_path=record_path)
+
+        except Exception as xcp:
+            err = xcp
+            print(err)
+            return df, err
+
+        return df, err
+
+    #----------------------------------------------#
+
+    def get_pm_data_header_range(self, system, className, source, fromTimestampInNanos, toTimestampInNanos):
+
+        return self.request("header_range", {"system": system, "className": className, "source": source, "fromTimestampInNanos": fromTimestampInNanos, "toTimestampInNanos": toTimestampInNanos})
+
+    #----------------------------------------------#
+
+    def get_pm_data_duration(self, system, className, source, fromTimestampInNanos, durationInNanos):
+
+        return self.request("duration", {"system": system, "className": className, "source": source, "fromTimestampInNanos": fromTimestampInNanos, "durationInNanos": durationInNanos})
+
+    #----------------------------------------------#
+
+    def get_pm_data_range(self, system, className, source, fromTimestampInNanos, toTimestampInNanos):
+
+        return self.request("range", {"system": system, "className": className, "source": source, "fromTimestampInNanos": fromTimestampInNanos, "toTimestampInNanos": toTimestampInNanos})
+
+    #----------------------------------------------#
+
+    def get_bulk(self, method, sources, fromTimestampInNanos, toTimestampInNanos, n_workers = DEFAULT_POOL_SIZE, progress_callback = None):
+
+        # one request per (system, className, source) tuple, at most n_workers at the same time (results in the same order)
+        results = [None] * len(sources)
+        if not sources:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(int(n_workers), len(sources)))) as executor:
+            futures = {executor.submit(method, system, className, source, fromTimestampInNanos, toTimestampInNanos): counter for counter, (system, className, source) in enumerate(sources)}
+            pending = set(futures)
+            n_done = 0
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                    n_done += 1
+                    if progress_callback:
+                        progress_callback(n_done, len(sources))
+
+        return results
+
+    #----------------------------------------------#
+
+    def get_pm_data_range_bulk(self, sources, fromTimestampInNanos, toTimestampInNanos, n_workers = DEFAULT_POOL_SIZE, progress_callback = None):
+
+        return self.get_bulk(self.get_pm_data_range, sources, fromTimestampInNanos, toTimestampInNanos, n_workers=n_workers, progress_callback=progress_callback)
+
+    #----------------------------------------------#
+
+    def get_pm_data_duration_bulk(self, sources, fromTimestampInNanos, durationInNanos, n_workers = DEFAULT_POOL_SIZE, progress_callback = None):
+
+        return self.get_bulk(self.get_pm_data_duration, sources, fromTimestampInNanos, durationInNanos, n_workers=n_workers, progress_callback=progress_callback)
+
+    #----------------------------------------------#
+
+    def get_pm_data_header_range_bulk(self, sources, fromTimestampInNanos, toTimestampInNanos, n_workers = DEFAULT_POOL_SIZE, progress_callback = None):
+
+        return self.get_bulk(self.get_pm_data_header_range, sources, fromTimestampInNanos, toTimestampInNanos, n_workers=n_workers, progress_callback=progress_callback)
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
@@ -0,0 +1,308 @@
+#################################################################
+#################################################################
+
+# Author: martinja
+# Contact: javier.martinez.samblas@cern.ch
+
+#################################################################
+#################################################################
+
+# IMPORTS
+
+# no qt here (the decoder is also used by the scripts against a stub http server)
+import io
+import json
+import numpy as np
+import pandas as pd
+
+# optional decoders: ijson parses the response while it is downloaded (>= 3.1, able to return floats instead of decimals),
+# orjson parses the whole body much faster than json
+try:
+    import ijson
+    list(ijson.items(io.BytesIO(b"[1.5]"), "item", use_float=True))
+except Exception:
+    ijson = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#################################################################
+#################################################################
+
+# CONSTANTS
+
+# bytes read from the response at a time
+STREAM_CHUNK_SIZE = 1024 ** 2
+
+# initial number of elements of the buffer of every array field (doubled when it is full)
+INITIAL_BUFFER_SIZE = 4096
+
+# kinds of numpy arrays stored in the typed buffers (bool, int, uint, float)
+BUFFER_KINDS = "biuf"
+
+#################################################################
+#################################################################
+
+class PMFieldBuffer:
+    """
+    Growable typed buffer with the arrays of one field of every event (one contiguous block, every row is a view of it).
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, dtype):
+
+        # attributes
+        self.buffer = np.empty(INITIAL_BUFFER_SIZE, dtype=dtype)
+        self.size = 0
+        self.offsets = [0]
+        self.rows = []
+
+        return
+
+    #----------------------------------------------#
+
+    def append(self, row, array):
+
+        # promote the buffer when the field changes type (e.g. ints first, floats later)
+        if array.dtype != self.buffer.dtype:
+            dtype = np.result_type(self.buffer.dtype, array.dtype)
+            if dtype != self.buffer.dtype:
+                self.buffer = self.buffer.astype(dtype)
+
+        # grow it when full
+        if self.size + array.size > self.buffer.size:
+            new_buffer = np.empty(max(2 * self.buffer.size, self.size + array.size), dtype=self.buffer.dtype)
+            new_buffer[0:self.size] = self.buffer[0:self.size]
+            self.buffer = new_buffer
+
+        # copy the values
+        self.buffer[self.size:self.size + array.size] = array
+        self.size += array.size
+        self.offsets.append(self.size)
+        self.rows.append(row)
+
+        return
+
+    #----------------------------------------------#
+
+    def to_column(self, n_rows):
+
+        # drop the free space at the end of the buffer
+        if self.size < self.buffer.size:
+            self.buffer = self.buffer[0:self.size].copy()
+
+        # one view per event (nan for the events without the field, as json_normalize)
+        column = np.full(n_rows, np.nan, dtype=object)
+        data = self.buffer
+        for counter, row in enumerate(self.rows):
+            column[row] = data[self.offsets[counter]:self.offsets[counter + 1]]
+
+        return column
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class PMColumnBuilder:
+    """
+    Builds the columns of the events incrementally, with the same names as pd.json_normalize (nested keys joined by dots).
+    Numeric arrays go to typed buffers, everything else to one list per column.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self):
+
+        # attributes
+        self.n_rows = 0
+        self.names = []
+        self.scalars = {}
+        self.arrays = {}
+
+        return
+
+    #----------------------------------------------#
+
+    def add_value(self, name, value):
+
+        # numeric lists of a known or a new array field
+        if isinstance(value, list) and name not in self.scalars:
+            array = np.asarray(value)
+            if array.ndim == 1 and (array.dtype.kind in BUFFER_KINDS or array.size == 0):
+                if name not in self.arrays:
+                    self.names.append(name)
+                    self.arrays[name] = PMFieldBuffer(array.dtype if array.size else np.float64)
+                self.arrays[name].append(self.n_rows, array)
+                return
+
+        # scalars of an array field
+        if name in self.arrays and not isinstance(value, list):
+            array = np.asarray([value])
+            if array.dtype.kind in BUFFER_KINDS:
+                self.arrays[name].append(self.n_rows, array)
+                return
+
+        # anything else, kept as it was decoded (an array field with other values is turned into a list of arrays)
+        if name in self.arrays:
+            field = self.arrays.pop(name)
+            data = field.buffer[0:field.size]
+            self.scalars[name] = (list(field.rows), [data[field.offsets[counter]:field.offsets[counter + 1]] for counter in range(len(field.rows))])
+        if name not in self.scalars:
+            if name not in self.names:
+                self.names.append(name)
+            self.scalars[name] = ([], [])
+        rows, values = self.scalars[name]
+        rows.append(self.n_rows)
+        values.append(value)
+
+        return
+
+    #----------------------------------------------#
+
+    def add_record(self, record, prefix = ""):
+
+        # walk the nested keys of the event (empty dicts give no column, as in json_normalize)
+        for key, value in record.items():
+            name = prefix + str(key)
+            if isinstance(value, dict):
+                self.add_record(value, prefix=name + ".")
+            else:
+                self.add_value(name, value)
+
+        # next event
+        if not prefix:
+            self.n_rows += 1
+
+        return
+
+    #----------------------------------------------#
+
+    def to_dataframe(self):
+
+        # columns in the order they appeared
+        columns = {}
+        for name in self.names:
+            if name in self.scalars:
+                rows, values = self.scalars[name]
+                columns[name] = pd.Series(values, index=rows).reindex(range(self.n_rows))
+            else:
+                columns[name] = self.arrays[name].to_column(self.n_rows)
+
+        return pd.DataFrame(columns, index=range(self.n_rows))
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+class PeekedStream:
+    """
+    File-like object that returns the bytes already read from a stream before reading the rest of it.
+    """
+
+    #----------------------------------------------#
+
+    def __init__(self, head, stream):
+
+        # attributes
+        self.head = head
+        self.stream = stream
+
+        return
+
+    #----------------------------------------------#
+
+    def read(self, size = -1):
+
+        # bytes of the head first
+        if self.head:
+            if size is None or size < 0:
+                data, self.head = self.head + self.stream.read(), b""
+            else:
+                data, self.head = self.head[0:size], self.head[size:]
+            return data
+
+        return self.stream.read() if size is None or size < 0 else self.stream.read(size)
+
+    #----------------------------------------------#
+
+#################################################################
+#################################################################
+
+def loads(data):
+
+    # fastest available parser
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+#################################################################
+#################################################################
+
+def iter_records(data, record_path = None):
+
+    # records of an already parsed response (the same ones pd.json_normalize would read)
+    items = data if isinstance(data, list) else [data]
+    if not record_path:
+        yield from items
+        return
+    for item in items:
+        records = item
+        for key in record_path:
+            records = records.get(key, []) if isinstance(records, dict) else []
+        yield from records
+
+    return
+
+#################################################################
+#################################################################
+
+def iter_records_streaming(stream, record_path):
+
+    # the prefix of the records depends on the top level of the response (an object or a list of objects)
+    head = stream.read(STREAM_CHUNK_SIZE)
+    stripped_head = head.lstrip()
+    top_prefix = "item." if stripped_head[0:1] == b"[" else ""
+    prefix = top_prefix + ".".join(list(record_path) + ["item"])
+
+    # one event at a time (floats instead of decimals)
+    yield from ijson.items(PeekedStream(head, stream), prefix, use_float=True)
+
+    return
+
+#################################################################
+#################################################################
+
+def decode_pm_stream(stream, record_path = None):
+
+    # build the columns event after event while the response is read (only one event is kept as python objects)
+    builder = PMColumnBuilder()
+    if ijson is not None and record_path:
+        for record in iter_records_streaming(stream, record_path):
+            builder.add_record(record)
+        return builder.to_dataframe()
+
+    # without ijson the whole body is parsed first (and released as soon as the columns are built)
+    data = loads(stream.read())
+    for record in iter_records(data, record_path):
+        builder.add_record(record)
+    del data
+
+    return builder.to_dataframe()
+
+#################################################################
+#################################################################
+
+def decode_pm_response(response, record_path = None):
+
+    # decompress the body while it is read (the response has to be requested with stream=True)
+    response.raw.decode_content = True
+
+    return decode_pm_stream(response.raw, record_path)
+
+#################################################################
+#################################################################
@@ -4,89 +4,7 @@
 # IMPORTS
 
 from davit.__imports__ import *
-
-#################################################################
-#################################################################
-
-class PMAccess:
-
-    def __init__(self, pm_server="http://pm-rest.cern.ch"):
-        self.pm_server = pm_server
-
-    def get_pm_data_header_range(self, system, className, source, fromTimestampInNanos, toTimestampInNanos):
-
-        requestStr = "{}/v3/pmdata/header/within/range?system={}&className={}&source={}&fromTimestampInNanos={}&toTimestampInNanos={}".format(
-            self.pm_server, system, className, source, fromTimestampInNanos, toTimestampInNanos)
-
-        err = None
-        df = pd.DataFrame([])
-
-        try:
-            response = requests.get(requestStr)
-            response.raise_for_status()
-
-            if response.status_code == 204:
-                err = "Status Code: 204 No Content"
-                print(err)
-                return df, err
-
-            df = pd.json_normalize(response.json())
-
-        except Exception as err:
-            print(err)
-            return df, err
-
-        return df, err
-
-    def get_pm_data_duration(self, system, className, source, fromTimestampInNanos, durationInNanos):
-
-        requestStr = "{}/v3/pmdata/within/duration?system={}&className={}&source={}&fromTimestampInNanos={}&durationInNanos={}".format(
-            self.pm_server, system, className, source, fromTimestampInNanos, durationInNanos)
-
-        err = None
-        df = pd.DataFrame([])
-
-        try:
-            response = requests.get(requestStr)
-            response.raise_for_status()
-
-            if response.status_code == 204:
-                err = "Status Code: 204 No Content"
-                print(err)
-                return df, err
-
-            df = pd.json_normalize(response.json(), record_path=['content'])
-
-        except Exception as err:
-            print(err)
-            return df, err
-
-        return df, err
-
-    def get_pm_data_range(self, system, className, source, fromTimestampInNanos, toTimestampInNanos):
-
-        requestStr = "{}/v3/pmdata/within/range?system={}&className={}&source={}&fromTimestampInNanos={}&toTimestampInNanos={}".format(
-            self.pm_server, system, className, source, fromTimestampInNanos, toTimestampInNanos)
-
-        err = None
-        df = pd.DataFrame([])
-
-        try:
-            response = requests.get(requestStr)
-            response.raise_for_status()
-
-            if response.status_code == 204:
-                err = "Status Code: 204 No Content"
-                print(err)
-                return df, err
-
-            df = pd.json_normalize(response.json(), record_path=['content'])
-
-        except Exception as err:
-            print(err)
-            return df, err
-
-        return df, err
+from davit.utils.postmortem_client import PMAccess
 
 #################################################################
 #################################################################
@@ -122,10 +40,18 @@ class PostMortemQueryThread(QThread):
 
     def search_query(self, system, class_name, source, ts1, ts2, verbose=True):
 
-        # perform the call
+        # perform the call (several sources separated by commas are fetched concurrently and concatenated)
         error = None
         try:
-            response_df, error = self.pma.get_pm_data_range(self.system, self.class_name, self.source, ts1, ts2)
+            sources = [source_name.strip() for source_name in source.split(",") if source_name.strip()]
+            if len(sources) > 1:
+                results = self.pma.get_pm_data_range_bulk([(system, class_name, source_name) for source_name in sources], ts1, ts2)
+                frames = [result_df for result_df, result_error in results if not result_df.empty]
+                response_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame([])
+                errors = [result_error for result_df, result_error in results if result_error is not None]
+                error = errors[0] if errors and response_df.empty else None
+            else:
+                response_df, error = self.pma.get_pm_data_range(system, class_name, source, ts1, ts2)
         except Exception as xcp:
             response_df = pd.DataFrame([])
             error = xcp
@@ -588,7 +588,7 @@ class StatsTab(QWidget):
             return
 
         # for Bean Plot, do not allow if over max_n_columns numeric columns
-        numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64)
+        numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64, copy=False)
         if self.selected_plot_type == "Bean Plot" and self.selected_analysis_type != "All Columns" and numeric_df.shape[1] > self.max_n_columns:
             message_title = "Error"
             message_text = "Cannot display Bean Plot when over {} columns are present.".format(self.max_n_columns)
@@ -787,7 +787,7 @@ class StatsTab(QWidget):
                 self.plot.getAxis('bottom').setTicks([[(1, "Global Stats")]])
             self.plot.setTitle("Bean Plot (Global)")
         else:
-            numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64)
+            numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64, copy=False)
             if numeric_df.empty:
                 return
             xticks = []
@@ -814,7 +814,7 @@ class StatsTab(QWidget):
 
         # clear and checks
         self.plot.clear()
-        numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64)
+        numeric_df = self.dataframe.select_dtypes(include=[np.number]).astype(np.float64, copy=False)
         if numeric_df.empty:
             return
 
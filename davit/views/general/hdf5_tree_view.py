@@ -5,6 +5,10 @@
 
 from davit.__imports__ import *
 from davit.utils.hdf5_tree_view_model import HDF5TreeViewModel
+from davit.utils.hdf5_tree_filter_proxy_model import HDF5TreeFilterProxyModel
+from davit.utils.hdf5_metadata_index import HDF5MetadataIndex
+from davit.utils.hdf5_file_pool import HDF5FilePool
+from davit.utils.hdf5_read_profiles import get_read_profile_name
 
 #################################################################
 #################################################################
@@ -22,14 +26,17 @@ class HDF5TreeView(QFrame):
         self.parent = parent
         self.global_parent = global_parent
 
-        # own attributes
-        self.hdf_dict = {}
+        # own attributes (open hdf5 files, bounded by the settings)
+        self.hdf_dict = HDF5FilePool()
         self.treeView_model = None
         self.treeView_model_filtered = None
         self.filters_applied = False
         self._selection_model = None
         self._selection_changed_handler = None
 
+        # persistent metadata index used by the filters
+        self.metadata_index = HDF5MetadataIndex()
+
         # build the tree
         self.buildTree()
 
@@ -213,7 +220,7 @@ class HDF5TreeView(QFrame):
 
         # actions for expanding and collapsing
         self.menu_right_click_dict["expand_all"] = menu.addAction(qta.icon("mdi.arrow-expand-right"), self.tr("Expand all"))
-        self.menu_right_click_dict["expand_all"].triggered.connect(lambda: self.expand_all(self.treeView, index_list))
+        self.menu_right_click_dict["expand_all"].triggered.connect(lambda: self.expand_all_synchronously(self.treeView, index_list))
         self.menu_right_click_dict["collapse_all"] = menu.addAction(qta.icon("mdi.arrow-expand-left"), self.tr("Collapse all"))
         self.menu_right_click_dict["collapse_all"].triggered.connect(lambda: self.collapse_all(self.treeView, index_list))
 
@@ -319,11 +326,15 @@ class HDF5TreeView(QFrame):
 
     def clearTreeView(self):
 
+        # stop the directory scans of the previous model
+        if self.treeView_model:
+            self.treeView_model.cancel_directory_scans()
+
         # clear model
         self.treeView.model().clear()
 
         # init variables
-        self.hdf_dict = {}
+        self.hdf_dict.clear()
         self.treeView_model = None
         self.treeView_model_filtered = None
 
@@ -346,12 +357,17 @@ class HDF5TreeView(QFrame):
         # case 1: NORMAL PROCEDURE (POPULATE THE TREE DYNAMICALLY)
         if not filters:
 
-            # init hdf5 files dict
-            self.hdf_dict = {}
+            # stop the directory scans of the previous model
+            if self.treeView_model:
+                self.treeView_model.cancel_directory_scans()
+
+            # release the hdf5 files and update the limits of the pool
+            self.hdf_dict.clear()
+            self.hdf_dict.configure(max_open_files = self.global_parent.dict_for_settings["max_open_hdf5_files"], metadata_cache_mb = self.global_parent.dict_for_settings["hdf5_metadata_cache_mb"], read_profile = get_read_profile_name(self.global_parent.dict_for_settings["hdf5_read_profile"]))
 
             # declare treeview model
+            # (the filtered model is kept, so applying filters again on the same path is incremental)
             self.treeView_model = HDF5TreeViewModel(dir_path, filter_mode = False, parent = self, global_parent = self.global_parent)
-            self.treeView_model_filtered = None
 
             # set the model
             self.treeView.setModel(self.treeView_model)
@@ -368,21 +384,27 @@ class HDF5TreeView(QFrame):
         # case 2: APPLY FILTERS (POPULATE THE TREE AT ONCE)
         else:
 
-            # expand and collapse to load the whole tree
-            self.fully_expand_treeview(self.treeView)
-            self.treeView.collapseAll()
+            # reuse the filtered tree of the same path (only the predicate bits that changed and the visibility are recomputed)
+            updated = False
+            if self.treeView_model_filtered and self.treeView_model_filtered.source_model.path == dir_path:
+                updated = self.treeView_model_filtered.update_filters(filters, self.metadata_index)
 
-            # filter the data
-            self.tree_dict = self.treeView_model.filter_data(filters)
+            # otherwise build the filtered tree with the metadata index (only new or modified files are read)
+            if not updated:
+                tree_dict = self.treeView_model.get_filter_tree_dict(filters, self.metadata_index)
+                filtered_source_model = HDF5TreeViewModel(dir_path, filters = filters, filter_mode = True, tree_dict = tree_dict, parent = self, global_parent = self.global_parent)
+                self.treeView_model_filtered = HDF5TreeFilterProxyModel(filtered_source_model)
 
-            # declare new filtered model
-            self.treeView_model_filtered = HDF5TreeViewModel(filter_mode = True, tree_dict = self.tree_dict, parent = self, global_parent = self.global_parent)
+            # open the files that remain visible (the selection reads the nodes from hdf_dict)
+            for node in self.treeView_model_filtered.source_model.root_node.children:
+                self.openFilteredH5Files(node)
 
-            # set the model
-            self.treeView.setModel(self.treeView_model_filtered)
+            # set the model (only when it changes, so the expanded nodes are kept)
+            if self.treeView.model() is not self.treeView_model_filtered:
+                self.treeView.setModel(self.treeView_model_filtered)
 
-            # bindings for the tree
-            self.bindWidgetsTreeView(self.treeView_model_filtered)
+                # bindings for the tree
+                self.bindWidgetsTreeView(self.treeView_model_filtered)
 
             # set boolean and style
             self.filters_applied = True
@@ -520,8 +542,10 @@ class HDF5TreeView(QFrame):
                 # get index
                 index = indexes[i]
 
-                # guarantee that model is loaded
+                # guarantee that model is loaded (directories are scanned synchronously)
+                model.async_directory_scan = False
                 expanded_indexes = self.expand_all_tracking(self.treeView, [index])
+                model.async_directory_scan = True
                 self.collapse_all_tracking(self.treeView, [index], expanded_indexes)
 
                 # determine if it should be added
@@ -531,6 +555,25 @@ class HDF5TreeView(QFrame):
 
     #----------------------------------------------#
 
+    def openFilteredH5Files(self, node):
+
+        # skip hidden nodes
+        if not node.visible:
+            return
+
+        # open the file of the node
+        hdf_path = node.hdf5_path
+        if hdf_path and hdf_path not in self.hdf_dict:
+            self.treeView_model.open_h5_file(hdf_path)
+
+        # iterate over children
+        for child in node.children:
+            self.openFilteredH5Files(child)
+
+        return
+
+    #----------------------------------------------#
+
     def expand_top_level(self) -> None:
         tree = self.treeView
         model = tree.model()
@@ -553,6 +596,18 @@ class HDF5TreeView(QFrame):
 
     #----------------------------------------------#
 
+    def expand_all_synchronously(self, tree_view, indexes):
+
+        # the children must be available right after every expansion to keep recursing
+        model = tree_view.model()
+        model.async_directory_scan = False
+        self.expand_all(tree_view, indexes)
+        model.async_directory_scan = True
+
+        return
+
+    #----------------------------------------------#
+
     def expand_all(self, tree_view, indexes):
         for index in indexes:
             tree_view.expand(index)
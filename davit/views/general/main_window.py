@@ -22,6 +22,12 @@ from davit.views.general.waiting_widget_create_df import WaitingWidgetCreateDf
 from davit.views.general.settings_preferences_view import SettingsPreferencesView
 from davit.views.general.attributes_window import AttributesWindow
 from davit.views.monitoring.system_monitor_window import SystemMonitorWindow
+from davit.utils.hdf5_save_dataframe import HDF5DataFrameHandler, DATA_LAYOUT_COLUMNS
+from davit.utils.hdf5_lazy_dataframe import (is_lazy_loadable_dataset, is_memory_mappable_dataset, has_space_for_spill, create_lazy_array, create_lazy_dataframe, remove_spilled_files)
+from davit.utils.hdf5_column_reader import (DEFERRED_COLUMNS_MIN_BYTES, is_column_selectable_dataset, read_dataset_columns, set_deferred_columns)
+from davit.utils.hdf5_parallel_reader import is_parallel_readable_dataset, read_dataset_parallel
+from davit.utils.performance_log import performance_log
+import time
 
 #################################################################
 #################################################################
@@ -57,6 +63,15 @@ class MainWindow(QMainWindow):
             "ncurves_at_init": 10,
             "setting_enable_system_monitor": 0,
             "refresh_rate_system_monitor": 1,
+            "n_workers_metadata_crawler": 4,
+            "max_open_hdf5_files": 64,
+            "hdf5_metadata_cache_mb": 128,
+            "hdf5_read_profile": 0,
+            "n_workers_hdf5_reader": 4,
+            "nxcals_query_window": 0,
+            "n_workers_nxcals_query": 4,
+            "setting_enable_nxcals_cache": 1,
+            "nxcals_cache_max_size_mb": 2048,
             "color_background": "#000000",
             "color_foreground_palette_name": "colorblind",
         }
@@ -282,7 +297,7 @@ class MainWindow(QMainWindow):
 
         # frame for the system monitor
         if self.dict_for_settings["setting_enable_system_monitor"]:
-            self.system_monitor = SystemMonitorWindow(parent = self.central_widget, app_root_path = self.app_root_path, time_period = self.dict_for_settings["refresh_rate_system_monitor"]*1000)
+            self.system_monitor = SystemMonitorWindow(parent = self.central_widget, app_root_path = self.app_root_path, time_period = self.dict_for_settings["refresh_rate_system_monitor"]*1000, file_pool = self.treeView_hdf5.hdf_dict)
         else:
             self.system_monitor = QWidget(parent = self.central_widget)
         self.verticalLayout_central_widget.addWidget(self.system_monitor)
@@ -572,11 +587,7 @@ class MainWindow(QMainWindow):
         self.last_index_tree_view_hdf5 = None
 
         # clear the existing view & close any open file handles
-        for h5obj in self.treeView_hdf5.hdf_dict.values():
-            try:
-                h5obj.close()
-            except Exception:
-                pass
+        self.treeView_hdf5.hdf_dict.close_all()
         self.treeView_hdf5.clearTreeView()
 
         # rebuild the tree
@@ -1052,7 +1063,7 @@ class MainWindow(QMainWindow):
                     is_it_dataset = False
 
                 # create the data to be passed to the tabs
-                dataframe, attributes, chunk_size, error_message = self.createDfDataObject(node, is_it_dataset=is_it_dataset)
+                dataframe, attributes, chunk_size, error_message = self.createDfDataObject(node, is_it_dataset=is_it_dataset, deferred_columns=True)
                 if error_message:
                     continue
 
@@ -1177,51 +1188,59 @@ class MainWindow(QMainWindow):
             # set display name
             display = "merged"
 
-            # iterate over indexes
-            df_list = []
-            for counter, index in enumerate(index_list):
+            # stamps of the same variable are taken straight from its columnar block (no dataframe per stamp)
+            chunk_size = 100_000
+            block_rows = [model.get_block_row(index) for index in index_list] if hasattr(model, "get_block_row") else []
+            if block_rows and block_rows[0][0] is not None and all(block is block_rows[0][0] for block, row in block_rows):
+                result_df = self.createDfFromNXCALSBlock(block_rows[0][0], display, rows=[row for block, row in block_rows])
+                if result_df.empty:
+                    return
 
-                # get data
-                data = model.itemFromIndex(index).data(Qt.ItemDataRole.UserRole)
+            # different variables or stamps
+            else:
 
-                # if there is no data just skip
-                if data.size == 0:
-                    continue
+                # iterate over indexes
+                df_list = []
+                for counter, index in enumerate(index_list):
 
-                # get dataframe and attributes
-                dataframe, attributes, chunk_size = self.createDfFromNXCALS(data)
+                    # get dataframe and attributes
+                    dataframe, attributes, chunk_size = self.getDfFromNXCALSIndex(model, index)
 
-                # add to the list
-                df_list.append(dataframe)
+                    # if there is no data just skip
+                    if dataframe is None:
+                        continue
 
-            # scalar case or multi array case?
-            if all(individual_df.shape == (1, 1) for individual_df in df_list):
-                axis = 0
-            else:
-                axis = 1
+                    # add to the list
+                    df_list.append(dataframe)
 
-            # method and arguments
-            pandas_method = "pd.concat"
-            ignore_index = False
-            join_arg = "outer"
+                # scalar case or multi array case?
+                if all(individual_df.shape == (1, 1) for individual_df in df_list):
+                    axis = 0
+                else:
+                    axis = 1
 
-            # try to get the result dataframe
-            try:
-                result_df = eval(pandas_method)(df_list, axis=axis, ignore_index=ignore_index, join=join_arg)
-            except NotImplementedError  as xcp:
-                message_title = "Error"
-                message_text = ("Unable to perform {} operation because this merging is not implemented in pandas yet.".format(pandas_method))
-                message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
-                message_box.setWindowIcon(QIcon(self.window_icon_path))
-                message_box.exec()
-                return
-            except Exception  as xcp:
-                message_title = "Error"
-                message_text = ("Unable to perform {} operation due to the following exception: {}".format(pandas_method, xcp))
-                message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
-                message_box.setWindowIcon(QIcon(self.window_icon_path))
-                message_box.exec()
-                return
+                # method and arguments
+                pandas_method = "pd.concat"
+                ignore_index = False
+                join_arg = "outer"
+
+                # try to get the result dataframe
+                try:
+                    result_df = eval(pandas_method)(df_list, axis=axis, ignore_index=ignore_index, join=join_arg)
+                except NotImplementedError  as xcp:
+                    message_title = "Error"
+                    message_text = ("Unable to perform {} operation because this merging is not implemented in pandas yet.".format(pandas_method))
+                    message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
+                    message_box.setWindowIcon(QIcon(self.window_icon_path))
+                    message_box.exec()
+                    return
+                except Exception  as xcp:
+                    message_title = "Error"
+                    message_text = ("Unable to perform {} operation due to the following exception: {}".format(pandas_method, xcp))
+                    message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
+                    message_box.setWindowIcon(QIcon(self.window_icon_path))
+                    message_box.exec()
+                    return
 
             # set the window id
             try:
@@ -1261,19 +1280,16 @@ class MainWindow(QMainWindow):
             # iterate over indexes
             for counter, index in enumerate(index_list):
 
-                # get data
-                data = model.itemFromIndex(index).data(Qt.ItemDataRole.UserRole)
-
                 # get display name
                 display = model.itemFromIndex(index).data(Qt.ItemDataRole.DisplayRole)
 
+                # get dataframe and attributes
+                dataframe, attributes, chunk_size = self.getDfFromNXCALSIndex(model, index)
+
                 # if there is no data just skip
-                if data.size == 0:
+                if dataframe is None:
                     continue
 
-                # get dataframe and attributes
-                dataframe, attributes, chunk_size = self.createDfFromNXCALS(data)
-
                 # set the window id
                 try:
                     win_id = str(self.random_id_sequence_list[self.random_id_sequence_counter])
@@ -1312,19 +1328,16 @@ class MainWindow(QMainWindow):
             # iterate over indexes
             for counter, index in enumerate(index_list):
 
-                # get data
-                data = model.itemFromIndex(index).data(Qt.ItemDataRole.UserRole)
-
                 # get display name
                 display = model.itemFromIndex(index).data(Qt.ItemDataRole.DisplayRole)
 
+                # get dataframe and attributes
+                dataframe, attributes, chunk_size = self.getDfFromNXCALSIndex(model, index)
+
                 # if there is no data just skip
-                if data.size == 0:
+                if dataframe is None:
                     continue
 
-                # get dataframe and attributes
-                dataframe, attributes, chunk_size = self.createDfFromNXCALS(data)
-
                 # set the window id
                 try:
                     win_id = str(self.random_id_sequence_list[self.random_id_sequence_counter])
@@ -1523,7 +1536,7 @@ class MainWindow(QMainWindow):
 
     #----------------------------------------------#
 
-    def createDfDataObject(self, node, is_it_dataset = False, monitor_memory = False, auto_dtype = "infer_objects", min_chunk = 100_000, auto_merging = False):
+    def createDfDataObject(self, node, is_it_dataset = False, monitor_memory = False, auto_dtype = "infer_objects", min_chunk = 100_000, auto_merging = False, deferred_columns = False):
 
         # function to estimate the memory requirements of a dataframe
         def estimate_memory_requirements(node, is_it_dataset):
@@ -1556,6 +1569,13 @@ class MainWindow(QMainWindow):
             else:
                 return np.nan
 
+        # function to read big datasets with several workers (None when they have to be read sequentially)
+        def read_dataset_with_workers(child):
+            n_workers = int(self.dict_for_settings["n_workers_hdf5_reader"])
+            if n_workers < 2 or not is_parallel_readable_dataset(child):
+                return None
+            return read_dataset_parallel(child, n_workers=n_workers, progress_callback=self.updateCreateDfProgress)
+
         # estimate needed memory
         mem_required_in_mb = estimate_memory_requirements(node, is_it_dataset)
 
@@ -1565,23 +1585,26 @@ class MainWindow(QMainWindow):
         # get available memory
         available_memory_mb = psutil.virtual_memory().available / (1024 ** 2)
 
+        # check if the dataset can be served lazily (memory map of the file or of a temporary spill)
+        use_lazy_backend = False
+        if is_it_dataset and is_lazy_loadable_dataset(node):
+            if available_memory_mb < mem_required_in_mb + safety_margin_mb:
+                use_lazy_backend = True
+            elif node.chunks is None and node.shape[0] >= 1_000_000 * int(self.dict_for_settings["min_big_data_sample_size"]):
+                use_lazy_backend = True
+
+        # chunked or compressed datasets are only served lazily when their decompressed copy fits in the temp dir
+        if use_lazy_backend and available_memory_mb < mem_required_in_mb + safety_margin_mb and not is_memory_mappable_dataset(node) and not has_space_for_spill(node):
+            use_lazy_backend = False
+
         # check memory limits
-        if available_memory_mb < mem_required_in_mb + safety_margin_mb:
-            message_title = "Error: Insufficient Memory"
-            message_text = (
-                "Not enough memory to load the data. Please free up some space before attempting this operation.\n\n"
-                f"MEMORY SPECIFICATIONS\n"
-                f"Memory Required: {mem_required_in_mb + safety_margin_mb:.2f} MB\n"
-                f"Memory Available: {available_memory_mb:.2f} MB"
-            )
-            message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
-            message_box.setWindowIcon((QIcon(self.window_icon_path)))
-            message_box.exec()
+        if available_memory_mb < mem_required_in_mb + safety_margin_mb and not use_lazy_backend:
+            self.showInsufficientMemoryMessage(mem_required_in_mb + safety_margin_mb, available_memory_mb)
             return None, None, None, "memory_error"
 
         # open waiting widget
         self.waiting_widget_create_df = None
-        if (len(node) >= 1_000_000 * int(self.dict_for_settings["min_big_data_sample_size"])) or (auto_merging and len(node) >= 10_000):
+        if (len(node) >= 1_000_000 * int(self.dict_for_settings["min_big_data_sample_size"])) or (auto_merging and len(node) >= 10_000) or (is_it_dataset and not use_lazy_backend and is_parallel_readable_dataset(node)) or (use_lazy_backend and node.chunks is not None):
             if auto_merging:
                 mem_required_in_mb = "Unknown"
             self.waiting_widget_create_df = WaitingWidgetCreateDf(app=self.app, app_root_path=self.app_root_path, parent=self, memory_in_mb=mem_required_in_mb)
@@ -1596,6 +1619,13 @@ class MainWindow(QMainWindow):
         # init chunk size
         chunk_size = None
 
+        # columns read at init for wide dataframe groups (None when everything is read)
+        column_positions = None
+        n_curves_at_init = max(1, int(self.dict_for_settings["ncurves_at_init"]))
+
+        # start timing (recorded in the performance log with the read profile)
+        start_time = time.perf_counter()
+
         # init attributes
         attributes = {}
         attributes["df"] = node.attrs
@@ -1617,15 +1647,31 @@ class MainWindow(QMainWindow):
 
             # handle non‐scalar dataset
             else:
+                # lazy frame backed by a memory map (only the requested windows are read)
+                df = None
+                if use_lazy_backend:
+                    df = create_lazy_dataframe(node, allow_spill=True, progress_callback=self.updateCreateDfProgress, n_workers=int(self.dict_for_settings["n_workers_hdf5_reader"]))
+                    if df is not None:
+                        dtype = str(node.dtype)
+                    elif available_memory_mb < mem_required_in_mb + safety_margin_mb:
+                        if self.waiting_widget_create_df:
+                            self.waiting_widget_create_df.close()
+                        self.showInsufficientMemoryMessage(mem_required_in_mb + safety_margin_mb, available_memory_mb)
+                        return None, None, None, "memory_error"
+
                 # check for a compound (structured) dtype
-                if hasattr(node.dtype, "names") and node.dtype.names is not None:
+                if df is None and hasattr(node.dtype, "names") and node.dtype.names is not None:
                     # read entire structured array into memory
                     data_array = node[...]
                     # build a DataFrame column for each field name
                     df = pd.DataFrame({ field: data_array[field] for field in node.dtype.names })
-                else:
-                    # normal numeric (or simple) array
-                    df = pd.DataFrame(node, dtype=dtype)
+                elif df is None:
+                    # normal numeric (or simple) array (big ones read by several workers)
+                    data_array = read_dataset_with_workers(node)
+                    if data_array is not None:
+                        df = pd.DataFrame(data_array, dtype=dtype, copy=False)
+                    else:
+                        df = pd.DataFrame(node, dtype=dtype)
 
             # get chunk size
             if hasattr(node, "chunks") and node.chunks:
@@ -1649,31 +1695,80 @@ class MainWindow(QMainWindow):
                 # get data and store it into a dictionary
                 data = {}
                 attrs = {}
+                data_columns_group = None
+                deferred_data_node = None
                 for name in node.keys():
                     child = node[name]
                     if isinstance(child, h5py.Dataset):
+                        attrs[name] = child.attrs
+                        if name == "data" and deferred_columns and is_column_selectable_dataset(child) and child.shape[1] > n_curves_at_init and child.size * child.dtype.itemsize >= DEFERRED_COLUMNS_MIN_BYTES:
+                            deferred_data_node = child
+                            continue
+                        if name == "data" and is_lazy_loadable_dataset(child) and child.shape[0] >= 1_000_000 * int(self.dict_for_settings["min_big_data_sample_size"]):
+                            child_needs_spill = child.size * child.dtype.itemsize / (1024 ** 2) + safety_margin_mb > available_memory_mb
+                            lazy_array = create_lazy_array(child, allow_spill=child_needs_spill, progress_callback=self.updateCreateDfProgress, n_workers=int(self.dict_for_settings["n_workers_hdf5_reader"]))
+                            if lazy_array is not None:
+                                data[name] = lazy_array
+                                dtype = str(child.dtype)
+                                continue
+                            if child_needs_spill:
+                                if self.waiting_widget_create_df:
+                                    self.waiting_widget_create_df.close()
+                                self.showInsufficientMemoryMessage(child.size * child.dtype.itemsize / (1024 ** 2) + safety_margin_mb, available_memory_mb)
+                                return None, None, None, "memory_error"
+                        if name == "data":
+                            data_array = read_dataset_with_workers(child)
+                            if data_array is not None:
+                                data[name] = data_array
+                                continue
                         data[name] = np.array(child)
+                    elif name == "data" and isinstance(child, h5py.Group) and fromBytesToString(child.attrs.get("DATA_LAYOUT", "")) == DATA_LAYOUT_COLUMNS:
                         attrs[name] = child.attrs
+                        data_columns_group = child
+
+                # wide dataframes: only the first columns are read (the rest are read when they are plotted)
+                column_positions = None
+                if deferred_data_node is not None:
+                    n_columns = deferred_data_node.shape[1]
+                    column_positions = list(range(n_curves_at_init))
+                    data["data"] = read_dataset_columns(deferred_data_node, column_positions)
+                elif data_columns_group is not None and deferred_columns:
+                    n_rows, n_columns = [int(x) for x in data_columns_group.attrs["shape"]]
+                    if n_columns > n_curves_at_init and n_rows * n_columns * 8 >= DEFERRED_COLUMNS_MIN_BYTES:
+                        column_positions = list(range(n_curves_at_init))
+
+                # one typed dataset per column (written by the streaming writer)
+                if data_columns_group is not None:
+                    data["data"] = HDF5DataFrameHandler.read_column_layout(data_columns_group, columns=data["columns"].astype(str) if "columns" in data else None, column_indexes=column_positions)
 
                 # just some parsing to avoid byte errors
                 if "index" in data:
-                    data["index"] = data["index"].astype(str)
+                    data["index"] = HDF5DataFrameHandler.decode_index(data["index"], attrs["index"])
                     attributes["index"] = attrs["index"]
                 if "columns" in data:
                     data["columns"] = data["columns"].astype(str)
                     attributes["columns"] = attrs["columns"]
+                if column_positions is not None:
+                    all_columns = data["columns"] if "columns" in data else np.arange(0, n_columns).astype(str)
+                    data["columns"] = all_columns[column_positions]
                 if "data" in data:
                     if np.ndim(data["data"]) == 1:
                         data["data"] = np.expand_dims(data["data"], 1)
                     attributes["data"] = attrs["data"]
 
                 # instantiate dataframe
-                if "data" in data and "columns" in data and "index" in data:
-                    df = pd.DataFrame(data["data"], columns = data["columns"], index = data["index"])
+                if isinstance(data.get("data", None), pd.DataFrame):
+                    df = data["data"]
+                    if "index" in data:
+                        df.index = data["index"]
+                    else:
+                        df.index = np.arange(0, df.shape[0]).astype(str)
+                elif "data" in data and "columns" in data and "index" in data:
+                    df = pd.DataFrame(data["data"], columns = data["columns"], index = data["index"], copy = False)
                 elif "data" in data and "columns" in data and "index" not in data:
-                    df = pd.DataFrame(data["data"], columns = data["columns"], index = np.arange(0,data["data"].shape[0]).astype(str))
+                    df = pd.DataFrame(data["data"], columns = data["columns"], index = np.arange(0,data["data"].shape[0]).astype(str), copy = False)
                 elif "data" in data and "columns" not in data and "index" in data:
-                    df = pd.DataFrame(data["data"], columns = np.arange(0,data["data"].shape[1]).astype(str), index = data["index"])
+                    df = pd.DataFrame(data["data"], columns = np.arange(0,data["data"].shape[1]).astype(str), index = data["index"], copy = False)
                 else:
                     df = pd.DataFrame([])
 
@@ -1699,6 +1794,22 @@ class MainWindow(QMainWindow):
             print("df.memory_usage: \n{}\n".format(df.memory_usage(deep=True)))
             df.info(memory_usage="deep")
 
+        # keep track of the source (used as key of the persistent downsampling cache)
+        try:
+            df.attrs["source"] = {"file_path": node.file.filename, "hdf5_path": node.name, "transposed": False}
+        except Exception as xcp:
+            print("Exception at createDfDataObject: {}".format(xcp))
+
+        # remember the columns that are still on disk
+        if column_positions is not None:
+            set_deferred_columns(df, all_columns, column_positions, node.file.filename, read_profile=self.treeView_hdf5.hdf_dict.read_profile)
+
+        # performance log
+        try:
+            performance_log.record("hdf5_create_df", file_path=node.file.filename, hdf5_path=node.name, shape=df.shape, lazy=use_lazy_backend, deferred_columns=column_positions is not None, read_profile=self.treeView_hdf5.hdf_dict.read_profile, elapsed_s=round(time.perf_counter() - start_time, 6))
+        except Exception as xcp:
+            print("Exception at createDfDataObject: {}".format(xcp))
+
         # close the waiting animation widget
         if self.waiting_widget_create_df:
             self.waiting_widget_create_df.close()
@@ -1709,11 +1820,45 @@ class MainWindow(QMainWindow):
 
     #----------------------------------------------#
 
+    def showInsufficientMemoryMessage(self, memory_required_mb, memory_available_mb):
+
+        # the data does not fit in memory (nor in the temp dir when it has to be decompressed there)
+        message_title = "Error: Insufficient Memory"
+        message_text = (
+            "Not enough memory to load the data. Please free up some space before attempting this operation.\n\n"
+            f"MEMORY SPECIFICATIONS\n"
+            f"Memory Required: {memory_required_mb:.2f} MB\n"
+            f"Memory Available: {memory_available_mb:.2f} MB"
+        )
+        message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
+        message_box.setWindowIcon((QIcon(self.window_icon_path)))
+        message_box.exec()
+
+        return
+
+    #----------------------------------------------#
+
+    def updateCreateDfProgress(self, n_done, n_total):
+
+        # progress of the parallel reader (shown in the waiting widget when it is open)
+        if self.waiting_widget_create_df:
+            self.waiting_widget_create_df.updateProgress(n_done, n_total)
+
+        return
+
+    #----------------------------------------------#
+
     def createDfFromNXCALS(self, data, attributes = [], chunk_size = 100_000, model = None, index = None, auto_merging = False):
 
         # auto merging case
         if auto_merging and model is not None and index is not None:
-            df = self.performAutoMergingGroup(model=model, index=index)
+
+            # nxcals variables: build the dataframe straight from the columnar block
+            block = model.get_block(index) if hasattr(model, "get_block") else None
+            if block is not None:
+                df = self.createDfFromNXCALSBlock(block, model.data(index, Qt.ItemDataRole.DisplayRole))
+            else:
+                df = self.performAutoMergingGroup(model=model, index=index)
             return df, attributes, chunk_size
 
         # case 1: data has shape (n,)
@@ -1733,6 +1878,42 @@ class MainWindow(QMainWindow):
 
     #----------------------------------------------#
 
+    def createDfFromNXCALSBlock(self, block, name, rows = None):
+
+        # dataframe of the selected acquisition stamps of a variable (all by default)
+        try:
+            df = block.to_dataframe(name, rows=rows)
+        except ValueError as xcp:
+            message_title = "Error: Mismatched Dimensions"
+            message_text = str(xcp)
+            message_box = QMessageBox(QMessageBox.Icon.Critical, message_title, message_text, parent=self)
+            message_box.setWindowIcon(QIcon(self.window_icon_path))
+            message_box.exec()
+            return pd.DataFrame([])
+
+        return df
+
+    #----------------------------------------------#
+
+    def getDfFromNXCALSIndex(self, model, index):
+
+        # variables: every acquisition stamp of the block
+        block = model.get_block(index) if hasattr(model, "get_block") else None
+        if block is not None:
+            dataframe = self.createDfFromNXCALSBlock(block, model.data(index, Qt.ItemDataRole.DisplayRole))
+            if dataframe.empty:
+                return None, [], 100_000
+            return dataframe, [], 100_000
+
+        # stamps (and postmortem items): the data of the item
+        data = model.itemFromIndex(index).data(Qt.ItemDataRole.UserRole)
+        if data is None or data.size == 0:
+            return None, [], 100_000
+
+        return self.createDfFromNXCALS(data)
+
+    #----------------------------------------------#
+
     def updateRightPanel(self, index, model = None, tree_type = "hdf5", verbose = True):
 
         # init variables
@@ -1840,7 +2021,7 @@ class MainWindow(QMainWindow):
                     print("Selected {} from HDF5 TreeView!".format(path))
 
                 # create the data to be passed to the tabs
-                dataframe, attributes, chunk_size, error_message = self.createDfDataObject(node, is_it_dataset=is_it_dataset)
+                dataframe, attributes, chunk_size, error_message = self.createDfDataObject(node, is_it_dataset=is_it_dataset, deferred_columns=True)
                 if error_message:
                     update_panel = False
 
@@ -2129,6 +2310,12 @@ class MainWindow(QMainWindow):
         for win_id in list(self.attributes_table_new_windows.keys()):
             self.attributes_table_new_windows[win_id].close()
 
+        # remove temporary files used by lazy dataframes
+        remove_spilled_files()
+
+        # close the metadata index database
+        self.treeView_hdf5.metadata_index.close()
+
         # close the window
         evt.accept()
 
@@ -11,11 +11,14 @@
 
 from davit.__imports__ import *
 from davit.utils.nxcals_query_thread import NXCALSQueryThread
+from davit.utils.nxcals_query_planner import get_query_window_mode
+from davit.utils.nxcals_cache_store import NXCALSCacheStore
 from davit.utils.nxcals_threads_panel_table_model import NXCALSThreadsPanelTableModel
 
 # SPECIFIC IMPORTS
 
 import time as native_time
+import threading
 
 #################################################################
 #################################################################
@@ -41,7 +44,7 @@ class NXCALSThreadsPanel(QDialog):
         self.id_counter = 0
         self.row_height = 25
         self.max_threads = 25
-        self.column_names = ["Query", "TS1", "TS2", "Elapsed Time"]
+        self.column_names = ["Query", "TS1", "TS2", "Windows", "Elapsed Time"]
         self.last_stored_width = 0
         self.menu_right_click_dict = {}
 
@@ -51,6 +54,12 @@ class NXCALSThreadsPanel(QDialog):
         # pytimber session
         self.ldb = None
 
+        # calls to the logging database running at the same time (shared by the time windows of all the queries)
+        self.window_slots = threading.BoundedSemaphore(self.max_threads)
+
+        # local store of the results (shared by all the queries)
+        self.cache_store = NXCALSCacheStore(base_dir=getSystemTempDir())
+
         # important variables
         self.query_threads = []
         self.data = []
@@ -327,14 +336,25 @@ class NXCALSThreadsPanel(QDialog):
             message_box.exec()
             return
 
+        # time windows of the query (fetched by several workers, never more than max_threads calls in total)
+        dict_for_settings = self.parent.global_parent.dict_for_settings
+        window_mode = get_query_window_mode(dict_for_settings["nxcals_query_window"])
+        n_workers = min(int(dict_for_settings["n_workers_nxcals_query"]), self.max_threads)
+
+        # only the parts of the interval that are not stored locally are fetched
+        cache_store = None
+        if dict_for_settings["setting_enable_nxcals_cache"]:
+            self.cache_store.max_size_in_mb = int(dict_for_settings["nxcals_cache_max_size_mb"])
+            cache_store = self.cache_store
+
         # start query in new thread
-        thread = NXCALSQueryThread(self.ldb, query, ts1, ts2, self.id_counter)
+        thread = NXCALSQueryThread(self.ldb, query, ts1, ts2, self.id_counter, window_mode=window_mode, n_workers=n_workers, slots=self.window_slots, cache_store=cache_store)
 
         # add thread to the list
         self.query_threads.append(thread)
 
         # update the data
-        self.data.append([query, ts1, ts2, "00:00:00"])
+        self.data.append([query, ts1, ts2, "0/1", "00:00:00"])
 
         # store init timestamp
         self.init_timestamps.append(native_time.time())
@@ -344,6 +364,7 @@ class NXCALSThreadsPanel(QDialog):
 
         # bindings for the thread
         thread.finished.connect(self.handleQueryResult)
+        thread.progress.connect(self.handleQueryProgress)
 
         # UPDATE TABLE AND TREE
         if True:
@@ -437,6 +458,25 @@ class NXCALSThreadsPanel(QDialog):
 
     #----------------------------------------------#
 
+    def handleQueryProgress(self, id, n_done, n_total, n_retried):
+
+        # just a check
+        if id not in self.ids:
+            return
+
+        # windows done (and retried), nothing to fetch when everything was stored locally
+        windows_str = "{}/{}".format(n_done, n_total) if n_total else "cached"
+        if n_retried:
+            windows_str += " ({} retried)".format(n_retried)
+        self.data[self.ids.index(id)][3] = windows_str
+
+        # update table
+        self.updateTable()
+
+        return
+
+    #----------------------------------------------#
+
     def handleQueryResult(self, result, verbose = False):
 
         # disentangle the result
@@ -474,6 +514,9 @@ class NXCALSThreadsPanel(QDialog):
         # retrieve thread
         thread = self.query_threads[index]
 
+        # skip the time windows not started yet
+        thread.cancel()
+
         # stop the thread and delete it permanently
         if terminate_thread:
             self.query_threads[index].terminate()
@@ -10,6 +10,8 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from davit.utils.hdf5_read_profiles import get_read_profile_names
+from davit.utils.nxcals_query_planner import get_query_window_names
 
 #################################################################
 #################################################################
@@ -55,6 +57,12 @@ class SettingsPreferencesView(QDialog):
         # hide green label
         self.label_saved_changes.setVisible(False)
 
+        # hdf5 read profiles
+        self.comboBox_hdf5_read_profile.addItems(get_read_profile_names())
+
+        # nxcals query time windows
+        self.comboBox_nxcals_query_window.addItems(get_query_window_names())
+
         # load all preferences
         self.loadPreferences()
 
@@ -146,12 +154,23 @@ class SettingsPreferencesView(QDialog):
         self.checkBox_setting_enable_downsampling_plots.setChecked(self.dict_for_settings["setting_enable_downsampling_plots"] == 1)
         self.checkBox_setting_display_strings_on_x_axis.setChecked(self.dict_for_settings["setting_display_strings_on_x_axis"] == 1)
         self.checkBox_setting_enable_system_monitor.setChecked(self.dict_for_settings["setting_enable_system_monitor"] == 1)
+        self.checkBox_setting_enable_nxcals_cache.setChecked(self.dict_for_settings["setting_enable_nxcals_cache"] == 1)
 
         # spinboxes
         self.spinBox_min_big_data_sample_size.setValue(self.dict_for_settings["min_big_data_sample_size"])
         self.spinBox_max_n_columns.setValue(self.dict_for_settings["max_n_columns"])
         self.spinBox_ncurves_at_init.setValue(self.dict_for_settings["ncurves_at_init"])
         self.spinBox_refresh_rate_system_monitor.setValue(self.dict_for_settings["refresh_rate_system_monitor"])
+        self.spinBox_n_workers_metadata_crawler.setValue(self.dict_for_settings["n_workers_metadata_crawler"])
+        self.spinBox_max_open_hdf5_files.setValue(self.dict_for_settings["max_open_hdf5_files"])
+        self.spinBox_hdf5_metadata_cache_mb.setValue(self.dict_for_settings["hdf5_metadata_cache_mb"])
+        self.spinBox_n_workers_hdf5_reader.setValue(self.dict_for_settings["n_workers_hdf5_reader"])
+        self.spinBox_n_workers_nxcals_query.setValue(self.dict_for_settings["n_workers_nxcals_query"])
+        self.spinBox_nxcals_cache_max_size_mb.setValue(self.dict_for_settings["nxcals_cache_max_size_mb"])
+
+        # comboboxes
+        self.comboBox_hdf5_read_profile.setCurrentIndex(self.dict_for_settings["hdf5_read_profile"])
+        self.comboBox_nxcals_query_window.setCurrentIndex(self.dict_for_settings["nxcals_query_window"])
 
         # lineedits
         self.lineEdit_color_foreground_palette_name.setText(self.dict_for_settings["color_foreground_palette_name"])
@@ -224,12 +243,23 @@ class SettingsPreferencesView(QDialog):
         self.updatePreferences(self.checkBox_setting_enable_downsampling_plots.isChecked(), "setting_enable_downsampling_plots", "checkbox")
         self.updatePreferences(self.checkBox_setting_display_strings_on_x_axis.isChecked(), "setting_display_strings_on_x_axis", "checkbox")
         self.updatePreferences(self.checkBox_setting_enable_system_monitor.isChecked(), "setting_enable_system_monitor", "checkbox")
+        self.updatePreferences(self.checkBox_setting_enable_nxcals_cache.isChecked(), "setting_enable_nxcals_cache", "checkbox")
         
         # spinboxes
         self.updatePreferences(self.spinBox_min_big_data_sample_size.value(), "min_big_data_sample_size", "spinbox")
         self.updatePreferences(self.spinBox_max_n_columns.value(), "max_n_columns", "spinbox")
         self.updatePreferences(self.spinBox_ncurves_at_init.value(), "ncurves_at_init", "spinbox")
         self.updatePreferences(self.spinBox_refresh_rate_system_monitor.value(), "refresh_rate_system_monitor", "spinbox")
+        self.updatePreferences(self.spinBox_n_workers_metadata_crawler.value(), "n_workers_metadata_crawler", "spinbox")
+        self.updatePreferences(self.spinBox_max_open_hdf5_files.value(), "max_open_hdf5_files", "spinbox")
+        self.updatePreferences(self.spinBox_hdf5_metadata_cache_mb.value(), "hdf5_metadata_cache_mb", "spinbox")
+        self.updatePreferences(self.spinBox_n_workers_hdf5_reader.value(), "n_workers_hdf5_reader", "spinbox")
+        self.updatePreferences(self.spinBox_n_workers_nxcals_query.value(), "n_workers_nxcals_query", "spinbox")
+        self.updatePreferences(self.spinBox_nxcals_cache_max_size_mb.value(), "nxcals_cache_max_size_mb", "spinbox")
+
+        # comboboxes
+        self.updatePreferences(self.comboBox_hdf5_read_profile.currentIndex(), "hdf5_read_profile", "combobox")
+        self.updatePreferences(self.comboBox_nxcals_query_window.currentIndex(), "nxcals_query_window", "combobox")
 
         # lineedits
         self.updatePreferences(self.lineEdit_color_foreground_palette_name.text(), "color_foreground_palette_name", "lineedit")
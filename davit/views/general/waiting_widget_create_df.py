@@ -113,6 +113,14 @@ class WaitingWidgetCreateDf(QDialog):
         self.movie.start()
         self.horizontalLayout_frame_bottom.addWidget(self.label_animation)
 
+        # progress bar (replaces the gif when the reader reports its progress)
+        self.progress_bar = QProgressBar(self.frame_holder)
+        self.progress_bar.setObjectName("progress_bar")
+        self.progress_bar.setMaximumSize(160, 20)
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setVisible(False)
+        self.horizontalLayout_frame_bottom.addWidget(self.progress_bar)
+
         # main label
         self.label = QLabel(self.frame_holder)
         self.label.setObjectName("label")
@@ -147,6 +155,27 @@ class WaitingWidgetCreateDf(QDialog):
 
     #----------------------------------------------#
 
+    def updateProgress(self, n_done, n_total):
+
+        # swap the gif for the progress bar the first time
+        if not self.progress_bar.isVisible():
+            self.movie.stop()
+            self.label_animation.setVisible(False)
+            self.progress_bar.setVisible(True)
+
+        # update progress bar
+        self.progress_bar.setMaximum(max(1, n_total))
+        self.progress_bar.setValue(n_done)
+        self.label.setText(" Read blocks: {} / {}".format(n_done, n_total))
+
+        # refresh
+        self.repaint()
+        self.app.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+
+        return
+
+    #----------------------------------------------#
+
     def bindWidgets(self):
 
         return
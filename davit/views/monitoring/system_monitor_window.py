@@ -194,11 +194,14 @@ class SystemInfoWidget(QFrame):
 
     #----------------------------------------------#
 
-    def __init__(self, parent):
+    def __init__(self, parent, file_pool = None):
 
         # inheritance
         super().__init__(parent=parent)
 
+        # attributes
+        self.file_pool = file_pool
+
         # init layout
         self.layout = QGridLayout(self)
 
@@ -213,6 +216,8 @@ class SystemInfoWidget(QFrame):
         self.cpu_usage_label.setText("0.00 %")
         self.cpu_count_label = QLabel(self)
         self.cpu_count_label.setText("0 Cores")
+        self.file_pool_label = QLabel(self)
+        self.file_pool_label.setText("0 open / 0 hits / 0 misses")
 
         # spacer item 1
         self.spacer_1 = QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
@@ -229,6 +234,9 @@ class SystemInfoWidget(QFrame):
         self.layout.addWidget(self.cpu_usage_label, 4, 1)
         self.layout.addWidget(QLabel("CPU Count:"), 5, 0)
         self.layout.addWidget(self.cpu_count_label, 5, 1)
+        if self.file_pool is not None:
+            self.layout.addWidget(QLabel("HDF5 Files:"), 6, 0)
+            self.layout.addWidget(self.file_pool_label, 6, 1)
 
         # spacer item 2
         self.spacer_2 = QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
@@ -257,6 +265,11 @@ class SystemInfoWidget(QFrame):
         self.cpu_usage_label.setText(f"{cpu_usage_percent:.2f} %")
         self.cpu_count_label.setText(str(cpu_count) + " Cores")
 
+        # counters of the pool of open hdf5 files
+        if self.file_pool is not None:
+            pool_stats = self.file_pool.get_stats()
+            self.file_pool_label.setText("{} open / {} hits / {} misses".format(pool_stats["open_files"], pool_stats["hits"], pool_stats["misses"]))
+
         return
 
     #----------------------------------------------#
@@ -268,7 +281,7 @@ class SystemMonitorWindow(QFrame):
 
     #----------------------------------------------#
 
-    def __init__(self, parent, app_root_path, time_period = 1000):
+    def __init__(self, parent, app_root_path, time_period = 1000, file_pool = None):
 
         # inheritance
         super().__init__(parent=parent)
@@ -277,6 +290,7 @@ class SystemMonitorWindow(QFrame):
         self.parent = parent
         self.app_root_path = app_root_path
         self.time_period = time_period
+        self.file_pool = file_pool
 
         # build widgets
         self.buildWidgets()
@@ -329,7 +343,7 @@ class SystemMonitorWindow(QFrame):
         # create main widgets
         self.memory_monitor = MemoryPlotWidget(parent = self.frame_holder)
         self.cpu_monitor = CPUMonitorWidget(parent = self.frame_holder)
-        self.system_info = SystemInfoWidget(parent = self.frame_holder)
+        self.system_info = SystemInfoWidget(parent = self.frame_holder, file_pool = self.file_pool)
 
         # add the widgets to the layout
         self.layout.addWidget(self.memory_monitor)
@@ -16,6 +16,8 @@ from davit.views.visualization.main_visualization import MainVisualization
 # SPECIFIC IMPORTS
 
 from davit.utils.hdf5_save_dataframe import HDF5DataFrameHandler
+from davit.utils.hdf5_column_reader import slice_deferred_columns
+from davit.utils.downsample_cache_store import slice_dataframe_source
 
 #################################################################
 #################################################################
@@ -139,6 +141,8 @@ class SliceDialog(QDialog):
         config_tuple_to_save = (self.df.copy(), row_from, row_to, row_step, col_from, col_to, col_step, self.rebuild_index_checkbox.isChecked())
         self.global_parent.table_model_cart.update_data(self.row, self.global_parent.column_names_cart.index("DfBeforeSlicing"), config_tuple_to_save)
         sliced_df = self.df.iloc[row_from:row_to:row_step, col_from:col_to:col_step]
+        slice_deferred_columns(self.df, sliced_df, (row_from, row_to, row_step), (col_from, col_to, col_step))
+        slice_dataframe_source(self.df, sliced_df, (row_from, row_to, row_step), (col_from, col_to, col_step))
         if self.rebuild_index_checkbox.isChecked():
             sliced_df.reset_index(drop=True, inplace=True)
         self.global_parent.table_model_cart.update_data(self.row, self.global_parent.column_names_cart.index("New Shape"), str(sliced_df.shape))
@@ -1097,7 +1101,7 @@ class MainSelection(QWidget):
 
                 # save to hdf5
                 handler = HDF5DataFrameHandler(name)
-                handler.save_dataframe_to_hdf5(df)
+                handler.save_dataframe_to_hdf5_streaming(df)
 
             # show success message
             message_title = "Success"
@@ -339,8 +339,8 @@ class MainVisualization(QWidget):
 
     def numericTypeCheck(self):
 
-        # numeric type check
-        if not np.issubdtype(self.dataframe.to_numpy().dtype, np.number):
+        # numeric type check (done over the column dtypes so that lazy frames are not materialised)
+        if not all(np.issubdtype(dtype, np.number) for dtype in self.dataframe.dtypes):
 
             # disable all tabs but the table
             self.tabWidget.setTabEnabled(0, False)
@@ -406,6 +406,10 @@ class MainVisualization(QWidget):
         # transpose
         self.dataframe = self.dataframe.T
 
+        # keep track of the orientation (used as key of the persistent downsampling cache)
+        if "source" in self.dataframe.attrs:
+            self.dataframe.attrs["source"] = dict(self.dataframe.attrs["source"], transposed=not self.dataframe.attrs["source"].get("transposed", False))
+
         # initial checks with new shape
         self.initChecks()
 
@@ -10,6 +10,7 @@
 # IMPORTS
 
 from davit.__imports__ import *
+from davit.utils.hdf5_column_reader import get_deferred_columns, get_selectable_columns
 
 #################################################################
 #################################################################
@@ -82,6 +83,11 @@ class PlotDataSelector(QDialog):
         self.x_label = x_label
         self.y_label = y_label
 
+        # previous selection as rows of the full list of columns (wide dataframe groups only contain the columns read so far)
+        if get_deferred_columns(self.dataframe) and self.previous_names:
+            all_columns = get_selectable_columns(self.dataframe)
+            self.previous_selected_indexes = [all_columns.index(name) for name in self.previous_names if name in all_columns]
+
         # own attributes
         if var_axis_dict:
             self.var_axis_dict = var_axis_dict
@@ -105,8 +111,8 @@ class PlotDataSelector(QDialog):
 
     def buildCodeWidgets(self):
 
-        # get columns
-        self.columns = list(self.dataframe.columns.astype(str))
+        # get columns (also the ones of the hdf5 group that have not been read yet)
+        self.columns = get_selectable_columns(self.dataframe)
 
         # fill treeview with columns
         self.model_treeView = CustomStandardItemModel(0,2)
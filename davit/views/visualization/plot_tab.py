@@ -11,7 +11,9 @@
 
 from davit.__imports__ import *
 from davit.views.visualization.plot_data_selector import PlotDataSelector
-from davit.utils.big_data_plot import BigDataPlot, PlotDataClass
+from davit.utils.big_data_plot import BigDataPlot, PlotDataClass, compress_x_axis
+from davit.utils.downsample_cache_store import DownsampleCacheStore
+from davit.utils.hdf5_column_reader import get_deferred_columns, load_deferred_columns, map_deferred_selection
 
 #################################################################
 #################################################################
@@ -86,6 +88,12 @@ class PlotTab(QWidget):
         self.symlog_mode = False
         self.tab_is_built = False
 
+        # persistent store for the downsampling pyramids of big curves
+        self.downsample_cache_store = DownsampleCacheStore()
+
+        # background workers building the downsampling pyramids
+        self.downsample_cache_workers = []
+
         # for hover
         self.mouse_moved_connection = None
         self.data_bounds = []
@@ -615,6 +623,14 @@ class PlotTab(QWidget):
         self.x_label = x_label
         self.y_label = y_label
 
+        # wide dataframe groups: read the selected columns that are still on disk and use their positions in the dataframe
+        if get_deferred_columns(self.dataframe):
+            if load_deferred_columns(self.dataframe, selected_indexes):
+                self.makeColorPaletteForLegendAndPlot(list(self.dataframe.columns))
+            selected_indexes, names, axis_list = map_deferred_selection(self.dataframe, selected_indexes, names, axis_list)
+            if not selected_indexes:
+                return
+
         # update backups with the new full selection
         self.original_selected_indexes = selected_indexes.copy()
         self.original_names = names.copy()
@@ -691,6 +707,9 @@ class PlotTab(QWidget):
         self.data_bounds = []
         self.mouseHoverFirstTime = False
 
+        # cancel pyramids still being built for the previous curves
+        self.cancelDownsampleCacheWorkers()
+
         # clear viewboxes and axis items
         self.clearViewboxes()
         self.clearYAxisItems()
@@ -787,38 +806,52 @@ class PlotTab(QWidget):
         # set init axis labels
         self.modifyAxisLabels(self.x_label, self.y_label, init_y = axis_list[0])
 
+        # get the index (the same x axis object is shared by every curve)
+        shared_x = np.array([])
+        data_x_scale = 1.0
+        try:
+            if index_type == "datetime":
+                if not self.fft_mode:
+                    if self.big_data_mode:
+                        shared_x = get_datetime_index_ns(self.dataframe.index)
+                        data_x_scale = 1e-9
+                    else:
+                        shared_x = get_datetime_index_seconds(self.dataframe.index)
+                    self.plot_item.setAxisItems({'bottom': DateAxisItem(orientation='bottom')})
+            elif index_type == "timestep":
+                # numeric indexes are kept in their own dtype (no float copy of int64 axes)
+                shared_x = self.dataframe.index.to_numpy()
+                if shared_x.dtype.kind not in "iuf":
+                    shared_x = shared_x.astype(float)
+            elif self.display_strings_on_x_axis and pd.api.types.is_string_dtype(self.dataframe.index):
+                self.x_is_string = True
+                self.string_labels = list(self.dataframe.index)
+                shared_x = np.arange(len(self.dataframe.index))
+                self.plot_item.setAxisItems({'bottom': StringAxisItem(labels=self.string_labels, orientation='bottom')})
+        except Exception as xcp:
+            print("Exception when converting dataframe index: {}".format(xcp))
+
+        # default index case
+        has_real_x = bool(shared_x.any())
+        if not has_real_x:
+            if self.big_data_mode:
+                pass # the sample number is used as x for big data mode when there is no real axis
+            elif self.dataframe.index.equals(pd.RangeIndex(start=0, stop=self.dataframe.shape[0])):
+                shared_x = self.dataframe.index.to_numpy()
+            else:
+                shared_x = np.arange(0, self.dataframe.shape[0])
+
+        # big data curves share the compressed axis ((x0, dx) for uniform sampling)
+        shared_compressed_x = None
+        if self.big_data_mode and not self.fft_mode:
+            shared_compressed_x = compress_x_axis(shared_x if has_real_x else None)
+
         # iterate over all indexes or curves
         for counter, index in enumerate(selected_indexes):
 
             # get the data
             data_y = self.dataframe.iloc[:, index].to_numpy()
-
-            # get the index
-            data_x = np.array([])
-            try:
-                if index_type == "datetime":
-                    if not self.fft_mode:
-                        data_x = pd.to_datetime(self.dataframe.index, format='%Y-%m-%dT%H:%M:%S.%f000').tz_localize('Etc/GMT-2').astype(int) // 10**9
-                        data_x = data_x.to_numpy()
-                        self.plot_item.setAxisItems({'bottom': DateAxisItem(orientation='bottom')})
-                elif index_type == "timestep":
-                    data_x = self.dataframe.index.to_numpy().astype(float)
-                elif self.display_strings_on_x_axis and pd.api.types.is_string_dtype(self.dataframe.index):
-                    self.x_is_string = True
-                    self.string_labels = list(self.dataframe.index)
-                    data_x = np.arange(len(self.dataframe.index))
-                    self.plot_item.setAxisItems({'bottom': StringAxisItem(labels=self.string_labels, orientation='bottom')})
-            except Exception as xcp:
-                print("Exception when converting dataframe index: {}".format(xcp))
-
-            # default index case
-            if not data_x.any():
-                if self.big_data_mode:
-                    pass # data_x is not used for big data mode in order to save up memory space
-                elif self.dataframe.index.equals(pd.RangeIndex(start=0, stop=self.dataframe.shape[0])):
-                    data_x = self.dataframe.index.to_numpy()
-                else:
-                    data_x = np.arange(0, len(data_y))
+            data_x = shared_x
 
             # get the formatted name
             formatted_name = names[counter]
@@ -859,16 +892,19 @@ class PlotTab(QWidget):
             # CASE 2 - BIG DATA (USE CUSTOM BIG DATA PLOT WITH CUSTOM DOWNSAMPLING AND CHUNKING)
             else:
 
+                # key of the persistent downsampling pyramid (None if the frame does not come from a file)
+                cache_key = self.downsample_cache_store.makeKeyFromDataFrame(self.dataframe, index, data_y.shape[0], data_y.dtype, transform=self.getTransformModeStr())
+
                 # init big data curve
                 plot_item = BigDataPlot(pen=self.color_palette[counter], name=formatted_name)
-                plot_item.setPlotData(PlotDataClass(x=None, y=data_y, cache="auto", chunk_size = self.chunk_size, app = self.app, name = names[counter]))
+                plot_item.setPlotData(PlotDataClass(x=compress_x_axis(data_x) if self.fft_mode else shared_compressed_x, y=data_y, cache="async", chunk_size = self.chunk_size, app = self.app, name = names[counter], cache_store = self.downsample_cache_store, cache_key = cache_key, x_scale = data_x_scale))
 
                 # add the item to the viewbox
                 self.y_axis_viewboxes[axis_key].addItem(plot_item)
 
                 # manually range the x axis to update all the points
-                # self.plot_item.setXRange(0, data_y.shape[0])
-                self.y_axis_viewboxes[axis_key].setXRange(0, data_y.shape[0])
+                x_min, x_max = plot_item._plotData.xBounds()
+                self.y_axis_viewboxes[axis_key].setXRange(x_min, x_max)
 
                 # disable pyqtgraph menus (e.g. default downsampling menu)
                 # self.plot_item.ctrlMenu = None
@@ -882,7 +918,17 @@ class PlotTab(QWidget):
             self.curve_items_names.append(formatted_name)
 
             # for hover
-            self.data_bounds.append(plot_item.dataBounds(ax=0))
+            if isinstance(plot_item, BigDataPlot):
+                self.data_bounds.append(plot_item._plotData.xBounds())
+            else:
+                self.data_bounds.append(plot_item.dataBounds(ax=0))
+
+        # build the downsampling pyramids in the background (coarsest level first, one worker per curve)
+        for plot_item in self.curve_items:
+            if isinstance(plot_item, BigDataPlot):
+                worker = plot_item.startDownsampleCache()
+                if worker is not None:
+                    self.downsample_cache_workers.append(worker)
 
         # this is used for the Ctrl mute hack
         self.items_dict = {}
@@ -972,6 +1018,26 @@ class PlotTab(QWidget):
 
     #----------------------------------------------#
 
+    def cancelDownsampleCacheWorkers(self):
+
+        # stop the workers (they exit after the level being computed)
+        for worker in self.downsample_cache_workers:
+            worker.cancel()
+        self.downsample_cache_workers = []
+
+        return
+
+    #----------------------------------------------#
+
+    def getTransformModeStr(self):
+
+        # string describing the transformations applied to the curves
+        transform_str = "fft={}|remove_mean={}|log10={}|symlog={}".format(self.fft_mode, self.remove_mean_mode, self.log10_mode, self.symlog_mode)
+
+        return transform_str
+
+    #----------------------------------------------#
+
     def clearYAxisItems(self):
 
         # clear all axis items
@@ -1167,7 +1233,7 @@ class PlotTab(QWidget):
                     else:
                         final_x_val_formatted = ""
                 elif self.is_datetime and not self.fft_mode:
-                    final_x_val_formatted = datetime.utcfromtimestamp(final_x_val).strftime('%Y-%m-%dT%H:%M:%S.%f000')
+                    final_x_val_formatted = self.formatDatetimeFromHover(final_x_val)
                 else:
                     final_x_val_formatted = "{}".format(final_x_val)
 
@@ -1291,6 +1357,28 @@ class PlotTab(QWidget):
 
     #----------------------------------------------#
 
+    def formatDatetimeFromHover(self, x_val):
+
+        # use the cached epoch nanoseconds of the index (sub-second precision is kept)
+        try:
+            # the row is always found by x value (the curve data may be clipped or downsampled by pyqtgraph), with an int64 key
+            # so that the index is not cast to float on every mouse move
+            index_ns = get_datetime_index_ns(self.dataframe.index)
+            x_ns = np.int64(round(x_val * 1e9))
+            x_idx = int(np.searchsorted(index_ns, x_ns))
+            x_idx = max(0, min(len(index_ns) - 1, x_idx))
+
+            # big data curves use the nanoseconds (nearest row), the others whole seconds (first row of that second)
+            if self.big_data_mode and x_idx > 0 and abs(int(index_ns[x_idx - 1]) - int(x_ns)) <= abs(int(index_ns[x_idx]) - int(x_ns)):
+                x_idx -= 1
+            x_val_formatted = pd.Timestamp(int(index_ns[x_idx])).strftime('%Y-%m-%dT%H:%M:%S.%f000')
+        except Exception as xcp:
+            x_val_formatted = datetime.utcfromtimestamp(x_val).strftime('%Y-%m-%dT%H:%M:%S.%f000')
+
+        return x_val_formatted
+
+    #----------------------------------------------#
+
     def convertArrayToFFTArray(self, array, remove_dc_offset = True):
 
         # handle nan values by replacing them with the mean of non-nan values
@@ -1322,6 +1410,9 @@ class PlotTab(QWidget):
 
     def closeEvent(self, evt):
 
+        # stop building the downsampling pyramids
+        self.cancelDownsampleCacheWorkers()
+
         # remove and delete curve items
         try:
             if hasattr(self, 'curve_items'):
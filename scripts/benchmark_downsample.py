@@ -0,0 +1,106 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_downsample.py --sizes 10000000 100000000 500000000 --ds 4 64 1024 --dtype float32
+
+This command compares the previous chunked min/max downsampling loop used by PlotDataClass._downsample against
+the vectorised kernel (numpy path and, if numba is installed, the numba fast path) for every size and
+downsampling factor, checks that all of them return the same result and prints the best time of each one.
+Note that 500M float64 points need 4 GB of RAM (use --dtype float32 to halve it).
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils.big_data_plot import downsample_min_max, NUMBA_AVAILABLE
+
+def legacy_downsample(data, start, stop, ds, chunk_size=100_000):
+    """
+    Previous implementation of PlotDataClass._downsample (chunk loop with np.append tail padding).
+    """
+    samples = 1 + ((stop - start) // ds)
+    temp_visible = np.zeros(samples * 2, dtype=data.dtype)
+    sourcePtr = start
+    targetPtr = 0
+    chunk_size = (chunk_size // ds) * ds
+
+    while sourcePtr < stop:
+        chunk = data[sourcePtr: min(stop, sourcePtr + chunk_size)]
+        sourcePtr += len(chunk)
+
+        if len(chunk) % ds != 0:
+            tail = np.full(ds - len(chunk) % ds, chunk[-1])
+            chunk = np.append(chunk, tail)
+
+        chunk = chunk.reshape(len(chunk) // ds, ds)
+
+        chunkMax = chunk.max(axis=1)
+        chunkMin = chunk.min(axis=1)
+
+        temp_visible[targetPtr: targetPtr + chunk.shape[0] * 2: 2] = chunkMin
+        temp_visible[1 + targetPtr: 1 + targetPtr + chunk.shape[0] * 2: 2] = chunkMax
+        targetPtr += chunk.shape[0] * 2
+
+    return temp_visible[:targetPtr]
+
+def best_time(function, repeats):
+    """
+    Returns the best wall time (in seconds) and the output of the function.
+    """
+    best = np.inf
+    output = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        output = function()
+        best = min(best, time.perf_counter() - t0)
+    return best, output
+
+def run_benchmark(sizes, ds_list, dtype, repeats, chunk_size):
+    """
+    Runs every implementation for every size and downsampling factor.
+    """
+    rng = np.random.default_rng(0)
+    print(f"numba available: {NUMBA_AVAILABLE}")
+    print(f"{'points':>12} {'ds':>6} {'legacy [s]':>12} {'numpy [s]':>12} {'numba [s]':>12} {'speedup':>9}")
+
+    for size in sizes:
+
+        # add a ragged tail so that the padding path is exercised
+        data = rng.standard_normal(size + 3).astype(dtype)
+
+        for ds in ds_list:
+            t_legacy, out_legacy = best_time(lambda: legacy_downsample(data, 0, len(data), ds, chunk_size=chunk_size), repeats)
+            t_numpy, out_numpy = best_time(lambda: downsample_min_max(data, 0, len(data), ds, use_numba=False), repeats)
+            if not np.array_equal(out_legacy, out_numpy):
+                print(f"ERROR: numpy kernel differs from legacy implementation (points={size}, ds={ds})")
+
+            t_numba = np.nan
+            if NUMBA_AVAILABLE:
+                downsample_min_max(data[:ds * 4], 0, ds * 4, ds, use_numba=True)
+                t_numba, out_numba = best_time(lambda: downsample_min_max(data, 0, len(data), ds, use_numba=True), repeats)
+                if not np.array_equal(out_legacy, out_numba):
+                    print(f"ERROR: numba kernel differs from legacy implementation (points={size}, ds={ds})")
+
+            t_best = np.nanmin([t_numpy, t_numba])
+            print(f"{size:>12} {ds:>6} {t_legacy:>12.4f} {t_numpy:>12.4f} {t_numba:>12.4f} {t_legacy / t_best:>8.1f}x")
+
+        del data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmark of the min/max downsampling kernel used by the big data plots.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000_000, 100_000_000, 500_000_000], help='Number of points of every test curve.')
+    parser.add_argument('--ds', type=int, nargs='+', default=[4, 64, 1024], help='Downsampling factors to test.')
+    parser.add_argument('--dtype', type=str, default='float64', help='Data type of the test curves.')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of repetitions (the best time is kept).')
+    parser.add_argument('--chunk-size', type=int, default=100_000, help='Chunk size used by the legacy implementation.')
+
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.ds, args.dtype, args.repeats, args.chunk_size)
@@ -0,0 +1,105 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_hdf5_writer.py --rows 10000000 --cols 8 --mixed --compression none lzf gzip lz4 blosc
+
+This command writes the same dataframe with the previous writer (HDF5DataFrameHandler.save_dataframe_to_hdf5) and with
+the streaming writer (HDF5DataFrameHandler.save_dataframe_to_hdf5_streaming) for every compression filter, and prints
+the write and read throughput, the file size and the peak resident memory increase of each run.
+Files are written to a temporary directory that is removed at the end.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import pandas as pd
+import psutil
+import h5py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils.hdf5_save_dataframe import HDF5DataFrameHandler
+
+def create_dataframe(rows, cols, mixed):
+    """
+    Creates a test dataframe with a datetime index (half float64, half int32 columns if mixed).
+    """
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=rows, freq="1ms")
+    data = {}
+    for col in range(cols):
+        if mixed and col % 2 == 1:
+            data[f"col_{col}"] = rng.integers(0, 1000, rows, dtype=np.int32)
+        else:
+            data[f"col_{col}"] = np.cumsum(rng.standard_normal(rows))
+    return pd.DataFrame(data, index=index)
+
+def read_back(file_path):
+    """
+    Reads every dataset of the file (returns the number of bytes read).
+    """
+    n_bytes = 0
+    def visitor(name, node):
+        nonlocal n_bytes
+        if isinstance(node, h5py.Dataset):
+            n_bytes += node[()].nbytes
+    with h5py.File(file_path, "r") as h5_file:
+        h5_file.visititems(visitor)
+    return n_bytes
+
+def run_case(label, write_function, file_path, df_bytes):
+    """
+    Runs one writer and prints its figures.
+    """
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    t0 = time.perf_counter()
+    try:
+        write_function(file_path)
+    except Exception as e:
+        print(f"{label:<28} FAILED: {e}")
+        return
+    t_write = time.perf_counter() - t0
+    rss_after = process.memory_info().rss
+    t0 = time.perf_counter()
+    read_back(file_path)
+    t_read = time.perf_counter() - t0
+    size_mb = os.path.getsize(file_path) / 1024 ** 2
+    print(f"{label:<28} {df_bytes / 1024 ** 2 / t_write:>12.1f} {df_bytes / 1024 ** 2 / t_read:>12.1f} {size_mb:>12.1f} {(rss_after - rss_before) / 1024 ** 2:>12.1f}")
+    os.remove(file_path)
+
+def run_benchmark(rows, cols, mixed, compressions, chunk_rows):
+    """
+    Compares the previous writer against the streaming writer.
+    """
+    df = create_dataframe(rows, cols, mixed)
+    df_bytes = df.memory_usage(index=True).sum()
+    tmp_dir = tempfile.mkdtemp(prefix="davit_writer_benchmark_")
+    print(f"dataframe: {rows} rows x {cols} cols ({df_bytes / 1024 ** 2:.1f} MB, mixed={mixed})")
+    print(f"{'writer':<28} {'write MB/s':>12} {'read MB/s':>12} {'file MB':>12} {'RSS +MB':>12}")
+    try:
+        file_path = os.path.join(tmp_dir, "test.hdf5")
+        run_case("previous", lambda path: HDF5DataFrameHandler(path).save_dataframe_to_hdf5(df), file_path, df_bytes)
+        for compression in compressions:
+            compression = None if compression == "none" else compression
+            run_case(f"streaming ({compression})", lambda path: HDF5DataFrameHandler(path).save_dataframe_to_hdf5_streaming(df, compression=compression, chunk_rows=chunk_rows), file_path, df_bytes)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the HDF5 dataframe writers (write/read throughput, file size and memory).'
+    )
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Number of rows of the test dataframe.')
+    parser.add_argument('--cols', type=int, default=8, help='Number of columns of the test dataframe.')
+    parser.add_argument('--mixed', action="store_true", help='Use mixed float64/int32 columns.')
+    parser.add_argument('--compression', type=str, nargs='+', default=['none', 'lzf', 'gzip', 'lz4', 'blosc'], help='Compression filters to test with the streaming writer.')
+    parser.add_argument('--chunk-rows', type=int, default=None, help='Chunk rows of the streaming writer (default: about 1 MB per chunk).')
+
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.cols, args.mixed, args.compression, args.chunk_rows)
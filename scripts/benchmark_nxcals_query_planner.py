@@ -0,0 +1,164 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_nxcals_query_planner.py --hours 48 --rate 10 --variables 3 --latency 0.5 --failure-rate 0.1 --workers 1 4 8 --zooms 20
+
+This command queries a stub logging database (no NXCALS connection needed) that answers get(query, ts1, ts2) like pytimber:
+a dict of (timestamps, values) per variable, a fixed latency plus a time proportional to the rows of every call, and random
+failures. The interval is fetched as a whole and with every window mode of the planner, checking that the stitched result is
+the same as the one of the whole interval (no stamp lost or duplicated on the window edges).
+Then it simulates an operator zooming around the same interval (--zooms random overlapping sub-intervals) with and without the
+local cache of results, printing the calls, the fetched hours and the time of both.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils.nxcals_query_planner import NXCALSQueryPlanner, QUERY_WINDOW_MODES, to_unix_seconds
+from davit.utils.nxcals_result_block import NXCALSResultBlock
+from davit.utils.nxcals_cache_store import NXCALSCacheStore
+
+class StubLoggingDB:
+    """
+    Minimal stand-in of pytimber.LoggingDB: every variable is logged at a fixed rate (scalars) or as vectors.
+    """
+    def __init__(self, t1, t2, rate, n_variables, latency, seconds_per_million_rows, failure_rate, seed = 0):
+        self.latency = latency
+        self.seconds_per_million_rows = seconds_per_million_rows
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.n_calls = 0
+        self.fetched_seconds = 0.0
+        self.timestamps = np.arange(t1, t2, 1.0 / rate)
+        self.variables = {}
+        for counter in range(n_variables):
+            if counter % 2 == 0:
+                self.variables[f"STUB.VARIABLE.{counter}:SCALAR"] = np.cumsum(np.random.default_rng(counter).standard_normal(self.timestamps.size))
+            else:
+                self.variables[f"STUB.VARIABLE.{counter}:VECTOR"] = np.random.default_rng(counter).standard_normal((self.timestamps.size, 8))
+
+    def get(self, query, ts1, ts2):
+        with self.lock:
+            self.n_calls += 1
+            fail = self.random.random() < self.failure_rate
+        t1 = to_unix_seconds(ts1)
+        t2 = to_unix_seconds(ts2)
+        with self.lock:
+            self.fetched_seconds += t2 - t1
+        start = np.searchsorted(self.timestamps, t1, side="left")
+        stop = np.searchsorted(self.timestamps, t2, side="right")
+        time.sleep(self.latency + (stop - start) * len(self.variables) * self.seconds_per_million_rows / 1e6)
+        if fail:
+            raise RuntimeError("stub extraction failed")
+        return {name: (self.timestamps[start:stop], values[start:stop]) for name, values in self.variables.items()}
+
+def blocks_are_equal(block_a, block_b):
+    """
+    Same stamps and same rows.
+    """
+    if not np.array_equal(block_a.timestamps, block_b.timestamps):
+        return False
+    return all(np.array_equal(block_a.get_row(row), block_b.get_row(row)) for row in range(0, len(block_a), max(1, len(block_a) // 1000)))
+
+def run_benchmark(hours, rate, n_variables, latency, seconds_per_million_rows, failure_rate, workers):
+    """
+    Fetches the same interval with every window mode and number of workers.
+    """
+    t2 = float(int(time.time()))
+    t1 = t2 - hours * 3600
+    print(f"interval: {hours} h, {n_variables} variables at {rate} Hz ({int(hours * 3600 * rate)} stamps each), latency {latency} s, failure rate {failure_rate}")
+
+    # reference (whole interval, no failures)
+    reference_ldb = StubLoggingDB(t1, t2, rate, n_variables, latency, seconds_per_million_rows, 0.0)
+    reference = {key: NXCALSResultBlock.from_response(value[0], value[1]) for key, value in reference_ldb.get("STUB.%", t1, t2).items()}
+
+    print(f"{'mode':<16} {'workers':>8} {'calls':>6} {'windows':>8} {'retried':>8} {'time s':>8} {'result':>8}")
+    for mode_name, window_mode in QUERY_WINDOW_MODES.items():
+        for n_workers in (workers if window_mode is not None else [1]):
+            ldb = StubLoggingDB(t1, t2, rate, n_variables, latency, seconds_per_million_rows, failure_rate, seed=n_workers)
+            progress = {}
+            planner = NXCALSQueryPlanner(ldb, window_mode=window_mode, n_workers=n_workers, n_retries=3, slots=threading.BoundedSemaphore(25), retry_delay=0.05,
+                                         progress_callback=lambda n_done, n_total, n_retried: progress.update(n_done=n_done, n_total=n_total, n_retried=n_retried))
+            t0 = time.perf_counter()
+            try:
+                response_dict, error = planner.run("STUB.%", t1, t2)
+            except Exception as xcp:
+                print(f"{mode_name:<16} {n_workers:>8} {ldb.n_calls:>6} {'':>8} {'':>8} {time.perf_counter() - t0:>8.2f} {'FAILED':>8}")
+                continue
+            elapsed = time.perf_counter() - t0
+            if error:
+                result = "PARTIAL"
+            elif response_dict.keys() == reference.keys() and all(blocks_are_equal(response_dict[key], reference[key]) for key in reference):
+                result = "OK"
+            else:
+                result = "MISMATCH"
+            print(f"{mode_name:<16} {n_workers:>8} {ldb.n_calls:>6} {progress.get('n_total', 0):>8} {progress.get('n_retried', 0):>8} {elapsed:>8.2f} {result:>8}")
+
+def run_cache_benchmark(hours, rate, n_variables, latency, seconds_per_million_rows, n_zooms, n_workers):
+    """
+    Overlapping sub-intervals of the same interval fetched with and without the local cache.
+    """
+    t2 = float(int(time.time())) - 86400
+    t1 = t2 - hours * 3600
+    rng = random.Random(0)
+    zooms = []
+    for counter in range(n_zooms):
+        center = rng.uniform(t1, t2)
+        half_width = rng.uniform(0.02, 0.25) * (t2 - t1)
+        zooms.append((max(t1, center - half_width), min(t2, center + half_width)))
+
+    print(f"{n_zooms} zooms inside {hours} h ({n_workers} workers, 1 hour windows)")
+    print(f"{'cache':<8} {'calls':>6} {'fetched h':>10} {'time s':>8} {'result':>8}")
+    reference_ldb = StubLoggingDB(t1, t2, rate, n_variables, 0.0, 0.0, 0.0)
+    cache_dir = tempfile.mkdtemp(prefix="davit_nxcals_cache_benchmark_")
+    try:
+        for use_cache in [False, True]:
+            ldb = StubLoggingDB(t1, t2, rate, n_variables, latency, seconds_per_million_rows, 0.0)
+            cache_store = NXCALSCacheStore(cache_dir=cache_dir) if use_cache else None
+            responses = []
+            t0 = time.perf_counter()
+            for zoom_t1, zoom_t2 in zooms:
+                planner = NXCALSQueryPlanner(ldb, window_mode=3600, n_workers=n_workers)
+                if cache_store:
+                    response_dict, error = planner.run_with_cache("STUB.%", zoom_t1, zoom_t2, cache_store)
+                else:
+                    response_dict, error = planner.run("STUB.%", zoom_t1, zoom_t2)
+                responses.append(response_dict)
+            elapsed = time.perf_counter() - t0
+            result = "OK"
+            for (zoom_t1, zoom_t2), response_dict in zip(zooms, responses):
+                reference = {key: NXCALSResultBlock.from_response(value[0], value[1]) for key, value in reference_ldb.get("STUB.%", zoom_t1, zoom_t2).items()}
+                if not all(blocks_are_equal(response_dict[key], reference[key]) for key in reference):
+                    result = "MISMATCH"
+            print(f"{str(use_cache):<8} {ldb.n_calls:>6} {ldb.fetched_seconds / 3600:>10.1f} {elapsed:>8.2f} {result:>8}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the NXCALS query planner against a stub logging database.'
+    )
+    parser.add_argument('--hours', type=float, default=48, help='Length of the queried interval in hours.')
+    parser.add_argument('--rate', type=float, default=10, help='Logging rate of every variable in Hz.')
+    parser.add_argument('--variables', type=int, default=3, help='Number of variables returned by the query.')
+    parser.add_argument('--latency', type=float, default=0.5, help='Fixed latency of every call in seconds.')
+    parser.add_argument('--seconds-per-million-rows', type=float, default=2.0, help='Extraction time of every million rows.')
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='Probability of a call failing.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help='Numbers of workers to test.')
+    parser.add_argument('--zooms', type=int, default=20, help='Number of overlapping sub-intervals of the cache benchmark (0 skips it).')
+
+    args = parser.parse_args()
+    run_benchmark(args.hours, args.rate, args.variables, args.latency, args.seconds_per_million_rows, args.failure_rate, args.workers)
+    if args.zooms > 0:
+        run_cache_benchmark(args.hours, args.rate, args.variables, args.latency, args.seconds_per_million_rows, args.zooms, max(args.workers))
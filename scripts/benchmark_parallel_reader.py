@@ -0,0 +1,83 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_parallel_reader.py --rows 20000000 --cols 8 --compression none gzip lzf --workers 1 2 4 8
+
+This command writes a chunked 2D dataset with every compression filter and reads it back sequentially (h5py) and with
+the parallel reader (read_dataset_parallel) for every number of workers, printing the read throughput and the speedup.
+gzip datasets are decoded by threads, the other ones by processes with shared memory.
+Files are written to a temporary directory that is removed at the end.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import h5py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils.hdf5_parallel_reader import read_dataset_parallel, get_read_mode
+
+def write_dataset(file_path, rows, cols, compression, chunk_rows):
+    """
+    Writes a random walk matrix (float64) with the given compression filter.
+    """
+    rng = np.random.default_rng(0)
+    with h5py.File(file_path, "w") as h5_file:
+        dataset = h5_file.create_dataset("data", shape=(rows, cols), dtype=np.float64, chunks=(chunk_rows, cols), compression=compression, shuffle=compression is not None)
+        for start in range(0, rows, 1_000_000):
+            stop = min(start + 1_000_000, rows)
+            dataset[start:stop] = np.cumsum(rng.standard_normal((stop - start, cols)), axis=0)
+
+def run_benchmark(rows, cols, compressions, workers, chunk_rows):
+    """
+    Compares the sequential read against the parallel reader.
+    """
+    n_bytes = rows * cols * 8
+    tmp_dir = tempfile.mkdtemp(prefix="davit_reader_benchmark_")
+    print(f"dataset: {rows} rows x {cols} cols ({n_bytes / 1024 ** 2:.1f} MB, chunks of {chunk_rows} rows)")
+    print(f"{'compression':<14} {'mode':<10} {'workers':>8} {'read MB/s':>12} {'speedup':>10}")
+    try:
+        for compression in compressions:
+            compression = None if compression == "none" else compression
+            file_path = os.path.join(tmp_dir, f"test_{compression}.hdf5")
+            write_dataset(file_path, rows, cols, compression, chunk_rows)
+            with h5py.File(file_path, "r") as h5_file:
+                node = h5_file["data"]
+                mode = get_read_mode(node)
+                t0 = time.perf_counter()
+                reference = node[()]
+                t_sequential = time.perf_counter() - t0
+                print(f"{str(compression):<14} {'h5py':<10} {1:>8} {n_bytes / 1024 ** 2 / t_sequential:>12.1f} {1.0:>10.2f}")
+                for n_workers in workers:
+                    t0 = time.perf_counter()
+                    array = read_dataset_parallel(node, n_workers=n_workers)
+                    t_parallel = time.perf_counter() - t0
+                    if array is None:
+                        print(f"{str(compression):<14} {mode:<10} {n_workers:>8} {'sequential':>12}")
+                        continue
+                    if not np.array_equal(array, reference):
+                        print(f"{str(compression):<14} {mode:<10} {n_workers:>8} MISMATCH")
+                        continue
+                    print(f"{str(compression):<14} {mode:<10} {n_workers:>8} {n_bytes / 1024 ** 2 / t_parallel:>12.1f} {t_sequential / t_parallel:>10.2f}")
+            os.remove(file_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the parallel HDF5 reader (read throughput and speedup against h5py).'
+    )
+    parser.add_argument('--rows', type=int, default=20_000_000, help='Number of rows of the test dataset.')
+    parser.add_argument('--cols', type=int, default=8, help='Number of columns of the test dataset.')
+    parser.add_argument('--compression', type=str, nargs='+', default=['none', 'gzip', 'lzf'], help='Compression filters to test.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8], help='Numbers of workers to test.')
+    parser.add_argument('--chunk-rows', type=int, default=16_384, help='Chunk rows of the test dataset.')
+
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.cols, args.compression, args.workers, args.chunk_rows)
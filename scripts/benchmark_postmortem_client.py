@@ -0,0 +1,165 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_postmortem_client.py --sources 64 --events 4 --samples 2000 --latency 0.05 --failure-rate 0.05 --workers 1 8 16
+
+This command starts a local stub of the postmortem rest api (a threaded http server answering /v3/pmdata/within/range with
+gzip compressed json events, a fixed latency and random 503 answers) and fetches one event range for every source:
+first with bare requests.get calls (no session, no timeout, no retries), then with PMAccess one source after the other,
+and finally with the bulk api of PMAccess for every number of workers, printing the throughput of every case.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+import requests
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils.postmortem_client import PMAccess, create_session
+
+class StubPMHandler(BaseHTTPRequestHandler):
+    """
+    Answers the range requests with the events of the requested source (same format as the postmortem rest api).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            server.n_requests += 1
+            fail = server.random.random() < server.failure_rate
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        params = parse_qs(urlparse(self.path).query)
+        body = server.get_body(params["system"][0], params["className"][0], params["source"][0], int(params["fromTimestampInNanos"][0]))
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class StubPMServer(ThreadingHTTPServer):
+    """
+    Threaded stub server with the events of every source built once.
+    """
+    daemon_threads = True
+
+    def __init__(self, n_events, n_samples, latency, failure_rate):
+        super().__init__(("127.0.0.1", 0), StubPMHandler)
+        self.n_events = n_events
+        self.n_samples = n_samples
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(0)
+        self.lock = threading.Lock()
+        self.n_requests = 0
+        self.bodies = {}
+
+    def get_body(self, system, class_name, source, from_ns):
+        key = (system, class_name, source)
+        with self.lock:
+            if key not in self.bodies:
+                rng = np.random.default_rng(abs(hash(key)) % 2 ** 32)
+                content = []
+                for counter in range(self.n_events):
+                    stamp = from_ns + counter * 1_000_000_000
+                    content.append({
+                        "header": {"systemName": system, "className": class_name, "sourceName": source, "timestamp": stamp},
+                        "values": {
+                            "acqStamp": {"value": stamp, "type": "long"},
+                            "I_MEAS": {"value": np.round(np.cumsum(rng.standard_normal(self.n_samples)), 6).tolist(), "type": "double[]"},
+                            "V_MEAS": {"value": np.round(rng.standard_normal(self.n_samples), 6).tolist(), "type": "double[]"},
+                            "STATUS": {"value": int(rng.integers(0, 4)), "type": "int"},
+                        },
+                    })
+                self.bodies[key] = json.dumps({"content": content}).encode("utf-8")
+            return self.bodies[key]
+
+def fetch_with_bare_requests(pm_server, sources, from_ns, to_ns):
+    """
+    Previous behaviour: one new connection per request, no timeout and no retries.
+    """
+    results = []
+    for system, class_name, source in sources:
+        url = "{}/v3/pmdata/within/range?system={}&className={}&source={}&fromTimestampInNanos={}&toTimestampInNanos={}".format(pm_server, system, class_name, source, from_ns, to_ns)
+        try:
+            response = requests.get(url)
+            response.raise_for_status()
+            results.append(len(response.json()["content"]))
+        except Exception:
+            results.append(None)
+    return results
+
+def run_benchmark(n_sources, n_events, n_samples, latency, failure_rate, workers):
+    """
+    Compares bare requests, the pooled client and its bulk api against the stub server.
+    """
+    server = StubPMServer(n_events, n_samples, latency, failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pm_server = "http://127.0.0.1:{}".format(server.server_address[1])
+    sources = [("QPS", "51_self_pmd", "RPTE.UA23.RB.A{:03d}".format(counter)) for counter in range(n_sources)]
+    from_ns = 1_634_688_000_000_000_000
+    to_ns = from_ns + 3600 * 1_000_000_000
+    body_mb = len(server.get_body(*sources[0], from_ns)) / 1024 ** 2
+    print(f"stub server at {pm_server}: {n_sources} sources, {n_events} events of {n_samples} samples ({body_mb:.2f} MB of json per source), latency {latency} s, failure rate {failure_rate}")
+    print(f"{'client':<20} {'workers':>8} {'requests/s':>12} {'MB/s':>10} {'failed':>8}")
+
+    try:
+        # bare requests
+        t0 = time.perf_counter()
+        results = fetch_with_bare_requests(pm_server, sources, from_ns, to_ns)
+        elapsed = time.perf_counter() - t0
+        print(f"{'requests.get':<20} {1:>8} {n_sources / elapsed:>12.1f} {n_sources * body_mb / elapsed:>10.1f} {sum(result is None for result in results):>8}")
+
+        # pooled client, sequential
+        pma = PMAccess(pm_server, session=create_session(backoff_factor=0.05))
+        t0 = time.perf_counter()
+        results = [pma.get_pm_data_range(system, class_name, source, from_ns, to_ns) for system, class_name, source in sources]
+        elapsed = time.perf_counter() - t0
+        print(f"{'PMAccess':<20} {1:>8} {n_sources / elapsed:>12.1f} {n_sources * body_mb / elapsed:>10.1f} {sum(error is not None for df, error in results):>8}")
+
+        # pooled client, bulk
+        for n_workers in workers:
+            pma = PMAccess(pm_server, session=create_session(backoff_factor=0.05, pool_size=max(n_workers, 1)))
+            t0 = time.perf_counter()
+            results = pma.get_pm_data_range_bulk(sources, from_ns, to_ns, n_workers=n_workers)
+            elapsed = time.perf_counter() - t0
+            print(f"{'PMAccess bulk':<20} {n_workers:>8} {n_sources / elapsed:>12.1f} {n_sources * body_mb / elapsed:>10.1f} {sum(error is not None for df, error in results):>8}")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the postmortem client against a local stub http server.'
+    )
+    parser.add_argument('--sources', type=int, default=64, help='Number of (system, className, source) tuples to fetch.')
+    parser.add_argument('--events', type=int, default=4, help='Events returned for every source.')
+    parser.add_argument('--samples', type=int, default=2000, help='Samples of the array fields of every event.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latency of every answer of the stub server in seconds.')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='Probability of a 503 answer.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16], help='Numbers of workers of the bulk api to test.')
+
+    args = parser.parse_args()
+    run_benchmark(args.sources, args.events, args.samples, args.latency, args.failure_rate, args.workers)
@@ -0,0 +1,107 @@
+"""
+Usage Example:
+--------------
+To run this script from the command line, use a command similar to the following:
+
+python scripts/benchmark_postmortem_decoder.py --events 200 --fields 8 --samples 20000
+
+This command builds a postmortem-like json response ({"content": [events]}, every event with a header and array fields of
+the given number of samples) and decodes it with json + pd.json_normalize (previous behaviour) and with the streaming decoder
+for every available backend (ijson streaming, orjson, json), printing the decode time and the peak memory of every case
+(measured with tracemalloc) and checking that the decoded arrays are the same.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from davit.utils import postmortem_json_decoder
+from davit.utils.postmortem_json_decoder import decode_pm_stream
+
+def build_body(n_events, n_fields, n_samples):
+    """
+    Json body with the same layout as the responses of the postmortem rest api.
+    """
+    rng = np.random.default_rng(0)
+    content = []
+    for counter in range(n_events):
+        stamp = 1_634_688_000_000_000_000 + counter * 1_000_000_000
+        values = {"acqStamp": {"value": stamp, "type": "long"}, "STATUS": {"value": int(rng.integers(0, 4)), "type": "int"}}
+        for field in range(n_fields):
+            values[f"FIELD_{field}"] = {"value": np.round(rng.standard_normal(n_samples), 6).tolist(), "type": "double[]"}
+        content.append({"header": {"systemName": "QPS", "className": "51_self_pmd", "sourceName": "RPTE.UA23.RB.A12", "timestamp": stamp}, "values": values})
+    return json.dumps({"content": content}).encode("utf-8")
+
+def decode_with_json_normalize(body):
+    """
+    Previous behaviour: response.json() and pd.json_normalize.
+    """
+    return pd.json_normalize(json.loads(body), record_path=["content"])
+
+def measure(function, body):
+    """
+    Decode time and peak memory of one decoder.
+    """
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = function(body)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+def same_result(df_a, df_b):
+    """
+    Same columns and same values of every cell.
+    """
+    if list(df_a.columns) != list(df_b.columns) or df_a.shape != df_b.shape:
+        return False
+    for column in df_a.columns:
+        for value_a, value_b in zip(df_a[column], df_b[column]):
+            if not np.array_equal(np.asarray(value_a), np.asarray(value_b)):
+                return False
+    return True
+
+def run_benchmark(n_events, n_fields, n_samples):
+    """
+    Compares json_normalize against the streaming decoder with every backend.
+    """
+    body = build_body(n_events, n_fields, n_samples)
+    print(f"response: {n_events} events, {n_fields} array fields of {n_samples} samples ({len(body) / 1024 ** 2:.1f} MB of json)")
+    print(f"{'decoder':<24} {'time s':>8} {'peak MB':>10} {'result':>8}")
+
+    # previous behaviour
+    reference, elapsed, peak = measure(decode_with_json_normalize, body)
+    print(f"{'json + json_normalize':<24} {elapsed:>8.2f} {peak / 1024 ** 2:>10.1f} {'':>8}")
+
+    # streaming decoder with every backend (the missing optional ones are skipped)
+    ijson_module, orjson_module = postmortem_json_decoder.ijson, postmortem_json_decoder.orjson
+    backends = [("ijson (streaming)", ijson_module, None), ("orjson", None, orjson_module), ("json", None, None)]
+    try:
+        for name, ijson_backend, orjson_backend in backends:
+            if (name.startswith("ijson") and ijson_module is None) or (name == "orjson" and orjson_module is None):
+                print(f"{name:<24} {'not installed':>28}")
+                continue
+            postmortem_json_decoder.ijson, postmortem_json_decoder.orjson = ijson_backend, orjson_backend
+            df, elapsed, peak = measure(lambda body: decode_pm_stream(io.BytesIO(body), record_path=["content"]), body)
+            print(f"{name:<24} {elapsed:>8.2f} {peak / 1024 ** 2:>10.1f} {('OK' if same_result(df, reference) else 'MISMATCH'):>8}")
+    finally:
+        postmortem_json_decoder.ijson, postmortem_json_decoder.orjson = ijson_module, orjson_module
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the streaming decoder of the postmortem responses (time and peak memory).'
+    )
+    parser.add_argument('--events', type=int, default=200, help='Number of events of the response.')
+    parser.add_argument('--fields', type=int, default=8, help='Array fields of every event.')
+    parser.add_argument('--samples', type=int, default=20_000, help='Samples of every array field.')
+
+    args = parser.parse_args()
+    run_benchmark(args.events, args.fields, args.samples)